@@ -0,0 +1,201 @@
+"""Analítica de cohortes sobre una instantánea columnar de la base.
+
+`export_snapshot` copia, dentro de una sola transacción de lectura, las
+columnas necesarias de user_tps, users, tps, materias, cátedras y reseñas a
+archivos Parquet bajo ANALYTICS_DIR, y calcula ahí mismo los agregados con
+group-bys vectorizados de pandas/NumPy. La página de Estadísticas sólo lee
+esos resultados precalculados: nunca consulta la base en vivo.
+
+Se corre periódicamente con `python maintenance.py analytics-snapshot`.
+"""
+import datetime
+import json
+import os
+import shutil
+import threading
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import select
+
+from config import ANALYTICS_DIR
+from models import User, Subject, TP, Catedra, UserTP, Rating
+
+SNAPSHOTS_KEPT = 3
+NO_CATEDRA = "Sin cátedra"
+
+# Cortes (en días) del histograma de tiempo hasta la aprobación
+TIME_TO_APPROVAL_BINS = np.array([0, 7, 14, 30, 60, 120, 365, np.inf])
+TIME_TO_APPROVAL_LABELS = ["< 1 sem", "1-2 sem", "2 sem-1 mes", "1-2 meses", "2-4 meses", "4-12 meses", "> 1 año"]
+TIME_TO_APPROVAL_QUANTILES = (0.25, 0.5, 0.75, 0.9)
+
+# (consulta, columnas de fecha) de cada tabla de la instantánea
+_TABLES = {
+    "user_tps": (
+        select(UserTP.user_id, UserTP.tp_id, UserTP.state, UserTP.grade, UserTP.created_at, UserTP.approved_at),
+        ["created_at", "approved_at"],
+    ),
+    "users": (select(User.id.label("user_id"), User.year, User.current_catedra), []),
+    "tps": (select(TP.id.label("tp_id"), TP.subject_id, TP.name.label("tp"), TP.order), []),
+    "subjects": (select(Subject.id.label("subject_id"), Subject.name.label("materia"), Subject.year), []),
+    "catedras": (select(Catedra.id.label("catedra_id"), Catedra.subject_id, Catedra.name.label("catedra")), []),
+    "ratings": (select(Rating.catedra_id, Rating.rating, Rating.created_at), ["created_at"]),
+}
+
+RESULTS = ("approval_rates", "time_to_approval", "time_to_approval_hist", "rating_trends")
+
+AnalyticsResults = namedtuple("AnalyticsResults", ("snapshot", "created_at") + RESULTS)
+
+# ----------------------------
+# Exportación
+# ----------------------------
+def read_tables(engine):
+    """Lee todas las tablas de la instantánea con una sola vista consistente."""
+    frames = {}
+    with engine.connect() as conn, conn.begin():
+        for name, (query, dates) in _TABLES.items():
+            frames[name] = pd.read_sql(query, conn, parse_dates=dates)
+    return frames
+
+def export_snapshot(engine, root=ANALYTICS_DIR, keep=SNAPSHOTS_KEPT):
+    """Escribe una instantánea nueva con sus resultados. Devuelve su directorio.
+
+    Se arma en un directorio temporal y se publica con un rename, así la página
+    nunca lee una instantánea a medio escribir.
+    """
+    root.mkdir(parents=True, exist_ok=True)
+    created_at = datetime.datetime.utcnow()
+    name = created_at.strftime("%Y%m%dT%H%M%S%f")
+    tmp = root / f".tmp-{name}"
+    tmp.mkdir()
+    try:
+        frames = read_tables(engine)
+        for table, frame in frames.items():
+            frame.to_parquet(tmp / f"{table}.parquet", index=False)
+        for result, frame in compute_results(frames).items():
+            frame.to_parquet(tmp / f"result_{result}.parquet", index=False)
+        (tmp / "meta.json").write_text(json.dumps({
+            "created_at": created_at.isoformat(timespec="seconds"),
+            "rows": {table: len(frame) for table, frame in frames.items()},
+        }))
+        target = root / name
+        os.replace(tmp, target)
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+
+    latest = root / "LATEST.tmp"
+    latest.write_text(name)
+    os.replace(latest, root / "LATEST")
+    _prune(root, keep)
+    return target
+
+def _prune(root, keep):
+    snapshots = sorted(p for p in root.iterdir() if p.is_dir() and not p.name.startswith("."))
+    for old in snapshots[:-keep]:
+        shutil.rmtree(old, ignore_errors=True)
+
+# ----------------------------
+# Agregados
+# ----------------------------
+def compute_results(frames):
+    """Todos los agregados de la página a partir de los DataFrames de la instantánea."""
+    tps = frames["tps"].merge(frames["subjects"], on="subject_id")
+    progress = frames["user_tps"].merge(frames["users"], on="user_id").merge(tps, on="tp_id")
+    catedra = progress["current_catedra"].fillna("").str.strip()
+    progress["current_catedra"] = catedra.mask(catedra == "", NO_CATEDRA)
+    progress["approved"] = progress["state"].eq("Aprobado")
+
+    time_to_approval, histogram = _time_to_approval(progress)
+    return {
+        "approval_rates": _approval_rates(progress),
+        "time_to_approval": time_to_approval,
+        "time_to_approval_hist": histogram,
+        "rating_trends": _rating_trends(frames),
+    }
+
+def _approval_rates(progress):
+    """Tasa de aprobación de cada TP según la cátedra actual de los estudiantes."""
+    rates = (
+        progress.groupby(["subject_id", "materia", "tp_id", "tp", "order", "current_catedra"], sort=False)
+        .agg(students=("user_id", "size"), approved=("approved", "sum"), mean_grade=("grade", "mean"))
+        .reset_index()
+    )
+    rates["approval_rate"] = rates["approved"] / rates["students"]
+    return rates.sort_values(["subject_id", "order", "current_catedra"], ignore_index=True)
+
+def _time_to_approval(progress):
+    """Días entre que el estudiante marcó el TP y su aprobación, por materia."""
+    done = progress[progress["approved"] & progress["approved_at"].notna() & progress["created_at"].notna()]
+    days = (done["approved_at"] - done["created_at"]).dt.total_seconds() / 86400
+    done = done[["subject_id", "materia"]].assign(days=days.clip(lower=0))
+
+    by_subject = done.groupby(["subject_id", "materia"])["days"]
+    quantiles = (
+        by_subject.quantile(list(TIME_TO_APPROVAL_QUANTILES))
+        .unstack()
+        .reindex(columns=list(TIME_TO_APPROVAL_QUANTILES))
+    )
+    quantiles.columns = [f"p{int(q * 100)}" for q in quantiles.columns]
+    summary = by_subject.agg(approved="size", mean_days="mean").join(quantiles).reset_index()
+
+    done["bucket"] = pd.cut(
+        done["days"], TIME_TO_APPROVAL_BINS, right=False, labels=TIME_TO_APPROVAL_LABELS
+    )
+    histogram = (
+        done.groupby(["subject_id", "materia", "bucket"], observed=False)
+        .size()
+        .rename("students")
+        .reset_index()
+    )
+    histogram["bucket"] = histogram["bucket"].astype(str)
+    return summary, histogram
+
+def _rating_trends(frames):
+    """Cantidad y promedio mensual de reseñas de cada cátedra."""
+    ratings = (
+        frames["ratings"]
+        .merge(frames["catedras"], on="catedra_id")
+        .merge(frames["subjects"][["subject_id", "materia"]], on="subject_id")
+    )
+    ratings = ratings[ratings["created_at"].notna()]
+    ratings = ratings.assign(month=ratings["created_at"].dt.to_period("M").dt.to_timestamp())
+    return (
+        ratings.groupby(["subject_id", "materia", "catedra_id", "catedra", "month"])
+        .agg(ratings=("rating", "size"), average=("rating", "mean"))
+        .reset_index()
+    )
+
+# ----------------------------
+# Lectura para la página
+# ----------------------------
+_loaded = {}
+_loaded_lock = threading.Lock()
+
+def latest_snapshot(root=ANALYTICS_DIR):
+    try:
+        name = (root / "LATEST").read_text().strip()
+    except FileNotFoundError:
+        return None
+    path = root / name
+    return path if path.is_dir() else None
+
+def load_results(root=ANALYTICS_DIR):
+    """Resultados de la última instantánea (AnalyticsResults), o None si no hay.
+
+    Se leen una vez por instantánea y se comparten entre sesiones.
+    """
+    path = latest_snapshot(root)
+    if path is None:
+        return None
+    with _loaded_lock:
+        if path not in _loaded:
+            meta = json.loads((path / "meta.json").read_text())
+            _loaded.clear()
+            _loaded[path] = AnalyticsResults(
+                path.name,
+                meta["created_at"],
+                *(pd.read_parquet(path / f"result_{result}.parquet") for result in RESULTS),
+            )
+        return _loaded[path]
@@ -1,192 +1,50 @@
-import streamlit as st
-import datetime
-import io
-from sqlalchemy import create_engine, Column, Integer, String, Float, ForeignKey, DateTime, LargeBinary, Text, func
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, relationship
-
-# ----------------------------
-# Configuración de la base de datos
-# ----------------------------
-engine = create_engine('sqlite:///archihub.db', echo=False)
-Base = declarative_base()
-Session = sessionmaker(bind=engine)
+import html
 
-# ----------------------------
-# Modelos SQLAlchemy
-# ----------------------------
-class User(Base):
-    __tablename__ = 'users'
-    id = Column(Integer, primary_key=True)
-    name = Column(String, nullable=False)
-    year = Column(Integer)           # año de cursada (1-6)
-    current_catedra = Column(String) # cátedra actual de arquitectura
-
-class Subject(Base):
-    __tablename__ = 'subjects'
-    id = Column(Integer, primary_key=True)
-    name = Column(String, nullable=False)
-    year = Column(Integer)           # año al que pertenece la materia (1-6)
-
-class Catedra(Base):
-    __tablename__ = 'catedras'
-    id = Column(Integer, primary_key=True)
-    name = Column(String, nullable=False)
-    subject_id = Column(Integer, ForeignKey('subjects.id'))
-
-class TP(Base):
-    __tablename__ = 'tps'
-    id = Column(Integer, primary_key=True)
-    name = Column(String)            # ej. "TP1", "TP2", ...
-    subject_id = Column(Integer, ForeignKey('subjects.id'))
-    order = Column(Integer)          # para mantener orden
-
-class UserTP(Base):
-    __tablename__ = 'user_tps'
-    id = Column(Integer, primary_key=True)
-    user_id = Column(Integer, ForeignKey('users.id'))
-    tp_id = Column(Integer, ForeignKey('tps.id'))
-    state = Column(String)            # "Pendiente", "Entregado", "Aprobado"
-
-class Post(Base):
-    __tablename__ = 'posts'
-    id = Column(Integer, primary_key=True)
-    user_id = Column(Integer, ForeignKey('users.id'))
-    subject_id = Column(Integer, ForeignKey('subjects.id'))
-    image = Column(LargeBinary)       # imagen en bytes
-    caption = Column(Text)
-    created_at = Column(DateTime, default=datetime.datetime.utcnow)
-
-class Like(Base):
-    __tablename__ = 'likes'
-    id = Column(Integer, primary_key=True)
-    user_id = Column(Integer, ForeignKey('users.id'))
-    post_id = Column(Integer, ForeignKey('posts.id'))
-
-class Resource(Base):
-    __tablename__ = 'resources'
-    id = Column(Integer, primary_key=True)
-    subject_id = Column(Integer, ForeignKey('subjects.id'))
-    title = Column(String)
-    description = Column(Text)
-
-class Rating(Base):
-    __tablename__ = 'ratings'
-    id = Column(Integer, primary_key=True)
-    user_id = Column(Integer, ForeignKey('users.id'))
-    catedra_id = Column(Integer, ForeignKey('catedras.id'))
-    rating = Column(Integer)          # 1 a 5
-    comment = Column(Text)
-
-# ----------------------------
-# Crear tablas y datos iniciales
-# ----------------------------
-def init_db():
-    Base.metadata.create_all(engine)
-    session = Session()
-
-    # Cargar materias de ejemplo (solo 1er año)
-    if session.query(Subject).count() == 0:
-        materias_primer_anio = [
-            "Taller de Arquitectura I",
-            "Matemática I",
-            "Física I",
-            "Historia I",
-            "Gráfica I"
-        ]
-        for nombre in materias_primer_anio:
-            subject = Subject(name=nombre, year=1)
-            session.add(subject)
-        session.commit()
-
-        # Agregar TPs a cada materia (3 por materia)
-        subjects = session.query(Subject).all()
-        for subj in subjects:
-            for i in range(1, 4):
-                tp = TP(name=f"TP{i}", subject_id=subj.id, order=i)
-                session.add(tp)
-        session.commit()
-
-        # Agregar cátedras para Taller de Arquitectura I
-        taller = session.query(Subject).filter_by(name="Taller de Arquitectura I").first()
-        if taller:
-            for nombre_catedra in ["Szelagowski", "Bares", "Gandolfi"]:
-                catedra = Catedra(name=nombre_catedra, subject_id=taller.id)
-                session.add(catedra)
-        session.commit()
-
-        # Agregar algún recurso de ejemplo
-        for subj in subjects:
-            recurso = Resource(subject_id=subj.id, title=f"Apunte de {subj.name}", description="Descripción breve del apunte.")
-            session.add(recurso)
-        session.commit()
-
-        # Crear un usuario de prueba
-        if session.query(User).count() == 0:
-            user = User(name="Estudiante Ejemplo", year=1, current_catedra="Szelagowski")
-            session.add(user)
-            session.commit()
-
-            # Asignar algunos estados de TP para el usuario de prueba
-            tps = session.query(TP).all()
-            for tp in tps[:3]:  # algunos aprobados, otros pendientes
-                user_tp = UserTP(user_id=user.id, tp_id=tp.id, state="Aprobado")
-                session.add(user_tp)
-            for tp in tps[3:6]:
-                user_tp = UserTP(user_id=user.id, tp_id=tp.id, state="Pendiente")
-                session.add(user_tp)
-            session.commit()
-
-    session.close()
-
-# ----------------------------
-# Funciones de ayuda
-# ----------------------------
-def get_user_name(user_id):
-    session = Session()
-    user = session.query(User).get(user_id)
-    session.close()
-    return user.name if user else ""
-
-def get_subjects_by_year(year):
-    session = Session()
-    subjects = session.query(Subject).filter_by(year=year).all()
-    session.close()
-    return subjects
-
-def get_tps_for_subject(subject_id):
-    session = Session()
-    tps = session.query(TP).filter_by(subject_id=subject_id).order_by(TP.order).all()
-    session.close()
-    return tps
-
-def get_user_tp_state(user_id, tp_id):
-    session = Session()
-    user_tp = session.query(UserTP).filter_by(user_id=user_id, tp_id=tp_id).first()
-    state = user_tp.state if user_tp else "Pendiente"
-    session.close()
-    return state
-
-def update_user_tp_state(user_id, tp_id, new_state):
-    session = Session()
-    user_tp = session.query(UserTP).filter_by(user_id=user_id, tp_id=tp_id).first()
-    if user_tp:
-        user_tp.state = new_state
-    else:
-        user_tp = UserTP(user_id=user_id, tp_id=tp_id, state=new_state)
-        session.add(user_tp)
-    session.commit()
-    session.close()
-
-def get_progress_for_subject(user_id, subject_id):
-    tps = get_tps_for_subject(subject_id)
-    if not tps:
-        return 0.0
-    approved = 0
-    for tp in tps:
-        if get_user_tp_state(user_id, tp.id) == "Aprobado":
-            approved += 1
-    return approved / len(tps)
+import altair as alt
+import streamlit as st
+from pathlib import Path
+
+import instrumentation
+import static_server
+import trending
+import upload_queue
+from analytics import TIME_TO_APPROVAL_LABELS, load_results
+from database import SessionLocal, engine
+from storage import blob_store
+from images import pick_image_path
+from refdata import get_reference_data, cache_stats
+from migrations import bootstrap
+from search import RESULTS_PAGE_SIZE
+from shared_cache import shared_cache
+from services import (
+    TP_STATES,
+    create_post,
+    create_resource,
+    delete_rating,
+    get_academic_stats,
+    get_catedra_ranking,
+    get_curriculum_snapshot,
+    get_feed_page,
+    get_liked_post_ids,
+    get_or_create_user,
+    get_profile_data,
+    get_resources_for_subject,
+    get_subject_averages,
+    get_trending_page,
+    get_upload_queue_metrics,
+    get_user_role,
+    rate_catedra,
+    save_tp_progress,
+    search_content,
+    set_like,
+    with_rating_change,
+    with_tp_progress,
+)
+
+FEED_IMAGE_WIDTH = 640   # px de la columna de imagen del feed (pantallas 2x)
+GRID_IMAGE_WIDTH = 400   # px de cada celda de la grilla del perfil
+STAFF_ROLES = {"ayudante", "profesor", "admin"}
+FEED_ORDERS = ["Recientes", "Tendencias"]
 
 # ----------------------------
 # Página de login / registro
@@ -202,14 +60,9 @@ def login_page():
         submitted = st.form_submit_button("Ingresar")
 
     if submitted and name:
-        session = Session()
-        user = session.query(User).filter_by(name=name).first()
-        if not user:
-            user = User(name=name, year=year, current_catedra=catedra)
-            session.add(user)
-            session.commit()
+        user = get_or_create_user(name, year, catedra)
         st.session_state.user_id = user.id
-        session.close()
+        st.session_state.user_role = user.role
         st.rerun()
     elif submitted:
         st.error("Por favor ingresa tu nombre.")
@@ -221,47 +74,111 @@ def dashboard_page():
     st.header("Mi Cursada")
     user_id = st.session_state.user_id
 
+    stats = get_academic_stats(user_id)
+    col_approved, col_delivered, col_pending = st.columns(3)
+    col_approved.metric("TPs aprobados", stats.approved)
+    col_delivered.metric("TPs entregados", stats.delivered)
+    col_pending.metric("TPs pendientes", stats.pending)
+
     # Pestañas por año
     años = list(range(1,7))
     tabs = st.tabs([f"Año {a}" for a in años])
 
+    snapshot = get_curriculum_snapshot(user_id)
+
     for i, año in enumerate(años):
         with tabs[i]:
-            subjects = get_subjects_by_year(año)
+            subjects = snapshot.get(año, [])
             if not subjects:
                 st.info("No hay materias cargadas para este año.")
             for subj in subjects:
                 with st.expander(f"**{subj.name}**"):
-                    tps = get_tps_for_subject(subj.id)
-                    if not tps:
+                    if not subj.tps:
                         st.write("No hay TPs definidos.")
                     else:
-                        # Formulario para actualizar estados
-                        with st.form(key=f"form_{subj.id}"):
-                            states = {}
-                            for tp in tps:
-                                current_state = get_user_tp_state(user_id, tp.id)
-                                new_state = st.selectbox(
-                                    f"{tp.name}",
-                                    ["Pendiente", "Entregado", "Aprobado"],
-                                    index=["Pendiente", "Entregado", "Aprobado"].index(current_state),
-                                    key=f"tp_{subj.id}_{tp.id}"
-                                )
-                                states[tp.id] = new_state
-
-                            if st.form_submit_button("Guardar progreso"):
-                                for tp_id, new_state in states.items():
-                                    update_user_tp_state(user_id, tp_id, new_state)
-                                st.success("Progreso guardado!")
-                                st.rerun()
-
-                        # Barra de progreso
-                        progress = get_progress_for_subject(user_id, subj.id)
-                        st.progress(progress, text=f"Progreso: {int(progress*100)}% completado")
+                        tp_progress_form(user_id, subj)
+
+def _local_state(key, server_value):
+    """Valor optimista de un fragmento guardado en la sesión.
+
+    Los fragmentos se re-ejecutan con los argumentos de la última ejecución
+    completa, así que la copia local manda hasta que la página vuelva a leer
+    de la base un valor distinto (que entonces la reemplaza).
+    """
+    base_key = f"{key}__base"
+    if st.session_state.get(base_key) != server_value:
+        st.session_state[base_key] = server_value
+        st.session_state[key] = server_value
+    return st.session_state[key]
+
+def _save_tp_progress(user_id, key, subj):
+    changed = {}
+    for tp in subj.tps:
+        state = st.session_state[f"tp_{subj.id}_{tp.id}"]
+        grade = st.session_state[f"grade_{subj.id}_{tp.id}"]
+        if (state, grade) != (tp.state, tp.grade):
+            changed[tp.id] = (state, grade)
+    st.session_state[key] = with_tp_progress(subj, changed)
+    st.session_state[f"{key}__saved"] = True
+    with instrumentation.track("Mi Cursada: guardar progreso", user_id):
+        save_tp_progress(user_id, changed)
+
+@st.fragment
+def tp_progress_form(user_id, server_subj):
+    key = f"progress_{server_subj.id}"
+    subj = _local_state(key, server_subj)
+
+    # Formulario para actualizar estados
+    with st.form(key=f"form_{subj.id}"):
+        for tp in subj.tps:
+            col_state, col_grade = st.columns([3, 1])
+            col_state.selectbox(
+                f"{tp.name}",
+                TP_STATES,
+                index=TP_STATES.index(tp.state),
+                key=f"tp_{subj.id}_{tp.id}"
+            )
+            col_grade.number_input(
+                "Nota",
+                min_value=1.0,
+                max_value=10.0,
+                value=tp.grade,
+                step=0.5,
+                key=f"grade_{subj.id}_{tp.id}"
+            )
+        st.form_submit_button("Guardar progreso", on_click=_save_tp_progress, args=(user_id, key, subj))
+    if st.session_state.pop(f"{key}__saved", False):
+        st.success("Progreso guardado!")
+
+    # Barra de progreso
+    st.progress(subj.progress, text=f"Progreso: {int(subj.progress*100)}% completado")
 
 # ----------------------------
 # Feed social (estilo Instagram)
 # ----------------------------
+def post_image(post, width, alt=""):
+    """<img> con la URL inmutable de la variante que cubre `width` px.
+
+    El navegador la guarda en caché y la carga recién al acercarse al viewport;
+    en cada rerun sólo viaja este HTML. El servidor de estáticos no entrega
+    originales y sin STATIC_URL sólo se alcanza desde localhost: en esos casos
+    la imagen va por st.image.
+    """
+    path = pick_image_path(post, width)
+    if path == post.image_path or not static_server.usable_from(st.context.headers.get("Host")):
+        local_path = blob_store.abspath(path)
+        if local_path.is_file():
+            st.image(str(local_path), width="stretch")
+        else:
+            st.caption("Imagen no disponible")
+        return
+    url = static_server.file_url(path)
+    st.markdown(
+        f'<img src="{html.escape(url)}" alt="{html.escape(alt or "")}" loading="lazy" decoding="async" '
+        'style="width:100%;height:auto;border-radius:4px">',
+        unsafe_allow_html=True,
+    )
+
 def social_feed_page():
     st.header("Feed Social")
     user_id = st.session_state.user_id
@@ -272,60 +189,81 @@ def social_feed_page():
             uploaded_file = st.file_uploader("Elige una imagen", type=["jpg", "jpeg", "png"])
             subject_id = st.selectbox(
                 "Materia relacionada",
-                options=[(s.id, s.name) for s in Session().query(Subject).all()],
+                options=[(s.id, s.name) for s in get_reference_data().subjects],
                 format_func=lambda x: x[1]
             )
             caption = st.text_area("Descripción")
             submitted = st.form_submit_button("Publicar")
 
             if submitted and uploaded_file is not None:
-                bytes_data = uploaded_file.getvalue()
-                session = Session()
-                new_post = Post(
-                    user_id=user_id,
-                    subject_id=subject_id[0],
-                    image=bytes_data,
-                    caption=caption
+                create_post(
+                    user_id,
+                    subject_id[0],
+                    uploaded_file,
+                    caption,
+                    ext=Path(uploaded_file.name).suffix,
                 )
-                session.add(new_post)
-                session.commit()
-                session.close()
-                st.success("Post publicado!")
-                st.rerun()
+                st.success("Imagen subida: aparecerá en el feed cuando termine de procesarse.")
 
-    # Mostrar posts en orden cronológico inverso
-    session = Session()
-    posts = session.query(Post).order_by(Post.created_at.desc()).all()
-    for post in posts:
-        col1, col2 = st.columns([1, 3])
-        with col1:
-            if post.image:
-                st.image(post.image, use_container_width=True)
-            else:
-                st.write("Sin imagen")
-        with col2:
-            autor = session.query(User).get(post.user_id).name
-            materia = session.query(Subject).get(post.subject_id).name
-            st.markdown(f"**{autor}** · *{materia}*")
-            st.caption(post.caption)
-            likes = session.query(Like).filter_by(post_id=post.id).count()
-            liked = session.query(Like).filter_by(post_id=post.id, user_id=user_id).first() is not None
-
-            col_like, col_count = st.columns([1, 5])
-            with col_like:
-                if st.button("❤️" if liked else "🤍", key=f"like_{post.id}"):
-                    if liked:
-                        # Quitar like
-                        session.query(Like).filter_by(post_id=post.id, user_id=user_id).delete()
-                    else:
-                        new_like = Like(post_id=post.id, user_id=user_id)
-                        session.add(new_like)
-                    session.commit()
-                    st.rerun()
-            with col_count:
-                st.write(f"{likes} likes")
-        st.divider()
-    session.close()
+    # Recientes (orden cronológico inverso) o tendencias, una página por vez
+    if 'feed_pages' not in st.session_state:
+        st.session_state.feed_pages = 1
+    order = st.radio(
+        "Orden", FEED_ORDERS, horizontal=True, key="feed_order", on_change=_reset_feed_pages
+    )
+
+    cursor = None
+    # Cada página se lee aparte y el puntaje de tendencia cambia con cada like: un
+    # post que bajó entre dos lecturas volvería a aparecer (y a repetir su like_{id})
+    rendered = set()
+    for _ in range(st.session_state.feed_pages):
+        if order == "Tendencias":
+            posts, cursor = get_trending_page(user_id, cursor)
+        else:
+            posts, cursor = get_feed_page(cursor)
+        posts = [post for post in posts if post.id not in rendered]
+        rendered.update(post.id for post in posts)
+        liked_ids = get_liked_post_ids(user_id, [post.id for post in posts])
+        for post in posts:
+            liked = post.id in liked_ids
+            col1, col2 = st.columns([1, 3])
+            with col1:
+                if post.image_path:
+                    post_image(post, FEED_IMAGE_WIDTH, alt=post.caption)
+                else:
+                    st.write("Sin imagen")
+            with col2:
+                st.markdown(f"**{post.autor}** · *{post.materia}*")
+                st.caption(post.caption)
+
+                like_button(user_id, post.id, liked, post.like_count)
+            st.divider()
+        if cursor is None:
+            break
+
+    if cursor is not None and st.button("Cargar más"):
+        st.session_state.feed_pages += 1
+        st.rerun()
+
+def _reset_feed_pages():
+    st.session_state.feed_pages = 1
+
+def _toggle_like(user_id, post_id, key):
+    liked, like_count = st.session_state[key]
+    liked = not liked
+    st.session_state[key] = (liked, like_count + (1 if liked else -1))
+    with instrumentation.track("Feed Social: like", user_id):
+        set_like(user_id, post_id, liked)
+
+@st.fragment
+def like_button(user_id, post_id, liked, like_count):
+    key = f"like_state_{post_id}"
+    liked, like_count = _local_state(key, (liked, like_count))
+    col_like, col_count = st.columns([1, 5])
+    with col_like:
+        st.button("❤️" if liked else "🤍", key=f"like_{post_id}", on_click=_toggle_like, args=(user_id, post_id, key))
+    with col_count:
+        st.write(f"{like_count} likes")
 
 # ----------------------------
 # Perfil con portfolio
@@ -333,8 +271,7 @@ def social_feed_page():
 def profile_page():
     st.header("Mi Perfil")
     user_id = st.session_state.user_id
-    session = Session()
-    user = session.query(User).get(user_id)
+    user, user_posts = get_profile_data(user_id)
 
     col1, col2 = st.columns(2)
     with col1:
@@ -342,36 +279,49 @@ def profile_page():
         st.write(f"Año de cursada: {user.year}")
         st.write(f"Cátedra: {user.current_catedra}")
     with col2:
-        # Promedio académico (simulado)
-        st.metric("Promedio Académico", "7.5")
+        stats = get_academic_stats(user_id)
+        average = f"{stats.average:.2f}" if stats.average is not None else "Sin notas"
+        st.metric("Promedio Académico", average, help=f"{stats.grade_count} TPs con nota")
+        st.caption(f"{stats.approved} TPs aprobados")
+
+    subject_averages = get_subject_averages(user_id)
+    if subject_averages:
+        with st.expander("Promedio por materia"):
+            for item in subject_averages:
+                average = f"{item.average:.2f}" if item.average is not None else "sin notas"
+                st.write(f"**{item.materia}**: {average} · {item.approved} TPs aprobados")
 
     # Grid de posts del usuario (portfolio)
     st.subheader("Mis Publicaciones")
-    user_posts = session.query(Post).filter_by(user_id=user_id).order_by(Post.created_at.desc()).all()
     if user_posts:
         cols = st.columns(3)
         for i, post in enumerate(user_posts):
-            # Cambia esto en tu función profile_page:
             with cols[i % 3]:
-                if post.image:
-                    # Usa un borde y ajusta el tamaño para que parezca una grilla de Instagram
-                    st.image(post.image, use_container_width=True, caption=f"Materia: {materia}")
+                if post.status == upload_queue.POST_PROCESSING:
+                    st.info("Procesando imagen…")
+                elif post.status == upload_queue.POST_REJECTED:
+                    st.warning("No se pudo publicar la imagen (formato, tamaño o archivo dañado)")
+                elif post.image_path:
+                    post_image(post, GRID_IMAGE_WIDTH, alt=post.caption)
                 else:
                     st.write("Imagen no disponible")
+                st.caption(f"Materia: {post.materia}")
     else:
         st.info("Aún no has publicado nada.")
 
-    session.close()
-
 # ----------------------------
 # Repositorio de apuntes
 # ----------------------------
 def resources_page():
     st.header("Repositorio de Apuntes")
 
-    session = Session()
-    subjects = session.query(Subject).all()
-    subject_dict = {s.id: s.name for s in subjects}
+    subject_dict = {s.id: s.name for s in get_reference_data().subjects}
+
+    # Búsqueda en todos los apuntes y publicaciones
+    query = st.text_input("Buscar", placeholder="ej. apuntes de estructuras")
+    if query:
+        search_results_section(query, subject_dict)
+        return
 
     # Selector de materia
     selected_subject_id = st.selectbox(
@@ -381,26 +331,71 @@ def resources_page():
     )
 
     # Mostrar recursos de esa materia
-    resources = session.query(Resource).filter_by(subject_id=selected_subject_id).all()
+    resources = get_resources_for_subject(selected_subject_id)
     for res in resources:
         with st.container(border=True):
             st.markdown(f"**{res.title}**")
             st.write(res.description)
-            st.button("Ver/Descargar", key=f"res_{res.id}")
-
-    # Formulario para agregar recurso (simulado)
+            if res.file_path:
+                st.caption(f"{res.file_name} · {format_size(res.file_size)}")
+                if static_server.usable_from(st.context.headers.get("Host")):
+                    # URL firmada: el servidor de estáticos lo envía de a bloques
+                    st.link_button(
+                        "Ver/Descargar", static_server.attachment_url(res.file_path, res.file_name)
+                    )
+                else:
+                    # Sin servidor alcanzable: se lee recién al hacer clic, pero
+                    # Streamlit lo guarda entero en memoria
+                    st.download_button(
+                        "Ver/Descargar",
+                        data=lambda path=res.file_path: blob_store.read(path),
+                        file_name=res.file_name,
+                        mime=res.file_mime,
+                        key=f"res_{res.id}",
+                    )
+
+    # Formulario para agregar recurso
     with st.expander("Agregar nuevo apunte"):
         with st.form("new_resource"):
             title = st.text_input("Título")
             desc = st.text_area("Descripción")
+            attachment = st.file_uploader("Archivo (opcional)")
             if st.form_submit_button("Subir"):
-                new_res = Resource(subject_id=selected_subject_id, title=title, description=desc)
-                session.add(new_res)
-                session.commit()
+                create_resource(selected_subject_id, title, desc, attachment)
                 st.success("Apunte agregado!")
                 st.rerun()
 
-    session.close()
+def format_size(num_bytes):
+    size = float(num_bytes or 0)
+    for unit in ("B", "KB", "MB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+def search_results_section(query, subject_dict):
+    if st.session_state.get("search_query") != query:
+        st.session_state.search_query = query
+        st.session_state.search_pages = 1
+
+    limit = RESULTS_PAGE_SIZE * st.session_state.search_pages
+    # Una fila de más para saber si hay otra página
+    hits = search_content(query, limit=limit + 1)
+
+    if not hits:
+        st.info("No se encontraron resultados.")
+    for hit in hits[:limit]:
+        with st.container(border=True):
+            materia = subject_dict.get(hit.subject_id, "")
+            if hit.kind == "resource":
+                st.markdown(f"**{hit.title}** · *{materia}*")
+            else:
+                st.markdown(f"**Publicación** · *{materia}*")
+            st.markdown(hit.snippet)
+
+    if len(hits) > limit and st.button("Más resultados"):
+        st.session_state.search_pages += 1
+        st.rerun()
 
 # ----------------------------
 # Ranking de cátedras
@@ -408,68 +403,197 @@ def resources_page():
 def ranking_page():
     st.header("Ranking de Cátedras")
     user_id = st.session_state.user_id
-    session = Session()
 
-    # Mostrar todas las cátedras con promedio
-    catedras = session.query(Catedra).all()
-    for cat in catedras:
-        materia = session.query(Subject).get(cat.subject_id).name
-        avg_rating = session.query(func.avg(Rating.rating)).filter_by(catedra_id=cat.id).scalar()
-        avg_rating = round(avg_rating, 1) if avg_rating else "Sin reseñas"
+    ranking = get_catedra_ranking(user_id)
+    materias = {cat.subject_id: cat.materia for cat in ranking}
+    selected_subject = st.selectbox(
+        "Filtrar por materia",
+        options=[None] + list(materias),
+        format_func=lambda x: "Todas" if x is None else materias[x]
+    )
+    if selected_subject is not None:
+        ranking = [cat for cat in ranking if cat.subject_id == selected_subject]
+
+    for position, cat in enumerate(ranking, start=1):
+        catedra_card(user_id, position, cat)
+
+def _submit_rating(user_id, key, cat):
+    rating = st.session_state[f"slider_{cat.id}"]
+    comment = st.session_state[f"comm_{cat.id}"]
+    st.session_state[key] = with_rating_change(cat, cat.user_rating, rating)
+    st.session_state[f"{key}__saved"] = True
+    with instrumentation.track("Ranking: calificar", user_id):
+        rate_catedra(user_id, cat.id, rating, comment)
+
+def _reset_rating(user_id, key, cat):
+    # Simplemente borramos para que pueda volver a calificar
+    st.session_state[key] = with_rating_change(cat, cat.user_rating, None)
+    with instrumentation.track("Ranking: editar", user_id):
+        delete_rating(user_id, cat.id)
+
+@st.fragment
+def catedra_card(user_id, position, server_cat):
+    key = f"rank_{server_cat.id}"
+    cat = _local_state(key, server_cat)
+    avg_rating = round(cat.average, 1) if cat.average else "Sin reseñas"
+
+    with st.container(border=True):
+        st.markdown(f"**{position}. {cat.name}** - {cat.materia}")
+        st.write(f"Valoración promedio: {avg_rating} ⭐ ({cat.rating_count} reseñas)")
+        if cat.rating_count:
+            histogram = [cat.stars_1, cat.stars_2, cat.stars_3, cat.stars_4, cat.stars_5]
+            st.caption(" · ".join(f"{star}⭐ {n}" for star, n in enumerate(histogram, start=1)))
+
+        # Ver si el usuario ya calificó
+        if cat.user_rating:
+            st.write(f"Tu calificación: {cat.user_rating} estrellas")
+            if st.session_state.pop(f"{key}__saved", False):
+                st.success("¡Gracias por tu reseña!")
+            st.button("Editar", key=f"edit_{cat.id}", on_click=_reset_rating, args=(user_id, key, cat))
+        else:
+            with st.form(key=f"rate_{cat.id}"):
+                st.select_slider("Puntuación", options=[1,2,3,4,5], value=3, key=f"slider_{cat.id}")
+                st.text_area("Comentario (opcional)", key=f"comm_{cat.id}")
+                st.form_submit_button("Calificar", on_click=_submit_rating, args=(user_id, key, cat))
 
-        with st.container(border=True):
-            st.markdown(f"**{cat.name}** - {materia}")
-            st.write(f"Valoración promedio: {avg_rating} ⭐")
-
-            # Ver si el usuario ya calificó
-            user_rating = session.query(Rating).filter_by(user_id=user_id, catedra_id=cat.id).first()
-            if user_rating:
-                st.write(f"Tu calificación: {user_rating.rating} estrellas")
-                if st.button("Editar", key=f"edit_{cat.id}"):
-                    # Simplemente borramos para que pueda volver a calificar
-                    session.delete(user_rating)
-                    session.commit()
-                    st.rerun()
-            else:
-                with st.form(key=f"rate_{cat.id}"):
-                    rating = st.select_slider("Puntuación", options=[1,2,3,4,5], value=3, key=f"slider_{cat.id}")
-                    comment = st.text_area("Comentario (opcional)", key=f"comm_{cat.id}")
-                    if st.form_submit_button("Calificar"):
-                        new_rating = Rating(user_id=user_id, catedra_id=cat.id, rating=rating, comment=comment)
-                        session.add(new_rating)
-                        session.commit()
-                        st.success("¡Gracias por tu reseña!")
-                        st.rerun()
-    session.close()
+# ----------------------------
+# Estadísticas (ayudantes y profesores)
+# ----------------------------
+def statistics_page():
+    st.header("Estadísticas")
+
+    # Sólo lee los resultados precalculados de la última instantánea
+    results = load_results()
+    if results is None:
+        st.info("Todavía no hay estadísticas. Se generan con `python maintenance.py analytics-snapshot`.")
+        return
+    st.caption(f"Datos al {results.created_at} (UTC)")
+
+    rates = results.approval_rates
+    materias = dict(zip(rates["subject_id"], rates["materia"]))
+    if not materias:
+        st.info("Todavía no hay progreso cargado.")
+        return
+    selected_subject = st.selectbox(
+        "Materia",
+        options=list(materias),
+        format_func=lambda x: materias[x]
+    )
+
+    st.subheader("Aprobación por TP y cátedra")
+    subject_rates = rates[rates["subject_id"] == selected_subject]
+    table = subject_rates.pivot_table(
+        index=["order", "tp"], columns="current_catedra", values="approval_rate"
+    ).droplevel("order") * 100
+    st.dataframe(
+        table,
+        column_config={col: st.column_config.NumberColumn(col, format="%.0f%%") for col in table.columns},
+    )
+
+    st.subheader("Tiempo hasta la aprobación")
+    summary = results.time_to_approval
+    summary = summary[summary["subject_id"] == selected_subject]
+    if summary.empty:
+        st.write("Sin TPs aprobados con fecha registrada.")
+    else:
+        row = summary.iloc[0]
+        col_median, col_p90, col_count = st.columns(3)
+        col_median.metric("Mediana", f"{row['p50']:.0f} días")
+        col_p90.metric("Percentil 90", f"{row['p90']:.0f} días")
+        col_count.metric("Aprobaciones", int(row["approved"]))
+        histogram = results.time_to_approval_hist
+        histogram = histogram[histogram["subject_id"] == selected_subject]
+        st.altair_chart(
+            alt.Chart(histogram).mark_bar().encode(
+                x=alt.X("bucket", sort=TIME_TO_APPROVAL_LABELS, title="Tiempo"),
+                y=alt.Y("students", title="Estudiantes"),
+            ),
+            width="stretch",
+        )
+
+    st.subheader("Tendencia de reseñas")
+    trends = results.rating_trends
+    trends = trends[trends["subject_id"] == selected_subject]
+    if trends.empty:
+        st.write("Sin reseñas para esta materia.")
+    else:
+        st.line_chart(trends.pivot_table(index="month", columns="catedra", values="average"))
 
 # ----------------------------
 # Navegación principal
 # ----------------------------
+def performance_panel():
+    """Métricas de consultas de esta ejecución, sólo para administradores."""
+    stats = instrumentation.current_run()
+    if stats is None:
+        return
+    with st.sidebar.expander("Rendimiento"):
+        st.metric("Consultas", stats.query_count)
+        st.metric("Tiempo en base", f"{stats.db_time * 1000:.1f} ms")
+        for shape, count in stats.repeated():
+            st.warning(f"Posible N+1 ({count} veces): {shape[:200]}")
+        if stats.slowest:
+            st.caption("Consultas más lentas")
+            for elapsed, statement in stats.slowest:
+                st.code(f"{elapsed * 1000:.1f} ms  {' '.join(statement.split())[:300]}", language="sql")
+        cache = cache_stats()
+        st.caption(f"Caché de referencia: {cache['hits']} aciertos / {cache['misses']} fallos")
+        shared = shared_cache.stats()
+        st.caption(
+            f"Caché compartido: {shared['hits']} aciertos / {shared['misses']} fallos · "
+            f"{shared['entries']} entradas, {(shared['bytes'] or 0) / 1024:.0f} KiB"
+        )
+
+        queue = get_upload_queue_metrics()
+        st.caption("Cola de subidas")
+        st.metric("Pendientes / en proceso", f"{queue.pending} / {queue.running}")
+        st.metric("Procesadas por minuto", f"{queue.per_minute:.2f}", help=f"{queue.failed} rechazadas en la última hora")
+        if queue.avg_wait is not None:
+            st.caption(f"Espera media {queue.avg_wait:.1f} s · procesamiento medio {queue.avg_processing:.1f} s")
+
 def main():
-    init_db()
+    bootstrap()
+    static_server.start()
+    instrumentation.install(engine)
+    trending.start_decay_job(SessionLocal)
+    upload_queue.start_workers(SessionLocal)
+    instrumentation.start_run()
 
     if 'user_id' not in st.session_state:
         st.session_state.user_id = None
 
-    if st.session_state.user_id is None:
-        login_page()
-    else:
-        st.sidebar.title("LOOP")
-        menu = st.sidebar.radio(
-            "Navegación",
-            ["Mi Cursada", "Feed Social", "Perfil", "Recursos", "Ranking"]
-        )
-
-        if menu == "Mi Cursada":
-            dashboard_page()
-        elif menu == "Feed Social":
-            social_feed_page()
-        elif menu == "Perfil":
-            profile_page()
-        elif menu == "Recursos":
-            resources_page()
-        elif menu == "Ranking":
-            ranking_page()
+    try:
+        if st.session_state.user_id is None:
+            instrumentation.set_page("Login")
+            login_page()
+        else:
+            if 'user_role' not in st.session_state:
+                st.session_state.user_role = get_user_role(st.session_state.user_id)
+
+            st.sidebar.title("LOOP")
+            pages = ["Mi Cursada", "Feed Social", "Perfil", "Recursos", "Ranking"]
+            if st.session_state.user_role in STAFF_ROLES:
+                pages.append("Estadísticas")
+            menu = st.sidebar.radio("Navegación", pages)
+            instrumentation.set_page(menu)
+
+            if menu == "Mi Cursada":
+                dashboard_page()
+            elif menu == "Feed Social":
+                social_feed_page()
+            elif menu == "Perfil":
+                profile_page()
+            elif menu == "Recursos":
+                resources_page()
+            elif menu == "Ranking":
+                ranking_page()
+            elif menu == "Estadísticas":
+                statistics_page()
+
+            if st.session_state.user_role == "admin":
+                performance_panel()
+    finally:
+        instrumentation.finish_run(st.session_state.user_id)
 
 if __name__ == "__main__":
     st.set_page_config(page_title="LOOP", layout="wide")
@@ -0,0 +1,4 @@
+"""Benchmarks del acceso a datos de LOOP sobre una base sintética.
+
+Uso: python -m benchmarks.run --scale small --db /tmp/loop-bench.db
+"""
@@ -0,0 +1,189 @@
+"""Generador de datos sintéticos con semilla para llenar el esquema de models.py.
+
+Inserta todo con operaciones masivas (executemany por lotes) y deja los
+contadores desnormalizados consistentes, como si la app se hubiera usado.
+"""
+import datetime
+import random
+from dataclasses import dataclass, asdict
+
+from sqlalchemy import func, insert
+
+from database import engine, get_session
+from models import User, Subject, TP, Catedra, UserTP, Post, Like, Resource, Rating
+from maintenance import rebuild_rating_stats, rebuild_user_stats
+from refdata import bump_version
+import trending
+
+BATCH_SIZE = 10_000
+PLACEHOLDER_IMAGE = "bench/placeholder.png"
+
+@dataclass(frozen=True)
+class Scale:
+    users: int
+    posts: int
+    likes: int
+    ratings: int
+    subjects_per_year: int = 8
+    tps_per_subject: int = 5
+    catedras_per_subject: int = 3
+    resources_per_subject: int = 20
+    tp_states_per_user: int = 40
+
+SCALES = {
+    "tiny": Scale(users=200, posts=2_000, likes=20_000, ratings=500),
+    "small": Scale(users=2_000, posts=20_000, likes=200_000, ratings=5_000),
+    "full": Scale(users=20_000, posts=200_000, likes=2_000_000, ratings=50_000),
+}
+
+TP_STATES = ["Pendiente", "Entregado", "Aprobado"]
+WORDS = (
+    "estructuras vigas planta corte fachada maqueta croquis perspectiva "
+    "hormigón acero madera urbanismo historia morfología instalaciones "
+    "taller entrega corrección lámina render detalle constructivo"
+).split()
+
+def _batched(rows, size=BATCH_SIZE):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def _bulk_insert(model, rows):
+    count = 0
+    for batch in _batched(rows):
+        with engine.begin() as conn:
+            conn.execute(insert(model), batch)
+        count += len(batch)
+    return count
+
+def _text(rng, n):
+    return " ".join(rng.choice(WORDS) for _ in range(n))
+
+def generate(scale, seed=42):
+    """Llena una base vacía (ya migrada). Devuelve la cantidad de filas por tabla."""
+    rng = random.Random(seed)
+    now = datetime.datetime.utcnow()
+    counts = {}
+
+    # Plan de estudios completo de 6 años
+    subjects = [
+        {"id": year * 100 + i, "name": f"Materia {i} - Año {year}", "year": year}
+        for year in range(1, 7)
+        for i in range(1, scale.subjects_per_year + 1)
+    ]
+    tps = [
+        {"subject_id": s["id"], "name": f"TP{order}", "order": order}
+        for s in subjects
+        for order in range(1, scale.tps_per_subject + 1)
+    ]
+    catedras = [
+        {"subject_id": s["id"], "name": f"Cátedra {chr(65 + i)} ({s['id']})"}
+        for s in subjects
+        for i in range(scale.catedras_per_subject)
+    ]
+    counts["subjects"] = _bulk_insert(Subject, subjects)
+    counts["tps"] = _bulk_insert(TP, tps)
+    counts["catedras"] = _bulk_insert(Catedra, catedras)
+    counts["resources"] = _bulk_insert(Resource, (
+        {"subject_id": s["id"], "title": f"Apunte de {_text(rng, 2)}", "description": _text(rng, 12)}
+        for s in subjects
+        for _ in range(scale.resources_per_subject)
+    ))
+    with get_session() as session:
+        bump_version(session)
+        tp_ids_by_year = {}
+        for tp_id, year in session.query(TP.id, Subject.year).join(Subject, Subject.id == TP.subject_id):
+            tp_ids_by_year.setdefault(year, []).append(tp_id)
+        catedra_ids = [cid for cid, in session.query(Catedra.id)]
+        subject_ids = [s["id"] for s in subjects]
+        # La base migrada ya trae el usuario de ejemplo
+        first_user_id = (session.query(func.max(User.id)).scalar() or 0) + 1
+
+    counts["users"] = _bulk_insert(User, (
+        {
+            "name": f"Usuario {i}",
+            "email": f"usuario{i}@loop.test",
+            "year": rng.randint(1, 6),
+            "current_catedra": f"Cátedra {chr(65 + rng.randrange(scale.catedras_per_subject))}",
+            "created_at": now - datetime.timedelta(days=rng.randint(0, 720)),
+        }
+        for i in range(1, scale.users + 1)
+    ))
+    with get_session() as session:
+        users = session.query(User.id, User.year).filter(User.id >= first_user_id).all()
+    user_ids = [uid for uid, _ in users]
+
+    # Estados de TP hasta el año que cursa cada usuario
+    def user_tp_rows():
+        for user_id, year in users:
+            pool = [tp for y in range(1, (year or 1) + 1) for tp in tp_ids_by_year.get(y, [])]
+            for tp_id in rng.sample(pool, min(len(pool), scale.tp_states_per_user)):
+                state = rng.choice(TP_STATES)
+                created_at = now - datetime.timedelta(days=rng.randint(0, 540))
+                yield {
+                    "user_id": user_id,
+                    "tp_id": tp_id,
+                    "state": state,
+                    "grade": round(rng.uniform(4, 10), 1) if rng.random() < 0.5 else None,
+                    "created_at": created_at,
+                    "approved_at": (
+                        created_at + datetime.timedelta(days=rng.expovariate(1 / 30)) if state == "Aprobado" else None
+                    ),
+                }
+    counts["user_tps"] = _bulk_insert(UserTP, user_tp_rows())
+
+    # Likes por post con distribución sesgada (pocos posts muy populares)
+    mean_likes = scale.likes / max(scale.posts, 1)
+    like_counts = [min(len(user_ids), int(rng.expovariate(1 / mean_likes))) if mean_likes else 0 for _ in range(scale.posts)]
+    posted_at = [now - datetime.timedelta(seconds=rng.randint(0, 365 * 86400)) for _ in range(scale.posts)]
+    counts["posts"] = _bulk_insert(Post, (
+        {
+            "user_id": rng.choice(user_ids),
+            "subject_id": rng.choice(subject_ids),
+            # Como un post ya procesado: el feed arma <img> con la URL del derivado
+            "image_path": PLACEHOLDER_IMAGE,
+            "thumb_path": PLACEHOLDER_IMAGE,
+            "feed_path": PLACEHOLDER_IMAGE,
+            "caption": _text(rng, 8),
+            "like_count": like_counts[i],
+            "created_at": posted_at[i],
+        }
+        for i in range(scale.posts)
+    ))
+    with get_session() as session:
+        post_ids = [pid for pid, in session.query(Post.id).order_by(Post.id)]
+
+    def like_rows():
+        # La mayoría de los likes llega en los primeros días del post
+        for post_id, n, created_at in zip(post_ids, like_counts, posted_at):
+            for user_id in rng.sample(user_ids, n):
+                liked_at = min(now, created_at + datetime.timedelta(days=rng.expovariate(1 / 3)))
+                yield {"user_id": user_id, "post_id": post_id, "created_at": liked_at}
+    counts["likes"] = _bulk_insert(Like, like_rows())
+
+    def rating_rows():
+        per_catedra = scale.ratings // max(len(catedra_ids), 1)
+        for catedra_id in catedra_ids:
+            for user_id in rng.sample(user_ids, min(per_catedra, len(user_ids))):
+                yield {
+                    "user_id": user_id,
+                    "catedra_id": catedra_id,
+                    "rating": rng.choices([1, 2, 3, 4, 5], weights=[1, 2, 4, 6, 4])[0],
+                    "comment": _text(rng, 6),
+                    "created_at": now - datetime.timedelta(days=rng.randint(0, 720)),
+                }
+    counts["ratings"] = _bulk_insert(Rating, rating_rows())
+
+    with get_session() as session:
+        rebuild_rating_stats(session)
+        rebuild_user_stats(session)
+        trending.rebuild(session)
+    return counts
+
+def describe(scale):
+    return asdict(scale)
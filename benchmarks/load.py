@@ -0,0 +1,240 @@
+"""Prueba de carga de la app completa: sesiones simuladas con AppTest en paralelo.
+
+    python -m benchmarks.load --db /tmp/loop-bench.db --users 8 --rounds 3
+    python -m benchmarks.load --db /tmp/loop-bench.db --compare resultados_anteriores.json
+
+A diferencia de run.py, cada iteración ejecuta `main()` de app.py con
+streamlit.testing.v1.AppTest, así que mide también el armado del árbol de
+widgets, las pestañas por año, los fragmentos y el HTML de las imágenes. Cada
+usuario simulado es un proceso propio (como las sesiones de varios procesos de
+Streamlit sobre la misma base): ingresa con un usuario de datagen y recorre
+las páginas del menú `--rounds` veces, dando un like en el feed en cada vuelta.
+
+Informa p50/p95 de cada página, reruns por segundo del conjunto y, como
+medida de contención de la base, la latencia de las sentencias de escritura
+(en SQLite esperan el bloqueo de escritura) y los errores "database is locked".
+"""
+import argparse
+import datetime
+import json
+import multiprocessing
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import statistics
+import time
+from pathlib import Path
+
+from benchmarks.run import RESULTS_DIR, _percentile
+
+APP_PATH = Path(__file__).resolve().parent.parent / "app.py"
+PAGES = ["Mi Cursada", "Feed Social", "Perfil", "Recursos", "Ranking"]
+LIKE = "Feed Social: like"
+WRITE_PREFIXES = ("INSERT", "UPDATE", "DELETE")
+
+# ----------------------------
+# Sesión simulada (corre en un proceso del pool)
+# ----------------------------
+def _init_worker(env):
+    # Antes de que AppTest importe app.py y con él config/database
+    os.environ.update(env)
+
+def _install_db_probes(engine, writes, errors):
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _start(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(WRITE_PREFIXES):
+            conn.info.setdefault("load_write_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _end(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(WRITE_PREFIXES) and conn.info.get("load_write_start"):
+            writes.append((time.perf_counter() - conn.info["load_write_start"].pop()) * 1000)
+
+    @event.listens_for(engine, "handle_error")
+    def _error(context):
+        errors.append(str(context.original_exception))
+
+def simulate_user(user_name, rounds, seed, timeout):
+    """Una sesión completa. Devuelve tiempos por página, escrituras y errores."""
+    from streamlit.testing.v1 import AppTest
+
+    rng = random.Random(seed)
+    at = AppTest.from_file(str(APP_PATH), default_timeout=timeout)
+    timings = {}
+    exceptions = []
+    runs = 0
+
+    def timed_run(page, action):
+        nonlocal runs
+        start = time.perf_counter()
+        action().run()
+        timings.setdefault(page, []).append((time.perf_counter() - start) * 1000)
+        runs += 1
+        exceptions.extend(f"{page}: {e.value}" for e in at.exception)
+
+    # La primera ejecución importa app.py y sus módulos: no se cuenta
+    at.run()
+    from database import engine
+
+    writes, errors = [], []
+    _install_db_probes(engine, writes, errors)
+
+    started = time.time()
+    at.text_input[0].input(user_name)
+    timed_run("Login", lambda: at.button[0].click())
+    for _ in range(rounds):
+        for page in rng.sample(PAGES, len(PAGES)):
+            timed_run(page, lambda: at.sidebar.radio[0].set_value(page))
+            if page == "Feed Social":
+                likes = [b for b in at.button if str(b.key or "").startswith("like_")]
+                if likes:
+                    timed_run(LIKE, lambda: rng.choice(likes).click())
+    finished = time.time()
+
+    return {
+        "timings": timings,
+        "runs": runs,
+        "started": started,
+        "finished": finished,
+        "writes": writes,
+        "locked": sum("locked" in e for e in errors),
+        "db_errors": len(errors),
+        "exceptions": exceptions,
+    }
+
+def _simulate(args):
+    return simulate_user(*args)
+
+# ----------------------------
+# Informe
+# ----------------------------
+def summarize(results, wall):
+    pages = {}
+    for page in ["Login"] + PAGES + [LIKE]:
+        values = [t for r in results for t in r["timings"].get(page, [])]
+        if values:
+            pages[page] = {
+                "samples": len(values),
+                "p50_ms": round(statistics.median(values), 1),
+                "p95_ms": round(_percentile(values, 95), 1),
+                "mean_ms": round(statistics.fmean(values), 1),
+            }
+    writes = [w for r in results for w in r["writes"]]
+    runs = sum(r["runs"] for r in results)
+    active = max(r["finished"] for r in results) - min(r["started"] for r in results)
+    return {
+        "pages": pages,
+        "reruns": runs,
+        "reruns_per_second": round(runs / active, 2) if active else None,
+        "wall_seconds": round(wall, 1),
+        "contention": {
+            "writes": len(writes),
+            "write_p50_ms": round(statistics.median(writes), 2) if writes else None,
+            "write_p95_ms": round(_percentile(writes, 95), 2) if writes else None,
+            "write_max_ms": round(max(writes), 2) if writes else None,
+            "locked_errors": sum(r["locked"] for r in results),
+            "db_errors": sum(r["db_errors"] for r in results),
+        },
+        "exceptions": [e for r in results for e in r["exceptions"]][:20],
+    }
+
+def compare(current, baseline_path):
+    baseline = json.loads(Path(baseline_path).read_text())
+    print(f"\n{'página':<20}{'p50 antes':>12}{'p50 ahora':>12}{'cambio':>10}")
+    for page, result in current["pages"].items():
+        before = baseline["pages"].get(page)
+        if not before:
+            continue
+        change = (result["p50_ms"] - before["p50_ms"]) / before["p50_ms"] * 100 if before["p50_ms"] else 0.0
+        print(f"{page:<20}{before['p50_ms']:>12.1f}{result['p50_ms']:>12.1f}{change:>+9.1f}%")
+    before, now = baseline.get("reruns_per_second"), current["reruns_per_second"]
+    if before and now:
+        print(f"{'reruns/s':<20}{before:>12.2f}{now:>12.2f}{(now - before) / before * 100:>+9.1f}%")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Prueba de carga de LOOP con sesiones de AppTest")
+    parser.add_argument("--db", default="/tmp/loop-bench.db", help="Archivo SQLite para los datos sintéticos")
+    parser.add_argument("--scale", default="small", help="tiny, small o full")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--users", type=int, default=8, help="Sesiones simultáneas (un proceso cada una)")
+    parser.add_argument("--rounds", type=int, default=3, help="Vueltas por todas las páginas")
+    parser.add_argument("--timeout", type=float, default=120, help="Segundos máximos por rerun")
+    parser.add_argument("--regenerate", action="store_true")
+    parser.add_argument("--output", help="Archivo JSON de salida (por defecto en benchmarks/results/)")
+    parser.add_argument("--compare", help="JSON de una corrida anterior para comparar")
+    args = parser.parse_args(argv)
+
+    db_path = Path(args.db)
+    if args.regenerate:
+        for suffix in ("", "-wal", "-shm"):
+            Path(f"{db_path}{suffix}").unlink(missing_ok=True)
+        shutil.rmtree(f"{db_path}-cache", ignore_errors=True)
+    needs_data = not db_path.exists()
+    env = {
+        "DATABASE_URL": f"sqlite:///{db_path}",
+        "CACHE_DIR": f"{db_path}-cache",
+    }
+    os.environ.update(env)
+
+    from database import engine, get_session
+    from migrations import bootstrap
+    from models import User
+    from benchmarks import datagen
+
+    bootstrap(engine)
+    if needs_data:
+        start = time.perf_counter()
+        counts = datagen.generate(datagen.SCALES[args.scale], seed=args.seed)
+        print(f"Datos generados en {time.perf_counter() - start:.1f}s: {counts}")
+
+    rng = random.Random(args.seed)
+    with get_session() as session:
+        names = [name for name, in session.query(User.name).filter(User.name.like("Usuario %"))]
+    sessions = [
+        (rng.choice(names), args.rounds, args.seed + i, args.timeout)
+        for i in range(args.users)
+    ]
+
+    print(f"{args.users} sesiones x {args.rounds} vueltas por {len(PAGES)} páginas")
+    start = time.perf_counter()
+    # spawn: cada sesión importa la app desde cero, como un proceso de Streamlit
+    ctx = multiprocessing.get_context("spawn")
+    with ctx.Pool(args.users, initializer=_init_worker, initargs=(env,)) as pool:
+        results = pool.map(_simulate, sessions)
+    summary = summarize(results, time.perf_counter() - start)
+
+    for page, r in summary["pages"].items():
+        print(f"{page:<20} p50 {r['p50_ms']:>8.1f} ms  p95 {r['p95_ms']:>8.1f} ms  ({r['samples']} muestras)")
+    c = summary["contention"]
+    print(f"{summary['reruns']} reruns, {summary['reruns_per_second']} por segundo")
+    print(
+        f"Escrituras: {c['writes']}  p50 {c['write_p50_ms']} ms  p95 {c['write_p95_ms']} ms  "
+        f"máx {c['write_max_ms']} ms  bloqueos: {c['locked_errors']}"
+    )
+    for exception in summary["exceptions"]:
+        print(f"Excepción: {exception}")
+
+    report = {
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "scale": args.scale,
+        "users": args.users,
+        "rounds": args.rounds,
+        "seed": args.seed,
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        **summary,
+    }
+    output = Path(args.output) if args.output else RESULTS_DIR / f"load-{report['timestamp'].replace(':', '')}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2, ensure_ascii=False))
+    print(f"Resultados en {output}")
+
+    if args.compare:
+        compare(summary, args.compare)
+
+if __name__ == "__main__":
+    main()
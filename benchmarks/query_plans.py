@@ -0,0 +1,189 @@
+"""Revisa con EXPLAIN QUERY PLAN que ninguna consulta caliente recorra una tabla entera.
+
+    python -m benchmarks.query_plans --db /tmp/loop-bench.db
+
+Corre cada escenario de scenarios.py y las escrituras de las páginas (login,
+like, reseña, guardar TPs, estáticos, cola de subidas) sobre la base de benchmarks,
+captura las sentencias que llegan al motor con sus parámetros y pide el plan
+de cada una. Sale con código 1 si alguna hace `SCAN <tabla>` sin índice sobre
+una tabla que crece con el uso. Las tablas de referencia (materias, TPs,
+cátedras) son chicas y se leen enteras a propósito, así que no cuentan.
+
+Las escrituras modifican la base de benchmarks; el like se pone y se saca.
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import tempfile
+from pathlib import Path
+
+# Tablas que se pueden recorrer enteras: acotadas por el plan de estudios
+FULL_SCAN_ALLOWED = {
+    "subjects", "tps", "catedras", "catedra_rating_stats", "data_versions", "schema_version",
+}
+
+_FULL_SCAN = re.compile(r"^SCAN (\w+)(?: AS (\w+))?$")
+
+def full_scans(plan, aliases):
+    """Tablas del plan (filas de EXPLAIN QUERY PLAN) recorridas sin índice."""
+    scans = []
+    for _, _, _, detail in plan:
+        match = _FULL_SCAN.match(detail)
+        if match is None:
+            continue
+        name = match.group(1)
+        scans.append(aliases.get(name, re.sub(r"_\d+$", "", name)))
+    return scans
+
+def _aliases(statement):
+    # "FROM posts AS posts_1" -> {"posts_1": "posts"}
+    return {alias: table for table, alias in re.findall(r"\b(\w+) AS (\w+)\b", statement)}
+
+def write_paths(rng, ctx):
+    """Las escrituras que hacen las páginas, como funciones (rng, ctx) igual que SCENARIOS."""
+    import services
+    import static_server
+    import upload_queue
+    from database import SessionLocal
+    from models import Post
+
+    def login(rng, ctx):
+        services.get_or_create_user(rng.choice(ctx["user_names"]), 1, "")
+
+    def like_toggle(rng, ctx):
+        user_id, post_id = rng.choice(ctx["user_ids"]), rng.choice(ctx["post_ids"])
+        services.set_like(user_id, post_id, True)
+        services.set_like(user_id, post_id, False)
+
+    def rate(rng, ctx):
+        services.rate_catedra(rng.choice(ctx["user_ids"]), rng.choice(ctx["catedra_ids"]), rng.randint(1, 5))
+
+    def save_tps(rng, ctx):
+        tp_ids = rng.sample(ctx["tp_ids"], 3)
+        services.save_tp_progress(
+            rng.choice(ctx["user_ids"]), {tp_id: (rng.choice(services.TP_STATES), None) for tp_id in tp_ids}
+        )
+
+    def subject_averages(rng, ctx):
+        user_id = rng.choice(ctx["user_ids"])
+        services.get_academic_stats(user_id)
+        services.get_subject_averages(user_id)
+
+    def static_image(rng, ctx):
+        # Cada pedido al servidor de estáticos valida la ruta contra los posts
+        with SessionLocal() as session:
+            post = session.get(Post, rng.choice(ctx["post_ids"]))
+            paths = [post.thumb_path, post.feed_path, post.image_path]
+        for path in paths:
+            static_server.is_public(path)
+
+    def upload_queue_status(rng, ctx):
+        # Lo que hacen el panel de rendimiento y cada worker al buscar trabajo
+        services.get_upload_queue_metrics()
+        with SessionLocal() as session:
+            upload_queue.claim(session)
+            session.rollback()
+
+    return {
+        "login": login,
+        "like_toggle": like_toggle,
+        "rate_catedra": rate,
+        "save_tp_progress": save_tps,
+        "academic_stats": subject_averages,
+        "static_image": static_image,
+        "upload_queue": upload_queue_status,
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Planes de las consultas calientes de LOOP")
+    parser.add_argument("--db", default="/tmp/loop-bench.db", help="Archivo SQLite para los datos sintéticos")
+    parser.add_argument("--scale", default="tiny", help="Escala si hay que generar la base")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--verbose", action="store_true", help="Mostrar el plan de cada consulta")
+    args = parser.parse_args(argv)
+
+    db_path = Path(args.db)
+    needs_data = not db_path.exists()
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    # Caché compartido vacío: si no, las consultas que cachea no llegarían a la base
+    os.environ["CACHE_DIR"] = tempfile.mkdtemp(prefix="loop-plans-cache-")
+
+    from sqlalchemy import event
+
+    from database import engine, get_session
+    from migrations import bootstrap
+    from models import User, Post, Catedra, TP
+    from benchmarks import datagen
+    from benchmarks.scenarios import SCENARIOS
+
+    bootstrap(engine)
+    if needs_data:
+        counts = datagen.generate(datagen.SCALES[args.scale], seed=args.seed)
+        print(f"Datos generados: {counts}")
+
+    with get_session() as session:
+        ctx = {
+            "user_ids": [uid for uid, in session.query(User.id)],
+            "user_names": [name for name, in session.query(User.name).limit(50)],
+            "post_ids": [pid for pid, in session.query(Post.id).limit(500)],
+            "catedra_ids": [cid for cid, in session.query(Catedra.id)],
+            "tp_ids": [tid for tid, in session.query(TP.id)],
+        }
+
+    captured = []
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _capture(conn, cursor, statement, parameters, context, executemany):
+        if executemany:
+            parameters = parameters[0] if parameters else ()
+        captured.append((statement, parameters))
+
+    paths = {**SCENARIOS, **write_paths(random.Random(args.seed), ctx)}
+    statements = {}
+    for name, func in paths.items():
+        captured.clear()
+        func(random.Random(args.seed), ctx)
+        # Los planes se piden con la misma conexión cruda, fuera del listener
+        statements[name] = [
+            (s, p) for s, p in captured
+            if not s.lstrip().upper().startswith(("EXPLAIN", "PRAGMA", "BEGIN", "COMMIT", "ROLLBACK"))
+        ]
+    event.remove(engine, "before_cursor_execute", _capture)
+
+    failures = 0
+    with engine.connect() as conn:
+        cursor = conn.connection.dbapi_connection.cursor()
+        for name, queries in statements.items():
+            seen = set()
+            bad = []
+            for statement, params in queries:
+                if statement in seen:
+                    continue
+                seen.add(statement)
+                plan = cursor.execute(f"EXPLAIN QUERY PLAN {statement}", params).fetchall()
+                scans = [t for t in full_scans(plan, _aliases(statement)) if t not in FULL_SCAN_ALLOWED]
+                if scans:
+                    bad.append((statement, plan, scans))
+                if args.verbose:
+                    print(f"\n[{name}] {' '.join(statement.split())}")
+                    for row in plan:
+                        print(f"    {row[3]}")
+            status = "OK" if not bad else "SCAN"
+            print(f"{name:<20} {len(seen):>3} consultas  {status}")
+            for statement, plan, scans in bad:
+                failures += 1
+                print(f"    recorre {', '.join(sorted(set(scans)))}: {' '.join(statement.split())}")
+                for row in plan:
+                    print(f"        {row[3]}")
+        cursor.close()
+
+    if failures:
+        print(f"\n{failures} consulta(s) recorren tablas enteras")
+        return 1
+    print("\nNinguna consulta caliente recorre tablas enteras")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,141 @@
+"""Corre los escenarios de benchmark y guarda los resultados en JSON.
+
+    python -m benchmarks.run --scale small --db /tmp/loop-bench.db
+    python -m benchmarks.run --db /tmp/loop-bench.db --compare resultados_anteriores.json
+
+La base se genera sólo si no existe; con --regenerate se borra y se vuelve a
+crear. Cada escenario informa p50/p95 de latencia, consultas por iteración y
+pico de memoria de Python (tracemalloc).
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import statistics
+import time
+import tracemalloc
+from pathlib import Path
+
+RESULTS_DIR = Path(__file__).parent / "results"
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+def run_scenario(func, ctx, iterations, warmup, seed, query_counter):
+    rng = random.Random(seed)
+    for _ in range(warmup):
+        func(rng, ctx)
+
+    timings = []
+    queries_before = query_counter["count"]
+    tracemalloc.start()
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func(rng, ctx)
+        timings.append((time.perf_counter() - start) * 1000)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "iterations": iterations,
+        "p50_ms": round(statistics.median(timings), 3),
+        "p95_ms": round(_percentile(timings, 95), 3),
+        "mean_ms": round(statistics.fmean(timings), 3),
+        "queries_per_iteration": round((query_counter["count"] - queries_before) / iterations, 2),
+        "peak_memory_kib": round(peak / 1024, 1),
+    }
+
+def compare(current, baseline_path):
+    baseline = json.loads(Path(baseline_path).read_text())["scenarios"]
+    print(f"\n{'escenario':<20}{'p50 antes':>12}{'p50 ahora':>12}{'cambio':>10}")
+    for name, result in current.items():
+        before = baseline.get(name)
+        if not before:
+            continue
+        change = (result["p50_ms"] - before["p50_ms"]) / before["p50_ms"] * 100 if before["p50_ms"] else 0.0
+        print(f"{name:<20}{before['p50_ms']:>12.2f}{result['p50_ms']:>12.2f}{change:>+9.1f}%")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks de acceso a datos de LOOP")
+    parser.add_argument("--db", default="/tmp/loop-bench.db", help="Archivo SQLite para los datos sintéticos")
+    parser.add_argument("--scale", default="small", help="tiny, small o full")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--scenario", action="append", help="Correr sólo estos escenarios")
+    parser.add_argument("--regenerate", action="store_true")
+    parser.add_argument("--output", help="Archivo JSON de salida (por defecto en benchmarks/results/)")
+    parser.add_argument("--compare", help="JSON de una corrida anterior para comparar")
+    args = parser.parse_args(argv)
+
+    db_path = Path(args.db)
+    if args.regenerate:
+        for suffix in ("", "-wal", "-shm"):
+            Path(f"{db_path}{suffix}").unlink(missing_ok=True)
+        shutil.rmtree(f"{db_path}-cache", ignore_errors=True)
+    needs_data = not db_path.exists()
+    # La URL tiene que estar definida antes de importar database/app
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    # El caché compartido de la corrida vive junto a la base y se descarta con ella
+    os.environ.setdefault("CACHE_DIR", f"{db_path}-cache")
+
+    from sqlalchemy import event
+
+    from database import engine
+    from migrations import bootstrap
+    from models import User
+    from database import get_session
+    from benchmarks import datagen
+    from benchmarks.scenarios import SCENARIOS
+
+    scale = datagen.SCALES[args.scale]
+    bootstrap(engine)
+    if needs_data:
+        start = time.perf_counter()
+        counts = datagen.generate(scale, seed=args.seed)
+        print(f"Datos generados en {time.perf_counter() - start:.1f}s: {counts}")
+
+    query_counter = {"count": 0}
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _count_query(conn, cursor, statement, parameters, context, executemany):
+        query_counter["count"] += 1
+
+    with get_session() as session:
+        ctx = {"user_ids": [uid for uid, in session.query(User.id)]}
+
+    names = args.scenario or list(SCENARIOS)
+    results = {}
+    for name in names:
+        results[name] = run_scenario(SCENARIOS[name], ctx, args.iterations, args.warmup, args.seed, query_counter)
+        r = results[name]
+        print(
+            f"{name:<20} p50 {r['p50_ms']:>9.2f} ms  p95 {r['p95_ms']:>9.2f} ms  "
+            f"{r['queries_per_iteration']:>6} consultas  {r['peak_memory_kib']:>9.1f} KiB"
+        )
+
+    report = {
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "scale": args.scale,
+        "scale_params": datagen.describe(scale),
+        "seed": args.seed,
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "scenarios": results,
+    }
+    output = Path(args.output) if args.output else RESULTS_DIR / f"bench-{report['timestamp'].replace(':', '')}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2, ensure_ascii=False))
+    print(f"Resultados en {output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+if __name__ == "__main__":
+    main()
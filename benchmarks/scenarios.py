@@ -0,0 +1,60 @@
+"""Escenarios cronometrados: el acceso a datos de cada página de app.py (services.py).
+
+Cada escenario recibe un `random.Random` y ejecuta lo que la página consulta en
+una visita típica, sin Streamlit de por medio.
+"""
+import services
+from refdata import get_reference_data
+
+def _random_user(rng, ctx):
+    return rng.choice(ctx["user_ids"])
+
+def dashboard(rng, ctx):
+    services.get_curriculum_snapshot(_random_user(rng, ctx))
+
+def feed_first_page(rng, ctx):
+    posts, _ = services.get_feed_page()
+    services.get_liked_post_ids(_random_user(rng, ctx), [p.id for p in posts])
+
+def feed_five_pages(rng, ctx):
+    # Un usuario que apretó "Cargar más" cuatro veces
+    user_id = _random_user(rng, ctx)
+    cursor = None
+    for _ in range(5):
+        posts, cursor = services.get_feed_page(cursor)
+        services.get_liked_post_ids(user_id, [p.id for p in posts])
+        if cursor is None:
+            break
+
+def feed_trending(rng, ctx):
+    user_id = _random_user(rng, ctx)
+    cursor = None
+    for _ in range(2):
+        posts, cursor = services.get_trending_page(user_id, cursor)
+        services.get_liked_post_ids(user_id, [p.id for p in posts])
+        if cursor is None:
+            break
+
+def profile(rng, ctx):
+    services.get_profile_data(_random_user(rng, ctx))
+
+def resources(rng, ctx):
+    subjects = get_reference_data().subjects
+    services.get_resources_for_subject(rng.choice(subjects).id)
+
+def resources_search(rng, ctx):
+    services.search_content(rng.choice(["apuntes de estructuras", "planta", "hormigon armado", "maqueta"]))
+
+def ranking(rng, ctx):
+    services.get_catedra_ranking(_random_user(rng, ctx))
+
+SCENARIOS = {
+    "dashboard": dashboard,
+    "feed_first_page": feed_first_page,
+    "feed_five_pages": feed_five_pages,
+    "feed_trending": feed_trending,
+    "profile": profile,
+    "resources": resources,
+    "resources_search": resources_search,
+    "ranking": ranking,
+}
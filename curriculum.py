@@ -0,0 +1,256 @@
+"""Importación del plan de estudios (materias, TPs, cátedras y apuntes) desde JSON o CSV.
+
+El plan se valida completo antes de tocar la base, se compara contra lo que ya
+hay y se aplica con inserts/updates masivos (executemany) en una sola
+transacción. Las claves naturales son: materia por nombre, TP por (materia,
+orden), cátedra por (materia, nombre) y apunte por (materia, título). Lo que
+está en la base y no en el plan se informa pero no se borra, porque puede
+tener progreso, reseñas o publicaciones asociadas.
+
+JSON: {"subjects": [{"name", "year", "tps": [...], "catedras": [...],
+"resources": [{"title", "description"}]}]}. Los TPs se numeran en el orden
+de la lista.
+
+CSV (una fila por elemento): año,materia,tipo,nombre,descripcion con tipo
+"materia", "tp", "catedra" o "apunte".
+"""
+import csv
+import json
+from collections import namedtuple
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from sqlalchemy import insert, update
+
+from config import CURRICULUM_FILE
+from models import Subject, TP, Catedra, Resource
+from refdata import bump_version
+
+YEARS = range(1, 7)
+
+PlanSubject = namedtuple("PlanSubject", "name year tps catedras resources")
+PlanResource = namedtuple("PlanResource", "title description")
+
+class CurriculumError(ValueError):
+    """El plan no es válido; `errors` tiene un mensaje por problema encontrado."""
+
+    def __init__(self, errors):
+        super().__init__("\n".join(errors))
+        self.errors = errors
+
+# ----------------------------
+# Lectura y validación
+# ----------------------------
+def load_file(path=CURRICULUM_FILE):
+    """Lee y valida un plan en JSON o CSV (según la extensión)."""
+    path = Path(path)
+    with open(path, encoding="utf-8", newline="") as f:
+        if path.suffix.lower() == ".csv":
+            return parse_csv(f)
+        return parse_json(json.load(f))
+
+def parse_json(data):
+    subjects = []
+    for entry in data.get("subjects", []):
+        subjects.append(PlanSubject(
+            name=(entry.get("name") or "").strip(),
+            year=entry.get("year"),
+            tps=tuple((tp or "").strip() for tp in entry.get("tps", [])),
+            catedras=tuple((c or "").strip() for c in entry.get("catedras", [])),
+            resources=tuple(
+                PlanResource((r.get("title") or "").strip(), r.get("description") or "")
+                for r in entry.get("resources", [])
+            ),
+        ))
+    return validate(subjects)
+
+def parse_csv(f):
+    subjects = {}
+    errors = []
+    for line, row in enumerate(csv.DictReader(f), start=2):
+        name = (row.get("materia") or "").strip()
+        kind = (row.get("tipo") or "materia").strip().lower()
+        item = (row.get("nombre") or "").strip()
+        try:
+            year = int(row.get("año") or 0)
+        except ValueError:
+            year = None
+        subject = subjects.setdefault(name, {"year": year, "tps": [], "catedras": [], "resources": []})
+        if subject["year"] != year:
+            errors.append(f"Línea {line}: '{name}' ya figura en el año {subject['year']}")
+        if kind == "tp":
+            subject["tps"].append(item)
+        elif kind == "catedra":
+            subject["catedras"].append(item)
+        elif kind == "apunte":
+            subject["resources"].append(PlanResource(item, row.get("descripcion") or ""))
+        elif kind != "materia":
+            errors.append(f"Línea {line}: tipo desconocido '{kind}'")
+    if errors:
+        raise CurriculumError(errors)
+    return validate([
+        PlanSubject(name, s["year"], tuple(s["tps"]), tuple(s["catedras"]), tuple(s["resources"]))
+        for name, s in subjects.items()
+    ])
+
+def validate(subjects):
+    """Devuelve la lista de PlanSubject o lanza CurriculumError con todos los problemas."""
+    errors = []
+    seen = set()
+    for subject in subjects:
+        label = subject.name or "(sin nombre)"
+        if not subject.name:
+            errors.append("Hay una materia sin nombre")
+        elif subject.name in seen:
+            errors.append(f"La materia '{label}' está repetida")
+        seen.add(subject.name)
+        if subject.year not in YEARS:
+            errors.append(f"'{label}': el año debe estar entre {YEARS[0]} y {YEARS[-1]}")
+        for kind, names in (
+            ("TP", subject.tps),
+            ("cátedra", subject.catedras),
+            ("apunte", [r.title for r in subject.resources]),
+        ):
+            if any(not n for n in names):
+                errors.append(f"'{label}': hay un {kind} sin nombre")
+            if len(set(names)) != len(names):
+                errors.append(f"'{label}': hay un {kind} repetido")
+    if errors:
+        raise CurriculumError(errors)
+    return subjects
+
+# ----------------------------
+# Diferencias contra la base
+# ----------------------------
+@dataclass
+class CurriculumDiff:
+    # filas listas para insert(...)/update(...) masivos; las de TPs, cátedras y
+    # apuntes de materias nuevas llevan "subject" en lugar de "subject_id"
+    new_subjects: list = field(default_factory=list)
+    changed_subjects: list = field(default_factory=list)
+    new_tps: list = field(default_factory=list)
+    changed_tps: list = field(default_factory=list)
+    new_catedras: list = field(default_factory=list)
+    new_resources: list = field(default_factory=list)
+    changed_resources: list = field(default_factory=list)
+    only_in_db: list = field(default_factory=list)   # descripciones, sólo informativas
+
+    def is_empty(self):
+        return not any((
+            self.new_subjects, self.changed_subjects, self.new_tps, self.changed_tps,
+            self.new_catedras, self.new_resources, self.changed_resources,
+        ))
+
+    def summary(self):
+        return {
+            "materias nuevas": len(self.new_subjects),
+            "materias modificadas": len(self.changed_subjects),
+            "TPs nuevos": len(self.new_tps),
+            "TPs modificados": len(self.changed_tps),
+            "cátedras nuevas": len(self.new_catedras),
+            "apuntes nuevos": len(self.new_resources),
+            "apuntes modificados": len(self.changed_resources),
+            "sólo en la base": len(self.only_in_db),
+        }
+
+def diff(session, plan):
+    """Compara el plan con la base (cuatro consultas) y devuelve un CurriculumDiff."""
+    subjects = {name: (id_, year) for id_, name, year in session.query(Subject.id, Subject.name, Subject.year)}
+    tps = {(s, o): (id_, name) for id_, s, o, name in session.query(TP.id, TP.subject_id, TP.order, TP.name)}
+    catedras = {(s, name) for s, name in session.query(Catedra.subject_id, Catedra.name)}
+    resources = {
+        (s, title): (id_, description)
+        for id_, s, title, description in session.query(
+            Resource.id, Resource.subject_id, Resource.title, Resource.description
+        )
+    }
+
+    result = CurriculumDiff()
+    planned = {"subjects": set(), "tps": set(), "catedras": set(), "resources": set()}
+    for subject in plan:
+        if subject.name in subjects:
+            subject_id, year = subjects[subject.name]
+            if year != subject.year:
+                result.changed_subjects.append({"id": subject_id, "year": subject.year})
+            owner = {"subject_id": subject_id}
+        else:
+            subject_id = None
+            result.new_subjects.append({"name": subject.name, "year": subject.year})
+            owner = {"subject": subject.name}
+        planned["subjects"].add(subject.name)
+
+        for order, name in enumerate(subject.tps, start=1):
+            key = (subject_id, order)
+            planned["tps"].add(key)
+            if key not in tps:
+                result.new_tps.append({**owner, "order": order, "name": name})
+            elif tps[key][1] != name:
+                result.changed_tps.append({"id": tps[key][0], "name": name})
+        for name in subject.catedras:
+            key = (subject_id, name)
+            planned["catedras"].add(key)
+            if key not in catedras:
+                result.new_catedras.append({**owner, "name": name})
+        for res in subject.resources:
+            key = (subject_id, res.title)
+            planned["resources"].add(key)
+            if key not in resources:
+                result.new_resources.append({**owner, "title": res.title, "description": res.description})
+            elif (resources[key][1] or "") != res.description:
+                result.changed_resources.append({"id": resources[key][0], "description": res.description})
+
+    # De las materias del plan, lo que sobra en la base
+    planned_ids = {subjects[name][0]: name for name in planned["subjects"] if name in subjects}
+    result.only_in_db += [f"materia '{name}'" for name in subjects if name not in planned["subjects"]]
+    result.only_in_db += [
+        f"TP {order} de '{planned_ids[s]}'"
+        for s, order in sorted(tps) if s in planned_ids and (s, order) not in planned["tps"]
+    ]
+    result.only_in_db += [
+        f"cátedra '{name}' de '{planned_ids[s]}'"
+        for s, name in sorted(catedras) if s in planned_ids and (s, name) not in planned["catedras"]
+    ]
+    return result
+
+# ----------------------------
+# Aplicación
+# ----------------------------
+def apply(session, changes, update_existing=True):
+    """Aplica un CurriculumDiff con operaciones masivas, dentro de la transacción del llamador.
+
+    Con `update_existing=False` sólo se agregan filas nuevas.
+    """
+    if changes.new_subjects:
+        session.execute(insert(Subject), changes.new_subjects)
+        names = [row["name"] for row in changes.new_subjects]
+        new_ids = dict(session.query(Subject.name, Subject.id).filter(Subject.name.in_(names)))
+    else:
+        new_ids = {}
+
+    def resolve(rows):
+        # Completa subject_id en las filas que dependen de una materia recién creada
+        return [
+            {k: v for k, v in row.items() if k != "subject"} | {"subject_id": new_ids[row["subject"]]}
+            if "subject" in row else row
+            for row in rows
+        ]
+
+    for model, rows in ((TP, changes.new_tps), (Catedra, changes.new_catedras), (Resource, changes.new_resources)):
+        if rows:
+            session.execute(insert(model), resolve(rows))
+    if update_existing:
+        for model, rows in (
+            (Subject, changes.changed_subjects),
+            (TP, changes.changed_tps),
+            (Resource, changes.changed_resources),
+        ):
+            if rows:
+                session.execute(update(model), rows)
+    bump_version(session)
+
+def import_plan(session, plan, update_existing=True, dry_run=False):
+    """Compara y (salvo `dry_run`) aplica el plan. Devuelve el CurriculumDiff."""
+    changes = diff(session, plan)
+    if not dry_run and not changes.is_empty():
+        apply(session, changes, update_existing=update_existing)
+    return changes
@@ -1,14 +1,57 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, inspect, text, UniqueConstraint
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
 from contextlib import contextmanager
 from config import DATABASE_URL
 
-engine = create_engine(
-    DATABASE_URL,
-    echo=False,                  # Cambiar a True para depuración
-    connect_args={"check_same_thread": False} if "sqlite" in DATABASE_URL else {}
-)
+# Perfil de SQLite para producción (se aplica a cada conexión nueva)
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",         # lectores y un escritor en paralelo
+    "synchronous": "NORMAL",       # seguro con WAL, sin fsync por commit
+    "busy_timeout": 5000,          # ms de espera antes de "database is locked"
+    "cache_size": -64000,          # en KiB (64 MB)
+    "mmap_size": 256 * 1024 * 1024,
+    "temp_store": "MEMORY",
+}
+
+# Pool para los hilos de Streamlit (uno por sesión activa)
+POOL_SIZE = 10
+MAX_OVERFLOW = 20
+POOL_RECYCLE = 1800                # segundos, sólo para servidores de base de datos
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+
+def create_db_engine(url=DATABASE_URL, echo=False):
+    """Crea el engine con la configuración adecuada según el tipo de base.
+
+    SQLite: perfil de PRAGMAs de SQLITE_PRAGMAS y pool compartido entre hilos.
+    PostgreSQL y otros: pool dimensionado, pre-ping y reciclado de conexiones.
+    """
+    url = make_url(url)
+    if url.get_backend_name() != "sqlite":
+        return create_engine(
+            url,
+            echo=echo,
+            pool_size=POOL_SIZE,
+            max_overflow=MAX_OVERFLOW,
+            pool_pre_ping=True,
+            pool_recycle=POOL_RECYCLE,
+        )
+
+    options = {"connect_args": {"check_same_thread": False}}
+    if url.database not in (None, "", ":memory:"):
+        # Las bases en memoria usan su propio pool de una sola conexión
+        options.update(pool_size=POOL_SIZE, max_overflow=MAX_OVERFLOW)
+    engine = create_engine(url, echo=echo, **options)
+    event.listen(engine, "connect", _apply_sqlite_pragmas)
+    return engine
+
+engine = create_db_engine(DATABASE_URL)
 SessionLocal = sessionmaker(bind=engine, expire_on_commit=False)
 Base = declarative_base()
 
@@ -24,3 +67,92 @@ def get_session() -> Session:
         raise
     finally:
         session.close()
+
+def dialect_insert(session):
+    """Devuelve el `insert` del dialecto activo, con soporte de ON CONFLICT."""
+    if session.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert
+
+def add_missing_columns(bind, metadata=None):
+    """Agrega a las tablas existentes las columnas de los modelos que les faltan.
+
+    `create_all` no modifica tablas ya creadas, y las bases generadas por versiones
+    anteriores de app.py no tienen todas las columnas de models.py.
+    """
+    metadata = metadata or Base.metadata
+    inspector = inspect(bind)
+    existing_tables = set(inspector.get_table_names())
+    with bind.begin() as conn:
+        for table in metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            present = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in present:
+                    continue
+                col_type = column.type.compile(dialect=bind.dialect)
+                ddl = f'ALTER TABLE {table.name} ADD COLUMN "{column.name}" {col_type}'
+                if column.server_default is not None:
+                    ddl += f" DEFAULT {column.server_default.arg}"
+                conn.execute(text(ddl))
+
+def add_missing_unique_constraints(bind, metadata=None):
+    """Crea como índices únicos los UniqueConstraint que faltan en tablas existentes.
+
+    Los upserts (ON CONFLICT) necesitan la restricción. Si hay filas duplicadas de
+    versiones anteriores se conserva la más reciente (mayor id).
+    """
+    metadata = metadata or Base.metadata
+    inspector = inspect(bind)
+    existing_tables = set(inspector.get_table_names())
+    with bind.begin() as conn:
+        for table in metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            present = {tuple(uc["column_names"]) for uc in inspector.get_unique_constraints(table.name)}
+            present |= {tuple(ix["column_names"]) for ix in inspector.get_indexes(table.name) if ix["unique"]}
+            for constraint in table.constraints:
+                if not isinstance(constraint, UniqueConstraint):
+                    continue
+                columns = tuple(c.name for c in constraint.columns)
+                if columns in present:
+                    continue
+                quote = bind.dialect.identifier_preparer.quote
+                table_name = quote(table.name)
+                cols = ", ".join(quote(c) for c in columns)
+                # Las filas con NULL no violan la restricción única
+                not_null = " AND ".join(f"{quote(c)} IS NOT NULL" for c in columns)
+                conn.execute(text(
+                    f"DELETE FROM {table_name} WHERE {not_null} AND id NOT IN "
+                    f"(SELECT MAX(id) FROM {table_name} WHERE {not_null} GROUP BY {cols})"
+                ))
+                conn.execute(text(
+                    f"CREATE UNIQUE INDEX {quote(constraint.name)} ON {table_name} ({cols})"
+                ))
+
+def sync_indexes(bind, metadata=None):
+    """Deja en las tablas existentes exactamente los índices `ix_*` declarados en los modelos.
+
+    Crea los que faltan y borra los que ya no están declarados (índices de una
+    columna reemplazados por compuestos). No toca los índices de restricciones
+    únicas ni los de tablas que no son de los modelos.
+    """
+    metadata = metadata or Base.metadata
+    inspector = inspect(bind)
+    existing_tables = set(inspector.get_table_names())
+    quote = bind.dialect.identifier_preparer.quote
+    with bind.begin() as conn:
+        for table in metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            declared = {index.name: index for index in table.indexes}
+            present = {ix["name"] for ix in inspector.get_indexes(table.name)}
+            for name in present - declared.keys():
+                if name.startswith("ix_"):
+                    conn.execute(text(f"DROP INDEX {quote(name)}"))
+            for name, index in declared.items():
+                if name not in present:
+                    index.create(conn)
@@ -0,0 +1,135 @@
+"""Validación y derivados de imágenes (miniatura, ancho de feed y original limpio).
+
+Todo corre en un pool de procesos, nunca en el hilo del script de Streamlit:
+los workers de upload_queue.py le pasan cada imagen subida a `process_upload`
+y guardan el resultado con `apply_derivatives`.
+"""
+import io
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image, ImageOps, features
+
+# (nombre, ancho máximo en px, calidad)
+VARIANTS = (
+    ("thumb", 400, 75),
+    ("feed", 1080, 82),
+)
+ORIGINAL_QUALITY = 90
+
+# Límites de las imágenes subidas
+MAX_UPLOAD_BYTES = 20 * 1024 * 1024
+MAX_SIDE = 10_000          # px del lado más largo
+MAX_PIXELS = 40_000_000
+ALLOWED_FORMATS = {"JPEG", "PNG", "WEBP", "GIF"}
+
+_FORMAT = "WEBP" if features.check("webp") else "JPEG"
+_EXTENSION = ".webp" if _FORMAT == "WEBP" else ".jpg"
+
+def _encode(img, quality):
+    has_alpha = img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info)
+    img = img.convert("RGBA" if has_alpha and _FORMAT == "WEBP" else "RGB")
+    out = io.BytesIO()
+    # Sin `exif=`: los metadatos (GPS, cámara, etc.) no se copian al derivado
+    options = {"quality": quality, "icc_profile": img.info.get("icc_profile")}
+    if _FORMAT == "WEBP":
+        options["method"] = 4
+    else:
+        options.update(optimize=True, progressive=True)
+    img.save(out, _FORMAT, **options)
+    return out.getvalue()
+
+class InvalidImage(ValueError):
+    """La imagen subida no pasó la validación; el mensaje es para el usuario."""
+
+def validate_image(data):
+    """Controla tamaño, formato real (no la extensión), integridad y dimensiones."""
+    if len(data) > MAX_UPLOAD_BYTES:
+        raise InvalidImage(f"La imagen supera los {MAX_UPLOAD_BYTES // (1024 * 1024)} MB")
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            fmt, (width, height) = img.format, img.size
+            img.verify()
+    except Image.DecompressionBombError:
+        raise InvalidImage("La imagen es demasiado grande") from None
+    except Exception:
+        raise InvalidImage("El archivo no es una imagen válida") from None
+    if fmt not in ALLOWED_FORMATS:
+        raise InvalidImage(f"Formato no admitido ({fmt})")
+    if max(width, height) > MAX_SIDE or width * height > MAX_PIXELS:
+        raise InvalidImage(f"La imagen mide {width}x{height} px; el máximo es {MAX_SIDE} px por lado")
+
+def process_upload(data):
+    """Valida una imagen subida y genera sus derivados (ver render_derivatives)."""
+    validate_image(data)
+    return render_derivatives(data)
+
+def render_derivatives(data):
+    """Genera todas las variantes de una imagen.
+
+    Devuelve {nombre: (bytes, extensión)} con "original" además de VARIANTS.
+    Es una función pura para poder ejecutarse en otro proceso.
+    """
+    with Image.open(io.BytesIO(data)) as src:
+        img = ImageOps.exif_transpose(src)
+        img.load()
+
+    result = {"original": (_encode(img, ORIGINAL_QUALITY), _EXTENSION)}
+    for name, max_width, quality in VARIANTS:
+        variant = img.copy()
+        if variant.width > max_width:
+            height = round(variant.height * max_width / variant.width)
+            variant = variant.resize((max_width, height), Image.LANCZOS)
+        result[name] = (_encode(variant, quality), _EXTENSION)
+    return result
+
+def pick_image_path(post, width):
+    """Ruta de la variante más chica que cubre `width` px, o el original."""
+    for name, max_width, _ in VARIANTS:
+        path = getattr(post, f"{name}_path", None)
+        if path and width <= max_width:
+            return path
+    return post.image_path
+
+# ----------------------------
+# Pool de procesos
+# ----------------------------
+_executor = None
+_executor_lock = threading.Lock()
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # spawn: el servidor de Streamlit tiene hilos, fork no es seguro
+            _executor = ProcessPoolExecutor(
+                max_workers=max(1, min(2, os.cpu_count() or 1)),
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _executor
+
+def reset_executor(broken):
+    """Descarta `broken` si sigue siendo el pool actual; el próximo get_executor crea otro.
+
+    Un ProcessPoolExecutor cuyo proceso murió (OOM, segfault) queda roto para
+    siempre: cada submit posterior falla con BrokenProcessPool.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is broken:
+            _executor = None
+    broken.shutdown(wait=False, cancel_futures=True)
+
+def apply_derivatives(session, post, derivatives):
+    """Guarda los derivados en el almacén y los asigna al post (sin commit)."""
+    from storage import blob_store
+
+    uploaded_path = post.image_path
+    for name, _, _ in VARIANTS:
+        setattr(post, f"{name}_path", blob_store.put(session, *derivatives[name]))
+    post.image_path = blob_store.put(session, *derivatives["original"])
+    # El archivo subido tal cual (con EXIF) deja de estar referenciado
+    if uploaded_path:
+        blob_store.release(session, uploaded_path)
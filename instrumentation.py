@@ -0,0 +1,153 @@
+"""Instrumentación de consultas por ejecución del script de Streamlit.
+
+Se engancha a los eventos de cursor del engine y acumula, para la ejecución en
+curso del hilo, cantidad de consultas, tiempo total en la base, las más lentas
+y cuántas veces se repite cada "forma" de sentencia. Al terminar la ejecución
+se escribe una línea JSON en logs/queries.jsonl (rotativo) y se avisa de
+posibles N+1.
+"""
+import json
+import logging
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from logging.handlers import RotatingFileHandler
+
+from sqlalchemy import event
+
+from config import LOG_DIR
+
+N_PLUS_ONE_THRESHOLD = 10   # repeticiones de la misma sentencia en una ejecución
+SLOWEST_KEPT = 5
+LOG_MAX_BYTES = 5 * 1024 * 1024
+LOG_BACKUPS = 5
+
+logger = logging.getLogger(__name__)
+
+_current_run = ContextVar("current_run", default=None)
+_installed = set()
+_install_lock = threading.Lock()
+_query_log = None
+
+_WHITESPACE = re.compile(r"\s+")
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_PARAM_LISTS = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+
+def fingerprint(statement):
+    """Forma normalizada de una sentencia: sin literales ni listas de parámetros."""
+    shape = _WHITESPACE.sub(" ", statement).strip()
+    shape = _LITERALS.sub("?", shape)
+    return _PARAM_LISTS.sub("(?, ...)", shape)
+
+@dataclass
+class RunStats:
+    page: str = None
+    started_at: float = field(default_factory=time.perf_counter)
+    query_count: int = 0
+    db_time: float = 0.0
+    slowest: list = field(default_factory=list)     # [(segundos, sentencia)]
+    shapes: Counter = field(default_factory=Counter)
+
+    def record(self, statement, elapsed):
+        self.query_count += 1
+        self.db_time += elapsed
+        self.shapes[fingerprint(statement)] += 1
+        if len(self.slowest) < SLOWEST_KEPT or elapsed > self.slowest[-1][0]:
+            self.slowest.append((elapsed, statement))
+            self.slowest.sort(key=lambda item: item[0], reverse=True)
+            del self.slowest[SLOWEST_KEPT:]
+
+    def repeated(self, threshold=N_PLUS_ONE_THRESHOLD):
+        return [(shape, count) for shape, count in self.shapes.most_common() if count > threshold]
+
+    def as_dict(self):
+        return {
+            "page": self.page,
+            "queries": self.query_count,
+            "db_ms": round(self.db_time * 1000, 2),
+            "wall_ms": round((time.perf_counter() - self.started_at) * 1000, 2),
+            "slowest": [{"ms": round(t * 1000, 2), "sql": _WHITESPACE.sub(" ", sql)[:500]} for t, sql in self.slowest],
+            "repeated": [{"count": c, "sql": shape[:500]} for shape, c in self.shapes.most_common(5) if c > 1],
+            "n_plus_one": [shape[:500] for shape, _ in self.repeated()],
+        }
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get("query_start")
+    if not started:
+        return   # la consulta empezó antes de `install` (otro hilo)
+    elapsed = time.perf_counter() - started.pop()
+    stats = _current_run.get()
+    if stats is not None:
+        stats.record(statement, elapsed)
+
+def install(engine):
+    """Registra los eventos en el engine (una sola vez por engine)."""
+    with _install_lock:
+        if id(engine) in _installed:
+            return
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+        _installed.add(id(engine))
+
+def start_run(page=None):
+    stats = RunStats(page=page)
+    _current_run.set(stats)
+    return stats
+
+def current_run():
+    return _current_run.get()
+
+def set_page(page):
+    stats = _current_run.get()
+    if stats is not None:
+        stats.page = page
+
+def finish_run(user_id=None):
+    """Cierra la ejecución en curso: la registra en el log y avisa de N+1."""
+    stats = _current_run.get()
+    if stats is None:
+        return None
+    _current_run.set(None)
+
+    summary = stats.as_dict()
+    for shape in summary["n_plus_one"]:
+        logger.warning("Posible N+1 en '%s': %s", stats.page, shape)
+    _get_query_log().info(json.dumps({
+        "ts": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "user_id": user_id,
+        **summary,
+    }, ensure_ascii=False))
+    return stats
+
+@contextmanager
+def track(page, user_id=None):
+    """Mide un bloque fuera de la ejecución completa (p. ej. el callback de un fragmento)."""
+    outer = _current_run.get()
+    stats = start_run(page)
+    try:
+        yield stats
+    finally:
+        finish_run(user_id)
+        _current_run.set(outer)
+
+def _get_query_log():
+    global _query_log
+    with _install_lock:
+        if _query_log is None:
+            LOG_DIR.mkdir(exist_ok=True)
+            handler = RotatingFileHandler(
+                LOG_DIR / "queries.jsonl", maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUPS, encoding="utf-8"
+            )
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            _query_log = logging.getLogger("loop.queries")
+            _query_log.setLevel(logging.INFO)
+            _query_log.propagate = False
+            _query_log.addHandler(handler)
+        return _query_log
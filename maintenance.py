@@ -0,0 +1,280 @@
+"""Tareas de mantenimiento que se corren fuera de Streamlit.
+
+Uso: python maintenance.py <tarea>
+"""
+import argparse
+import time
+from concurrent.futures.process import BrokenProcessPool
+
+from sqlalchemy import case, func, insert, select
+
+from config import CURRICULUM_FILE
+from database import SessionLocal, engine, get_session
+from models import Post, Like, Rating, CatedraRatingStats, TP, UserTP, UserStats, UserSubjectStats
+from storage import blob_store, migrate_post_images
+from images import apply_derivatives, get_executor, process_upload, reset_executor
+from migrations import bootstrap, migrate
+from refdata import RATINGS, bump_version
+from search import rebuild_index
+from shared_cache import shared_cache
+import trending
+import upload_queue
+
+def cmd_migrate(args):
+    applied = migrate(engine)
+    print(f"Migraciones aplicadas: {applied or 'ninguna'}")
+
+def cmd_migrate_images(args):
+    bootstrap(engine)
+    migrated = migrate_post_images(engine, batch_size=args.batch_size, drop_column=not args.keep_column)
+    print(f"Imágenes migradas: {migrated}")
+    if args.vacuum and engine.dialect.name == "sqlite":
+        with engine.connect() as conn:
+            conn.exec_driver_sql("VACUUM")
+
+def cmd_gc_blobs(args):
+    with get_session() as session:
+        removed = blob_store.collect_garbage(session)
+    print(f"Archivos eliminados: {removed}")
+
+def cmd_build_derivatives(args):
+    # Sólo posts publicados: los "procesando" los termina upload_queue y los
+    # rechazados no se muestran. Un post que falla se informa y se saltea;
+    # queda sin derivados y se sigue mostrando el original
+    built = skipped = 0
+    last_id = 0
+    while True:
+        with get_session() as session:
+            posts = (
+                session.query(Post)
+                .filter(
+                    Post.id > last_id,
+                    Post.status == upload_queue.POST_PUBLISHED,
+                    Post.thumb_path.is_(None),
+                    Post.image_path.isnot(None),
+                )
+                .order_by(Post.id)
+                .limit(args.batch_size)
+                .all()
+            )
+            if not posts:
+                break
+            last_id = posts[-1].id
+            executor = get_executor()
+            pending = []
+            for post in posts:
+                try:
+                    data = blob_store.abspath(post.image_path).read_bytes()
+                    pending.append((post, executor.submit(process_upload, data)))
+                except (OSError, BrokenProcessPool) as exc:
+                    print(f"Post {post.id} salteado: {exc}")
+                    skipped += 1
+            for post, future in pending:
+                try:
+                    derivatives = future.result()
+                except BrokenProcessPool:
+                    # Todo el lote queda sin procesar; el próximo usa un pool nuevo
+                    reset_executor(executor)
+                    print(f"Post {post.id} salteado: el proceso de imágenes terminó inesperadamente")
+                    skipped += 1
+                    continue
+                except Exception as exc:
+                    print(f"Post {post.id} salteado: {exc}")
+                    skipped += 1
+                    continue
+                apply_derivatives(session, post, derivatives)
+                built += 1
+    print(f"Posts procesados: {built}")
+    if skipped:
+        print(f"Posts salteados: {skipped}")
+
+def reconcile_like_counts(session):
+    """Recalcula posts.like_count desde likes. Devuelve cuántos posts se corrigieron."""
+    counted = select(func.count(Like.id)).where(Like.post_id == Post.id).scalar_subquery()
+    return (
+        session.query(Post)
+        .filter(Post.like_count.is_distinct_from(counted))
+        .update({Post.like_count: counted}, synchronize_session=False)
+    )
+
+def cmd_reconcile_likes(args):
+    with get_session() as session:
+        fixed = reconcile_like_counts(session)
+    print(f"Contadores corregidos: {fixed}")
+
+def rebuild_rating_stats(session):
+    """Reconstruye catedra_rating_stats desde ratings. Devuelve cuántas cátedras quedaron."""
+    session.query(CatedraRatingStats).delete(synchronize_session=False)
+    columns = ["catedra_id", "rating_count", "rating_sum"] + [f"stars_{star}" for star in range(1, 6)]
+    aggregated = select(
+        Rating.catedra_id,
+        func.count(Rating.id),
+        func.sum(Rating.rating),
+        *[func.sum(case((Rating.rating == star, 1), else_=0)) for star in range(1, 6)],
+    ).group_by(Rating.catedra_id)
+    rebuilt = session.execute(insert(CatedraRatingStats).from_select(columns, aggregated)).rowcount
+    bump_version(session, RATINGS)
+    return rebuilt
+
+def cmd_rebuild_rating_stats(args):
+    with get_session() as session:
+        rebuilt = rebuild_rating_stats(session)
+    print(f"Cátedras con estadísticas: {rebuilt}")
+
+def rebuild_user_stats(session):
+    """Reconstruye user_stats y user_subject_stats desde user_tps. Devuelve cuántos usuarios quedaron."""
+    session.query(UserStats).delete(synchronize_session=False)
+    session.query(UserSubjectStats).delete(synchronize_session=False)
+
+    def count_state(state):
+        return func.sum(case((UserTP.state == state, 1), else_=0))
+
+    grade_sum = func.coalesce(func.sum(UserTP.grade), 0)
+    grade_count = func.count(UserTP.grade)
+    per_user = select(
+        UserTP.user_id,
+        count_state("Aprobado"),
+        count_state("Entregado"),
+        count_state("Pendiente"),
+        grade_sum,
+        grade_count,
+    ).group_by(UserTP.user_id)
+    per_subject = (
+        select(UserTP.user_id, TP.subject_id, count_state("Aprobado"), grade_sum, grade_count)
+        .join(TP, TP.id == UserTP.tp_id)
+        .group_by(UserTP.user_id, TP.subject_id)
+    )
+    session.execute(insert(UserSubjectStats).from_select(
+        ["user_id", "subject_id", "tps_approved", "grade_sum", "grade_count"], per_subject
+    ))
+    return session.execute(insert(UserStats).from_select(
+        ["user_id", "tps_approved", "tps_delivered", "tps_pending", "grade_sum", "grade_count"], per_user
+    )).rowcount
+
+def cmd_rebuild_user_stats(args):
+    with get_session() as session:
+        rebuilt = rebuild_user_stats(session)
+    print(f"Usuarios con estadísticas: {rebuilt}")
+
+def cmd_rebuild_trending(args):
+    with get_session() as session:
+        rebuilt = trending.rebuild(session)
+    print(f"Posts con puntaje de tendencia: {rebuilt}")
+
+def cmd_decay_trending(args):
+    with get_session() as session:
+        factor = trending.rebase(session)
+    print(f"Puntajes de tendencia multiplicados por {factor:.6f}")
+
+def cmd_upload_queue(args):
+    if args.drain:
+        processed = upload_queue.drain(SessionLocal)
+        print(f"Trabajos procesados: {processed}")
+    with get_session() as session:
+        queue = upload_queue.metrics(session)
+    print(f"Pendientes: {queue.pending}  en proceso: {queue.running}")
+    print(f"Última hora: {queue.done} procesadas, {queue.failed} rechazadas ({queue.per_minute:.2f}/min)")
+    if queue.avg_wait is not None:
+        print(f"Espera media {queue.avg_wait:.1f}s, procesamiento medio {queue.avg_processing:.1f}s")
+
+def cmd_shared_cache(args):
+    if args.clear:
+        shared_cache.clear()
+    stats = shared_cache.stats()
+    print(f"Entradas: {stats['entries']}  tamaño: {stats['bytes'] / 1024:.1f} KiB de {stats['max_bytes'] // 1024} KiB")
+
+def cmd_rebuild_search(args):
+    bootstrap(engine)
+    added = rebuild_index(engine, batch_size=args.batch_size)
+    print(f"Filas indexadas: {added}")
+
+def cmd_import_curriculum(args):
+    from curriculum import CurriculumError, import_plan, load_file
+
+    bootstrap(engine)
+    started = time.perf_counter()
+    try:
+        plan = load_file(args.path)
+    except CurriculumError as exc:
+        raise SystemExit(f"Plan inválido:\n{exc}")
+    with get_session() as session:
+        changes = import_plan(session, plan, dry_run=args.dry_run)
+    for label, count in changes.summary().items():
+        print(f"{label}: {count}")
+    for item in changes.only_in_db[:args.show]:
+        print(f"  no figura en el plan (se conserva): {item}")
+    if len(changes.only_in_db) > args.show:
+        print(f"  ... y {len(changes.only_in_db) - args.show} más")
+    action = "Comparado" if args.dry_run else "Importado"
+    print(f"{action} en {time.perf_counter() - started:.3f}s")
+
+def cmd_analytics_snapshot(args):
+    # Importe diferido: pandas sólo hace falta para esta tarea
+    from analytics import export_snapshot
+
+    bootstrap(engine)
+    path = export_snapshot(engine, keep=args.keep)
+    print(f"Instantánea escrita en {path}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mantenimiento de LOOP")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("migrate", help="Aplica las migraciones de esquema pendientes")
+    p.set_defaults(func=cmd_migrate)
+
+    p = sub.add_parser("migrate-images", help="Mueve posts.image al almacén de archivos")
+    p.add_argument("--batch-size", type=int, default=100)
+    p.add_argument("--keep-column", action="store_true", help="No eliminar posts.image al terminar")
+    p.add_argument("--vacuum", action="store_true", help="Compactar la base al terminar")
+    p.set_defaults(func=cmd_migrate_images)
+
+    p = sub.add_parser("build-derivatives", help="Genera miniaturas de posts que no las tienen")
+    p.add_argument("--batch-size", type=int, default=50)
+    p.set_defaults(func=cmd_build_derivatives)
+
+    p = sub.add_parser("reconcile-likes", help="Recalcula los contadores de likes")
+    p.set_defaults(func=cmd_reconcile_likes)
+
+    p = sub.add_parser("rebuild-rating-stats", help="Recalcula las estadísticas de reseñas")
+    p.set_defaults(func=cmd_rebuild_rating_stats)
+
+    p = sub.add_parser("rebuild-user-stats", help="Recalcula TPs aprobados y promedios por usuario")
+    p.set_defaults(func=cmd_rebuild_user_stats)
+
+    p = sub.add_parser("rebuild-trending", help="Recalcula el puntaje de tendencia de los posts")
+    p.set_defaults(func=cmd_rebuild_trending)
+
+    p = sub.add_parser("decay-trending", help="Reescala los puntajes de tendencia ya (la app lo hace sola cada 60 días)")
+    p.set_defaults(func=cmd_decay_trending)
+
+    p = sub.add_parser("rebuild-search", help="Indexa las filas que faltan en el buscador")
+    p.add_argument("--batch-size", type=int, default=500)
+    p.set_defaults(func=cmd_rebuild_search)
+
+    p = sub.add_parser("import-curriculum", help="Importa el plan de estudios desde JSON o CSV")
+    p.add_argument("path", nargs="?", default=str(CURRICULUM_FILE))
+    p.add_argument("--dry-run", action="store_true", help="Sólo mostrar las diferencias")
+    p.add_argument("--show", type=int, default=20, help="Elementos sólo en la base a listar")
+    p.set_defaults(func=cmd_import_curriculum)
+
+    p = sub.add_parser("analytics-snapshot", help="Exporta la instantánea y los agregados de Estadísticas")
+    p.add_argument("--keep", type=int, default=3, help="Instantáneas a conservar")
+    p.set_defaults(func=cmd_analytics_snapshot)
+
+    p = sub.add_parser("upload-queue", help="Muestra el estado de la cola de imágenes subidas")
+    p.add_argument("--drain", action="store_true", help="Procesar antes los trabajos pendientes")
+    p.set_defaults(func=cmd_upload_queue)
+
+    p = sub.add_parser("shared-cache", help="Muestra el tamaño del caché compartido")
+    p.add_argument("--clear", action="store_true", help="Vaciarlo")
+    p.set_defaults(func=cmd_shared_cache)
+
+    p = sub.add_parser("gc-blobs", help="Borra archivos sin referencias")
+    p.set_defaults(func=cmd_gc_blobs)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+if __name__ == "__main__":
+    main()
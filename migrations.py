@@ -0,0 +1,180 @@
+"""Versionado del esquema y arranque de la base, una vez por proceso.
+
+Cada migración se registra en `schema_version` al aplicarse. Si varios
+procesos arrancan a la vez sobre la misma base, `migrate` los pone en fila con
+un bloqueo entre procesos (un archivo con flock junto a la base SQLite, un
+advisory lock en PostgreSQL) y cada uno vuelve a leer las versiones aplicadas
+ya dentro del bloqueo: el primero migra y los demás no encuentran nada
+pendiente. Además todas son idempotentes, por si se corren a mano.
+"""
+import random
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:   # Windows: sin bloqueo entre procesos para SQLite
+    fcntl = None
+
+from sqlalchemy import select, text, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from database import (
+    Base, engine as default_engine, add_missing_columns, add_missing_unique_constraints, dialect_insert,
+    sync_indexes,
+)
+from curriculum import import_plan, load_file
+from models import DataVersion, Like, Post, SchemaVersion, Subject, TP, User, UserTP
+from refdata import INSTANCE
+from search import install as install_search_index, reindex_unpublished_posts
+import trending
+
+def _sync_schema(engine):
+    # Crea las tablas nuevas y completa las existentes (incluidas las del app.py
+    # anterior); las migraciones que sólo agregan tablas o columnas reusan este paso
+    Base.metadata.create_all(engine)
+    add_missing_columns(engine)
+    add_missing_unique_constraints(engine)
+    sync_indexes(engine)
+
+def _seed_demo_data(engine):
+    with Session(bind=engine) as session, session.begin():
+        if session.query(Subject.id).first() is not None:
+            return
+        import_plan(session, load_file())
+
+        # Usuario de prueba con algunos TPs aprobados y otros pendientes
+        if session.query(User.id).first() is None:
+            user = User(name="Estudiante Ejemplo", year=1, current_catedra="Szelagowski")
+            session.add(user)
+            session.flush()
+            for subject, state in (("Taller de Arquitectura I", "Aprobado"), ("Matemática I", "Pendiente")):
+                tp_ids = (
+                    session.query(TP.id)
+                    .join(Subject, Subject.id == TP.subject_id)
+                    .filter(Subject.name == subject, TP.order <= 3)
+                )
+                session.add_all(UserTP(user_id=user.id, tp_id=tp_id, state=state) for tp_id, in tp_ids)
+
+def _import_default_plan(engine):
+    # Completa bases creadas con el plan anterior (sólo primer año) sin
+    # modificar materias que ya existan
+    with Session(bind=engine) as session, session.begin():
+        import_plan(session, load_file(), update_existing=False)
+
+def _backfill_counters(engine):
+    from maintenance import rebuild_rating_stats, reconcile_like_counts
+
+    with Session(bind=engine) as session, session.begin():
+        reconcile_like_counts(session)
+        rebuild_rating_stats(session)
+
+def _backfill_user_stats(engine):
+    from maintenance import rebuild_user_stats
+
+    with Session(bind=engine) as session, session.begin():
+        rebuild_user_stats(session)
+
+def _backfill_trending(engine):
+    _sync_schema(engine)
+    with Session(bind=engine) as session, session.begin():
+        # Los likes anteriores no tienen fecha: se toma la del post
+        posted_at = select(Post.created_at).where(Post.id == Like.post_id).scalar_subquery()
+        session.execute(update(Like).where(Like.created_at.is_(None)).values(created_at=posted_at))
+        trending.rebuild(session)
+
+def _create_instance_id(engine):
+    # Número al azar por base: las claves del caché compartido lo incluyen, así
+    # una base recreada en la misma ruta no lee entradas de la anterior
+    with Session(bind=engine) as session, session.begin():
+        insert = dialect_insert(session)
+        session.execute(
+            insert(DataVersion)
+            .values(name=INSTANCE, version=random.randrange(1, 2**31))
+            .on_conflict_do_nothing(index_elements=[DataVersion.name])
+        )
+
+# (versión, descripción, función) en orden de aplicación
+MIGRATIONS = [
+    (1, "Esquema inicial y columnas faltantes de versiones anteriores", _sync_schema),
+    (2, "Datos de ejemplo de primer año", _seed_demo_data),
+    (3, "Contadores de likes y estadísticas de reseñas", _backfill_counters),
+    (4, "Índice de búsqueda de texto completo", install_search_index),
+    (5, "Metadatos de archivos adjuntos en apuntes", _sync_schema),
+    (6, "Tablas de estadísticas académicas por usuario", _sync_schema),
+    (7, "Estadísticas académicas desde user_tps", _backfill_user_stats),
+    (8, "Fechas de alta y aprobación en user_tps", _sync_schema),
+    (9, "Plan de estudios completo de seis años", _import_default_plan),
+    (10, "Índices compuestos para feed, perfil, likes y reseñas", _sync_schema),
+    (11, "Puntaje de tendencia de los posts", _backfill_trending),
+    (12, "Cola de procesamiento de imágenes y estado de los posts", _sync_schema),
+    (13, "Identificador de la base para el caché compartido", _create_instance_id),
+    (14, "Índices de los derivados servidos como estáticos", _sync_schema),
+    (15, "Búsqueda sólo sobre posts publicados", reindex_unpublished_posts),
+]
+
+def applied_versions(engine):
+    SchemaVersion.__table__.create(engine, checkfirst=True)
+    with Session(bind=engine) as session:
+        return {version for version, in session.query(SchemaVersion.version)}
+
+# Clave del advisory lock de PostgreSQL para las migraciones
+PG_LOCK_KEY = 0x100F
+
+@contextmanager
+def migration_lock(engine):
+    """Bloqueo exclusivo entre procesos mientras se migra la base de `engine`."""
+    url = engine.url
+    if url.get_backend_name() == "postgresql":
+        with engine.connect() as conn:
+            conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": PG_LOCK_KEY})
+            try:
+                yield
+            finally:
+                conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": PG_LOCK_KEY})
+        return
+    if url.get_backend_name() != "sqlite" or url.database in (None, "", ":memory:") or fcntl is None:
+        yield
+        return
+    with open(Path(f"{url.database}.migrations.lock"), "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def migrate(engine=default_engine):
+    """Aplica las migraciones pendientes. Devuelve las versiones aplicadas."""
+    with migration_lock(engine):
+        done = applied_versions(engine)
+        applied = []
+        for version, description, migration in MIGRATIONS:
+            if version in done:
+                continue
+            migration(engine)
+            try:
+                with Session(bind=engine) as session, session.begin():
+                    session.add(SchemaVersion(version=version, description=description))
+            except IntegrityError:
+                pass  # la registró un proceso sin bloqueo (p. ej. en Windows)
+            applied.append(version)
+    return applied
+
+_bootstrapped = set()
+_bootstrap_lock = threading.Lock()
+
+def bootstrap(engine=default_engine):
+    """Deja la base lista una sola vez por proceso (y por URL de conexión).
+
+    Las siguientes llamadas no tocan la base, así que se puede invocar en cada
+    ejecución del script de Streamlit.
+    """
+    key = str(engine.url)
+    if key in _bootstrapped:
+        return
+    with _bootstrap_lock:
+        if key not in _bootstrapped:
+            migrate(engine)
+            _bootstrapped.add(key)
@@ -9,9 +9,9 @@ class User(Base):
     __tablename__ = "users"
 
     id = Column(Integer, primary_key=True)
-    email = Column(String, unique=True, nullable=False, index=True)
-    password_hash = Column(String, nullable=False)
-    name = Column(String, nullable=False)
+    email = Column(String, unique=True, nullable=True, index=True)     # opcional hasta tener registro con email
+    password_hash = Column(String, nullable=True)
+    name = Column(String, nullable=False, index=True)   # búsqueda en el login
     year = Column(Integer)                     # año de cursada (1-6)
     current_catedra = Column(String)           # cátedra actual de arquitectura
     role = Column(String, default="student")   # student, ayudante, profesor, admin
@@ -49,7 +49,7 @@ class TP(Base):
 
     id = Column(Integer, primary_key=True)
     name = Column(String, nullable=False)       # ej. "TP1"
-    subject_id = Column(Integer, ForeignKey("subjects.id"), nullable=False, index=True)
+    subject_id = Column(Integer, ForeignKey("subjects.id"), nullable=False)   # indexado por _tp_subject_order_uc
     order = Column(Integer)                      # para ordenamiento
 
     subject = relationship("Subject", back_populates="tps")
@@ -61,10 +61,12 @@ class UserTP(Base):
     __tablename__ = "user_tps"
 
     id = Column(Integer, primary_key=True)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)   # indexado por _user_tp_uc
     tp_id = Column(Integer, ForeignKey("tps.id"), nullable=False, index=True)
     state = Column(String, default="Pendiente")  # Pendiente, Entregado, Aprobado
     grade = Column(Float, nullable=True)         # nota (opcional)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    approved_at = Column(DateTime, nullable=True)   # cuándo pasó a "Aprobado"
 
     user = relationship("User", back_populates="user_tps")
     tp = relationship("TP", back_populates="user_tps")
@@ -75,27 +77,48 @@ class Post(Base):
     __tablename__ = "posts"
 
     id = Column(Integer, primary_key=True)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
-    subject_id = Column(Integer, ForeignKey("subjects.id"), nullable=False, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    subject_id = Column(Integer, ForeignKey("subjects.id"), nullable=False)
     image_path = Column(String, nullable=False)   # ruta relativa dentro de uploads/
+    # derivados (ver images.VARIANTS); indexados para que static_server valide cada pedido
+    thumb_path = Column(String, nullable=True, index=True)    # para grillas
+    feed_path = Column(String, nullable=True, index=True)     # a ancho de feed
     caption = Column(Text)
-    created_at = Column(DateTime, default=datetime.datetime.utcnow, index=True)
+    like_count = Column(Integer, nullable=False, default=0, server_default="0")  # desnormalizado de likes
+    trend_score = Column(Float, nullable=False, default=0, server_default="0")   # ver trending.py
+    status = Column(String, nullable=False, default="publicado", server_default="publicado")  # procesando, publicado, rechazado
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
 
     author = relationship("User", back_populates="posts")
     subject = relationship("Subject", back_populates="posts")
     likes = relationship("Like", back_populates="post", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        # feed global: ORDER BY created_at DESC, id DESC con cursor (created_at, id)
+        Index("ix_posts_created_at_id", "created_at", "id"),
+        # perfil y feed por materia, ya ordenados
+        Index("ix_posts_user_id_created_at", "user_id", "created_at"),
+        Index("ix_posts_subject_id_created_at", "subject_id", "created_at"),
+        # feed por tendencia: ORDER BY trend_score DESC, id DESC con cursor
+        Index("ix_posts_trend_score_id", "trend_score", "id"),
+    )
+
 class Like(Base):
     __tablename__ = "likes"
 
     id = Column(Integer, primary_key=True)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
-    post_id = Column(Integer, ForeignKey("posts.id"), nullable=False, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)   # indexado por _user_post_like_uc
+    post_id = Column(Integer, ForeignKey("posts.id"), nullable=False)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)   # peso del like en trend_score
 
     user = relationship("User", back_populates="likes")
     post = relationship("Post", back_populates="likes")
 
-    __table_args__ = (UniqueConstraint("user_id", "post_id", name="_user_post_like_uc"),)
+    __table_args__ = (
+        UniqueConstraint("user_id", "post_id", name="_user_post_like_uc"),
+        # conteo y conciliación de likes por publicación
+        Index("ix_likes_post_id_user_id", "post_id", "user_id"),
+    )
 
 class Resource(Base):
     __tablename__ = "resources"
@@ -105,6 +128,10 @@ class Resource(Base):
     title = Column(String, nullable=False)
     description = Column(Text)
     file_path = Column(String, nullable=True)    # opcional para adjuntar archivo
+    file_name = Column(String, nullable=True)    # nombre original del adjunto
+    file_size = Column(Integer, nullable=True)   # bytes
+    file_mime = Column(String, nullable=True)
+    file_hash = Column(String, nullable=True)    # sha256, igual al de blobs
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
 
     subject = relationship("Subject", back_populates="resources")
@@ -113,8 +140,8 @@ class Rating(Base):
     __tablename__ = "ratings"
 
     id = Column(Integer, primary_key=True)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
-    catedra_id = Column(Integer, ForeignKey("catedras.id"), nullable=False, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)   # indexado por _user_catedra_rating_uc
+    catedra_id = Column(Integer, ForeignKey("catedras.id"), nullable=False)
     rating = Column(Integer, nullable=False)     # 1 a 5
     comment = Column(Text)
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
@@ -122,4 +149,90 @@ class Rating(Base):
     user = relationship("User", back_populates="ratings")
     catedra = relationship("Catedra", back_populates="ratings")
 
-    __table_args__ = (UniqueConstraint("user_id", "catedra_id", name="_user_catedra_rating_uc"),)
+    __table_args__ = (
+        UniqueConstraint("user_id", "catedra_id", name="_user_catedra_rating_uc"),
+        # estadísticas por cátedra sin leer las filas de la tabla
+        Index("ix_ratings_catedra_id_rating", "catedra_id", "rating"),
+    )
+
+class CatedraRatingStats(Base):
+    __tablename__ = "catedra_rating_stats"
+
+    catedra_id = Column(Integer, ForeignKey("catedras.id"), primary_key=True)
+    rating_count = Column(Integer, nullable=False, default=0)
+    rating_sum = Column(Integer, nullable=False, default=0)
+    # histograma de puntuaciones
+    stars_1 = Column(Integer, nullable=False, default=0)
+    stars_2 = Column(Integer, nullable=False, default=0)
+    stars_3 = Column(Integer, nullable=False, default=0)
+    stars_4 = Column(Integer, nullable=False, default=0)
+    stars_5 = Column(Integer, nullable=False, default=0)
+
+class UserStats(Base):
+    """Resumen académico de cada usuario, mantenido junto con user_tps."""
+    __tablename__ = "user_stats"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    tps_approved = Column(Integer, nullable=False, default=0)
+    tps_delivered = Column(Integer, nullable=False, default=0)
+    tps_pending = Column(Integer, nullable=False, default=0)   # filas marcadas "Pendiente"
+    grade_sum = Column(Float, nullable=False, default=0)
+    grade_count = Column(Integer, nullable=False, default=0)
+
+class UserSubjectStats(Base):
+    __tablename__ = "user_subject_stats"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    subject_id = Column(Integer, ForeignKey("subjects.id"), primary_key=True)
+    tps_approved = Column(Integer, nullable=False, default=0)
+    grade_sum = Column(Float, nullable=False, default=0)
+    grade_count = Column(Integer, nullable=False, default=0)
+
+class Blob(Base):
+    __tablename__ = "blobs"
+
+    hash = Column(String, primary_key=True)      # sha256 del contenido
+    path = Column(String, nullable=False)        # ruta relativa dentro de uploads/
+    size = Column(Integer, nullable=False)
+    refcount = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+
+class DataVersion(Base):
+    __tablename__ = "data_versions"
+
+    name = Column(String, primary_key=True)      # ej. "reference"
+    version = Column(Integer, nullable=False, default=0)
+
+class UploadJob(Base):
+    """Procesamiento pendiente de la imagen de un post (ver upload_queue.py)."""
+    __tablename__ = "upload_jobs"
+
+    id = Column(Integer, primary_key=True)
+    post_id = Column(Integer, ForeignKey("posts.id"), nullable=False)
+    status = Column(String, nullable=False, default="pending")   # pending, running, done, failed
+    attempts = Column(Integer, nullable=False, default=0)
+    error = Column(Text)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        # el worker toma el pendiente más antiguo
+        Index("ix_upload_jobs_status_id", "status", "id"),
+        # throughput: terminados en la última ventana
+        Index("ix_upload_jobs_status_finished_at", "status", "finished_at"),
+    )
+
+class TrendingEpoch(Base):
+    """Instante de referencia de posts.trend_score (una sola fila, id=1)."""
+    __tablename__ = "trending_epoch"
+
+    id = Column(Integer, primary_key=True)
+    base_at = Column(DateTime, nullable=False)
+
+class SchemaVersion(Base):
+    __tablename__ = "schema_version"
+
+    version = Column(Integer, primary_key=True)
+    description = Column(String)
+    applied_at = Column(DateTime, default=datetime.datetime.utcnow)
@@ -0,0 +1,196 @@
+"""Caché de datos de referencia (materias, TPs y cátedras) compartida por el proceso.
+
+Estas tablas casi nunca cambian, así que se cargan una vez y se sirven como
+instantáneas inmutables a todas las sesiones. Cada escritura administrativa
+debe llamar a `bump_version` en su misma transacción; el caché compara su
+versión con la de `data_versions` como mucho cada VERSION_CHECK_INTERVAL
+segundos (o al instante si la escritura ocurrió en este proceso). Al cambiar
+de versión la instantánea se busca primero en el caché en disco compartido
+(shared_cache.py), así un proceso nuevo no la vuelve a armar desde la base.
+
+Las mismas versiones sirven de claves para otros datos del caché compartido
+(`cache_key`): cada tabla cacheada tiene su nombre en `data_versions`. Las
+claves llevan además CODE_VERSION, un hash de los módulos que definen lo que
+se guarda, para que después de un deploy no se lean objetos de la versión
+anterior (un namedtuple con otros campos no se puede deserializar).
+"""
+import hashlib
+import threading
+import time
+from pathlib import Path
+from collections import namedtuple
+from dataclasses import dataclass
+from types import MappingProxyType
+
+from sqlalchemy import event
+
+from database import SessionLocal, dialect_insert
+from models import Subject, TP, Catedra, DataVersion
+from shared_cache import shared_cache
+
+REFERENCE = "reference"
+RATINGS = "ratings"       # reseñas y catedra_rating_stats
+INSTANCE = "instance"     # al azar por base; separa claves de bases distintas
+VERSION_CHECK_INTERVAL = 5.0   # segundos
+
+# Módulos cuyos tipos y consultas terminan en el caché compartido
+_CACHED_MODULES = ("refdata.py", "services.py", "models.py")
+CODE_VERSION = hashlib.sha1(
+    b"".join((Path(__file__).parent / name).read_bytes() for name in _CACHED_MODULES)
+).hexdigest()[:12]
+
+SubjectRef = namedtuple("SubjectRef", "id name year")
+TPRef = namedtuple("TPRef", "id subject_id name order")
+CatedraRef = namedtuple("CatedraRef", "id subject_id name")
+
+@dataclass(frozen=True)
+class ReferenceData:
+    version: int
+    subjects: tuple                 # SubjectRef ordenadas por año e id
+    subjects_by_id: MappingProxyType
+    subjects_by_year: MappingProxyType
+    tps_by_subject: MappingProxyType       # subject_id -> TPRef ordenados
+    catedras_by_subject: MappingProxyType  # subject_id -> CatedraRef
+
+    def tps_for(self, subject_id):
+        return self.tps_by_subject.get(subject_id, ())
+
+    def catedras_for(self, subject_id):
+        return self.catedras_by_subject.get(subject_id, ())
+
+def _group(items, key):
+    grouped = {}
+    for item in items:
+        grouped.setdefault(getattr(item, key), []).append(item)
+    return MappingProxyType({k: tuple(v) for k, v in grouped.items()})
+
+def read_version(session, name=REFERENCE):
+    version = session.query(DataVersion.version).filter(DataVersion.name == name).scalar()
+    return version or 0
+
+def bump_version(session, name=REFERENCE):
+    """Incrementa la versión dentro de la transacción del llamador.
+
+    El caché local se descarta recién cuando esa transacción hace commit.
+    """
+    insert = dialect_insert(session)
+    stmt = insert(DataVersion).values(name=name, version=1)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[DataVersion.name],
+        set_={"version": DataVersion.version + 1},
+    )
+    session.execute(stmt)
+    event.listen(session, "after_commit", lambda _session: _forget_version(name), once=True)
+    if name == REFERENCE:
+        event.listen(session, "after_commit", lambda _session: _cache.invalidate(), once=True)
+
+# Versiones leídas por este proceso: name -> (versión, time.monotonic() de la lectura)
+_versions = {}
+_versions_lock = threading.Lock()
+
+def _forget_version(name):
+    with _versions_lock:
+        _versions.pop(name, None)
+
+def get_versions(*names, session_factory=SessionLocal):
+    """Versiones de `names`, releídas de la base como mucho cada VERSION_CHECK_INTERVAL."""
+    now = time.monotonic()
+    with _versions_lock:
+        known = {
+            name: version for name, (version, read_at) in _versions.items()
+            if name in names and now - read_at < VERSION_CHECK_INTERVAL
+        }
+    missing = [name for name in names if name not in known]
+    if missing:
+        with session_factory() as session:
+            rows = dict(
+                session.query(DataVersion.name, DataVersion.version).filter(DataVersion.name.in_(missing))
+            )
+        with _versions_lock:
+            for name in missing:
+                known[name] = rows.get(name, 0)
+                _versions[name] = (known[name], now)
+    return tuple(known[name] for name in names)
+
+def cache_key(namespace, *parts, tables=()):
+    """Clave del caché compartido que cambia cuando cambia alguna de `tables`."""
+    versions = get_versions(INSTANCE, *tables)
+    return ":".join(str(p) for p in (namespace, CODE_VERSION, *versions, *parts))
+
+class ReferenceCache:
+    def __init__(self, session_factory=SessionLocal):
+        self.session_factory = session_factory
+        self._lock = threading.Lock()
+        self._data = None
+        self._checked_at = 0.0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self):
+        with self._lock:
+            now = time.monotonic()
+            if self._data is not None and now - self._checked_at < VERSION_CHECK_INTERVAL:
+                self.hits += 1
+                return self._data
+
+            session = self.session_factory()
+            try:
+                version = read_version(session)
+                if self._data is not None and self._data.version == version:
+                    self.hits += 1
+                else:
+                    self.misses += 1
+                    self._data = self._load(session, version)
+            finally:
+                session.close()
+            self._checked_at = now
+            return self._data
+
+    def invalidate(self):
+        with self._lock:
+            self._data = None
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "version": self._data.version if self._data else None,
+        }
+
+    def _load(self, session, version):
+        # En el caché compartido van las filas; los índices se arman en cada proceso
+        subjects, tps, catedras = shared_cache.get_or_set(
+            cache_key("refdata", version), lambda: self._read(session)
+        )
+        return ReferenceData(
+            version=version,
+            subjects=subjects,
+            subjects_by_id=MappingProxyType({s.id: s for s in subjects}),
+            subjects_by_year=_group(subjects, "year"),
+            tps_by_subject=_group(tps, "subject_id"),
+            catedras_by_subject=_group(catedras, "subject_id"),
+        )
+
+    def _read(self, session):
+        subjects = tuple(
+            SubjectRef(*row)
+            for row in session.query(Subject.id, Subject.name, Subject.year).order_by(Subject.year, Subject.id)
+        )
+        tps = tuple(
+            TPRef(*row)
+            for row in session.query(TP.id, TP.subject_id, TP.name, TP.order).order_by(TP.subject_id, TP.order, TP.id)
+        )
+        catedras = tuple(
+            CatedraRef(*row)
+            for row in session.query(Catedra.id, Catedra.subject_id, Catedra.name).order_by(Catedra.name)
+        )
+        return subjects, tps, catedras
+
+_cache = ReferenceCache()
+
+def get_reference_data():
+    """Instantánea inmutable de materias, TPs y cátedras."""
+    return _cache.get()
+
+def cache_stats():
+    return _cache.stats()
@@ -0,0 +1,215 @@
+"""Búsqueda de texto completo sobre apuntes y descripciones de posts (SQLite FTS5).
+
+El índice `search_index` se mantiene con triggers sobre `resources` y `posts`.
+El rowid de cada entrada codifica su origen (id*2 para apuntes, id*2+1 para
+posts), así los triggers actualizan y borran por clave sin recorrer el índice.
+Sólo se indexan los posts publicados: uno que está procesándose o fue
+rechazado entra al índice recién cuando pasa a "publicado".
+El tokenizador quita acentos, de modo que "matematica" encuentra "Matemática".
+"""
+import re
+from collections import namedtuple
+
+from sqlalchemy import or_, text
+
+from models import Post, Resource
+
+RESULTS_PAGE_SIZE = 20
+BATCH_SIZE = 500
+
+SearchHit = namedtuple("SearchHit", "kind ref_id subject_id title snippet rank")
+
+# Palabras demasiado comunes para aportar al ranking
+STOPWORDS = {
+    "a", "al", "con", "de", "del", "el", "en", "la", "las", "lo", "los",
+    "o", "para", "por", "que", "se", "sin", "su", "un", "una", "y",
+}
+
+_CREATE_INDEX = """
+CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(
+    kind UNINDEXED,
+    ref_id UNINDEXED,
+    subject_id UNINDEXED,
+    title,
+    body,
+    tokenize = 'unicode61 remove_diacritics 2'
+)
+"""
+
+_TRIGGERS = [
+    """
+    CREATE TRIGGER IF NOT EXISTS resources_search_ai AFTER INSERT ON resources BEGIN
+        INSERT INTO search_index(rowid, kind, ref_id, subject_id, title, body)
+        VALUES (new.id * 2, 'resource', new.id, new.subject_id, new.title, coalesce(new.description, ''));
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS resources_search_au AFTER UPDATE OF title, description, subject_id ON resources BEGIN
+        DELETE FROM search_index WHERE rowid = old.id * 2;
+        INSERT INTO search_index(rowid, kind, ref_id, subject_id, title, body)
+        VALUES (new.id * 2, 'resource', new.id, new.subject_id, new.title, coalesce(new.description, ''));
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS resources_search_ad AFTER DELETE ON resources BEGIN
+        DELETE FROM search_index WHERE rowid = old.id * 2;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS posts_search_ai AFTER INSERT ON posts WHEN new.status = 'publicado' BEGIN
+        INSERT INTO search_index(rowid, kind, ref_id, subject_id, title, body)
+        VALUES (new.id * 2 + 1, 'post', new.id, new.subject_id, '', coalesce(new.caption, ''));
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS posts_search_au AFTER UPDATE OF caption, subject_id, status ON posts BEGIN
+        DELETE FROM search_index WHERE rowid = old.id * 2 + 1;
+        INSERT INTO search_index(rowid, kind, ref_id, subject_id, title, body)
+        SELECT new.id * 2 + 1, 'post', new.id, new.subject_id, '', coalesce(new.caption, '')
+        WHERE new.status = 'publicado';
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS posts_search_ad AFTER DELETE ON posts BEGIN
+        DELETE FROM search_index WHERE rowid = old.id * 2 + 1;
+    END
+    """,
+]
+
+# Consultas para indexar filas existentes que todavía no están en el índice
+_BACKFILL = {
+    "resources": """
+        INSERT INTO search_index(rowid, kind, ref_id, subject_id, title, body)
+        SELECT id * 2, 'resource', id, subject_id, title, coalesce(description, '')
+        FROM resources
+        WHERE id > :last_id AND id <= :max_id
+          AND NOT EXISTS (SELECT 1 FROM search_index WHERE rowid = resources.id * 2)
+    """,
+    "posts": """
+        INSERT INTO search_index(rowid, kind, ref_id, subject_id, title, body)
+        SELECT id * 2 + 1, 'post', id, subject_id, '', coalesce(caption, '')
+        FROM posts
+        WHERE id > :last_id AND id <= :max_id AND status = 'publicado'
+          AND NOT EXISTS (SELECT 1 FROM search_index WHERE rowid = posts.id * 2 + 1)
+    """,
+}
+
+_fts_support = {}
+
+def fts_available(bind):
+    """Si la base soporta FTS5 (se consulta una vez por URL)."""
+    key = str(bind.engine.url)
+    if key not in _fts_support:
+        if bind.dialect.name != "sqlite":
+            _fts_support[key] = False
+        else:
+            with bind.engine.connect() as conn:
+                options = {row[0] for row in conn.exec_driver_sql("PRAGMA compile_options")}
+            _fts_support[key] = "ENABLE_FTS5" in options
+    return _fts_support[key]
+
+def install(engine):
+    """Crea el índice y sus triggers (idempotente) e indexa las filas existentes."""
+    if not fts_available(engine):
+        return False
+    with engine.begin() as conn:
+        conn.exec_driver_sql(_CREATE_INDEX)
+        for trigger in _TRIGGERS:
+            conn.exec_driver_sql(trigger)
+    rebuild_index(engine)
+    return True
+
+def reindex_unpublished_posts(engine):
+    """Rehace los triggers de posts de versiones anteriores, que indexaban todos los
+    estados, y saca del índice los posts que no están publicados."""
+    if not fts_available(engine):
+        return False
+    with engine.begin() as conn:
+        conn.exec_driver_sql("DROP TRIGGER IF EXISTS posts_search_ai")
+        conn.exec_driver_sql("DROP TRIGGER IF EXISTS posts_search_au")
+        conn.exec_driver_sql(_CREATE_INDEX)
+        for trigger in _TRIGGERS:
+            conn.exec_driver_sql(trigger)
+        conn.exec_driver_sql(
+            "DELETE FROM search_index WHERE rowid IN "
+            "(SELECT id * 2 + 1 FROM posts WHERE status != 'publicado')"
+        )
+    rebuild_index(engine)
+    return True
+
+def _indexed_rows(engine):
+    with engine.connect() as conn:
+        return conn.exec_driver_sql("SELECT count(*) FROM search_index").scalar()
+
+def rebuild_index(engine, batch_size=BATCH_SIZE):
+    """Indexa, por lotes, las filas que faltan en el índice. Devuelve cuántas agregó."""
+    # rowcount de INSERT ... SELECT sobre la tabla FTS5 es siempre 0: se cuenta antes y después
+    before = _indexed_rows(engine)
+    for table, sql in _BACKFILL.items():
+        last_id = 0
+        while True:
+            with engine.begin() as conn:
+                max_id = conn.execute(
+                    text(f"SELECT max(id) FROM (SELECT id FROM {table} WHERE id > :last_id ORDER BY id LIMIT :limit)"),
+                    {"last_id": last_id, "limit": batch_size},
+                ).scalar()
+                if max_id is None:
+                    break
+                conn.execute(text(sql), {"last_id": last_id, "max_id": max_id})
+            last_id = max_id
+    return _indexed_rows(engine) - before
+
+def build_match_query(query):
+    """Convierte lo que escribe el usuario en una expresión MATCH segura.
+
+    Cada palabra se busca como prefijo y sin la "s"/"es" final, así "apuntes de
+    estructuras" encuentra "Apunte de Estructuras I".
+    """
+    terms = []
+    for word in re.findall(r"\w+", query.lower()):
+        if word in STOPWORDS:
+            continue
+        if len(word) > 4 and word.endswith("es"):
+            word = word[:-2]
+        elif len(word) > 3 and word.endswith("s"):
+            word = word[:-1]
+        terms.append(f'"{word}"*')
+    return " ".join(terms)
+
+def search(session, query, limit=RESULTS_PAGE_SIZE, offset=0):
+    """Resultados ordenados por BM25 (el título pesa más que la descripción)."""
+    match = build_match_query(query)
+    if not match:
+        return []
+    if not fts_available(session.get_bind()):
+        return _search_like(session, query, limit, offset)
+    rows = session.execute(
+        text(
+            "SELECT kind, ref_id, subject_id, title, "
+            "snippet(search_index, 4, '**', '**', '…', 16), "
+            "bm25(search_index, 0, 0, 0, 10.0, 1.0) AS rank "
+            "FROM search_index WHERE search_index MATCH :match "
+            "ORDER BY rank LIMIT :limit OFFSET :offset"
+        ),
+        {"match": match, "limit": limit, "offset": offset},
+    )
+    return [SearchHit(*row) for row in rows]
+
+def _search_like(session, query, limit, offset):
+    # Alternativa sin FTS5 (p. ej. PostgreSQL): coincidencia simple, sin ranking
+    pattern = f"%{query.strip()}%"
+    resources = (
+        session.query(Resource.id, Resource.subject_id, Resource.title, Resource.description)
+        .filter(or_(Resource.title.ilike(pattern), Resource.description.ilike(pattern)))
+        .order_by(Resource.id)
+        .limit(offset + limit)
+    )
+    posts = (
+        session.query(Post.id, Post.subject_id, Post.caption)
+        .filter(Post.caption.ilike(pattern), Post.status == "publicado")
+        .order_by(Post.id)
+        .limit(offset + limit)
+    )
+    hits = [SearchHit("resource", r.id, r.subject_id, r.title, r.description or "", 0.0) for r in resources]
+    hits += [SearchHit("post", p.id, p.subject_id, "", p.caption or "", 0.0) for p in posts]
+    return hits[offset:offset + limit]
@@ -0,0 +1,611 @@
+"""Acceso a datos de las páginas, sin Streamlit.
+
+Cada función abre y cierra su propia sesión y devuelve modelos de lectura
+inmutables (namedtuples con sólo las columnas que la página muestra), armados
+con selects de columnas en lugar de cargar entidades completas. Así el mismo
+camino de datos sirve para la app, los benchmarks y cualquier caché.
+"""
+import datetime
+import mimetypes
+from collections import namedtuple
+from pathlib import Path
+
+from sqlalchemy import delete, func, tuple_, update
+
+import trending
+import upload_queue
+from database import dialect_insert, get_session
+from models import (
+    User, Subject, Catedra, TP, UserTP, Post, Like, Resource, Rating,
+    CatedraRatingStats, UserStats, UserSubjectStats,
+)
+from refdata import REFERENCE, RATINGS, bump_version, cache_key, get_reference_data
+from shared_cache import shared_cache
+from search import search, RESULTS_PAGE_SIZE
+from storage import blob_store
+
+TP_STATES = ["Pendiente", "Entregado", "Aprobado"]
+FEED_PAGE_SIZE = 20
+TRENDING_BOOST = 1.5      # multiplicador para materias del año o con TPs del lector
+RANKING_PRIOR_WEIGHT = 5   # reseñas "virtuales" con el promedio global
+RANKING_CACHE_TTL = 600    # s; además se invalida con cada reseña
+
+# ----------------------------
+# Modelos de lectura
+# ----------------------------
+UserSummary = namedtuple("UserSummary", "id name year current_catedra role")
+TPState = namedtuple("TPState", "id name state grade")
+SubjectProgress = namedtuple("SubjectProgress", "id name year tps approved total progress")
+FeedPost = namedtuple(
+    "FeedPost", "id user_id image_path thumb_path feed_path caption created_at like_count autor materia"
+)
+ProfilePost = namedtuple("ProfilePost", "id image_path thumb_path feed_path caption created_at materia status")
+ResourceItem = namedtuple("ResourceItem", "id title description file_path file_name file_size file_mime")
+AcademicStats = namedtuple("AcademicStats", "approved delivered pending grade_count average")
+SubjectAverage = namedtuple("SubjectAverage", "subject_id materia approved grade_count average")
+CatedraRank = namedtuple(
+    "CatedraRank",
+    "id name subject_id materia rating_count average score "
+    "stars_1 stars_2 stars_3 stars_4 stars_5 user_rating",
+)
+
+_USER_COLUMNS = (User.id, User.name, User.year, User.current_catedra, User.role)
+
+# ----------------------------
+# Usuarios
+# ----------------------------
+def get_or_create_user(name, year, catedra):
+    """Usuario con ese nombre; si no existe lo crea con el año y la cátedra dados."""
+    with get_session() as session:
+        row = session.query(*_USER_COLUMNS).filter(User.name == name).first()
+        if row is not None:
+            return UserSummary._make(row)
+        user = User(name=name, year=year, current_catedra=catedra)
+        session.add(user)
+        session.flush()
+        return UserSummary(user.id, user.name, user.year, user.current_catedra, user.role)
+
+def get_user_role(user_id):
+    with get_session() as session:
+        return session.query(User.role).filter(User.id == user_id).scalar()
+
+# ----------------------------
+# Cursada
+# ----------------------------
+def save_tp_progress(user_id, changes):
+    """Guarda {tp_id: (estado, nota)} del usuario en una sola transacción."""
+    _save_user_tps(
+        [{"user_id": user_id, "tp_id": tp_id, "state": state, "grade": grade} for tp_id, (state, grade) in changes.items()]
+    )
+
+def bulk_save_tp_states(entries):
+    """Upsert de (user_id, tp_id, estado) en una transacción.
+
+    Pensado también para ayudantes que actualizan una comisión entera. Las
+    notas existentes se conservan.
+    """
+    _save_user_tps(
+        [{"user_id": user_id, "tp_id": tp_id, "state": state} for user_id, tp_id, state in entries]
+    )
+
+_STATE_COLUMNS = {"Aprobado": "tps_approved", "Entregado": "tps_delivered", "Pendiente": "tps_pending"}
+
+def _save_user_tps(rows):
+    """Upsert de filas de user_tps y de sus estadísticas, en la misma transacción.
+
+    Usa INSERT ... ON CONFLICT(user_id, tp_id) DO UPDATE y sólo reescribe las
+    filas que cambiaron; user_stats y user_subject_stats se ajustan con la
+    diferencia entre el valor anterior y el nuevo de cada fila. Las filas sin
+    "grade" conservan la nota que tenían. `approved_at` guarda cuándo el TP
+    pasó a "Aprobado" (para la analítica de tiempos de aprobación).
+
+    Las diferencias salen de las filas leídas antes del upsert, así que dos
+    guardados del mismo usuario (dos pestañas, un doble clic) no pueden leer a
+    la vez: primero se bloquean sus filas de users hasta el commit.
+    """
+    if not rows:
+        return
+    now = datetime.datetime.utcnow()
+    with get_session() as session:
+        keys = [(row["user_id"], row["tp_id"]) for row in rows]
+        _lock_users(session, {user_id for user_id, _ in keys})
+        previous = {}
+        approved_at = {}
+        for user_id, tp_id, state, grade, approved in session.query(
+            UserTP.user_id, UserTP.tp_id, UserTP.state, UserTP.grade, UserTP.approved_at
+        ).filter(
+            # SQLite no usa el índice para el IN de tuplas solo: el filtro por
+            # user_id lo convierte en una búsqueda sobre _user_tp_uc
+            UserTP.user_id.in_({user_id for user_id, _ in keys}),
+            tuple_(UserTP.user_id, UserTP.tp_id).in_(keys),
+        ):
+            previous[user_id, tp_id] = (state, grade)
+            approved_at[user_id, tp_id] = approved
+        for key, row in zip(keys, rows):
+            old_state, old_grade = previous.get(key, (None, None))
+            row.setdefault("grade", old_grade)
+            if row["state"] != "Aprobado":
+                row["approved_at"] = None
+            elif old_state == "Aprobado":
+                row["approved_at"] = approved_at[key]
+            else:
+                row["approved_at"] = now
+
+        insert = dialect_insert(session)
+        stmt = insert(UserTP)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[UserTP.user_id, UserTP.tp_id],
+            set_={
+                "state": stmt.excluded.state,
+                "grade": stmt.excluded.grade,
+                "approved_at": stmt.excluded.approved_at,
+            },
+            where=UserTP.state.is_distinct_from(stmt.excluded.state)
+            | UserTP.grade.is_distinct_from(stmt.excluded.grade),
+        )
+        session.execute(stmt, rows)
+        _apply_tp_deltas(session, previous, rows)
+
+def _lock_users(session, user_ids):
+    # UPDATE sin cambios: en PostgreSQL bloquea las filas de users y en SQLite
+    # abre la transacción con el bloqueo de escritura, antes de cualquier lectura
+    session.execute(
+        update(User).where(User.id.in_(user_ids)).values(id=User.id),
+        execution_options={"synchronize_session": False},
+    )
+
+def _apply_tp_deltas(session, previous, rows):
+    subject_of = dict(
+        session.query(TP.id, TP.subject_id).filter(TP.id.in_({row["tp_id"] for row in rows}))
+    )
+    user_deltas = {}
+    subject_deltas = {}
+    for row in rows:
+        old_state, old_grade = previous.get((row["user_id"], row["tp_id"]), (None, None))
+        new_state, new_grade = row["state"], row["grade"]
+        if (old_state, old_grade) == (new_state, new_grade):
+            continue
+        grade_deltas = {
+            "grade_sum": (new_grade or 0) - (old_grade or 0),
+            "grade_count": (new_grade is not None) - (old_grade is not None),
+        }
+        user = user_deltas.setdefault(row["user_id"], dict.fromkeys([*_STATE_COLUMNS.values(), *grade_deltas], 0))
+        if old_state in _STATE_COLUMNS:
+            user[_STATE_COLUMNS[old_state]] -= 1
+        if new_state in _STATE_COLUMNS:
+            user[_STATE_COLUMNS[new_state]] += 1
+        subject = subject_deltas.setdefault(
+            (row["user_id"], subject_of[row["tp_id"]]), {"tps_approved": 0, "grade_sum": 0, "grade_count": 0}
+        )
+        subject["tps_approved"] += (new_state == "Aprobado") - (old_state == "Aprobado")
+        for column, delta in grade_deltas.items():
+            user[column] += delta
+            subject[column] += delta
+
+    for user_id, deltas in user_deltas.items():
+        _increment(session, UserStats, {"user_id": user_id}, deltas)
+    for (user_id, subject_id), deltas in subject_deltas.items():
+        _increment(session, UserSubjectStats, {"user_id": user_id, "subject_id": subject_id}, deltas)
+
+def _increment(session, model, key, deltas):
+    """Suma `deltas` a la fila `key` de una tabla de contadores (la crea si falta)."""
+    insert = dialect_insert(session)
+    stmt = insert(model).values(**key, **deltas)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[getattr(model, column) for column in key],
+        set_={column: getattr(model, column) + getattr(stmt.excluded, column) for column in deltas},
+    )
+    session.execute(stmt)
+
+def get_academic_stats(user_id):
+    """Resumen de TPs y promedio del usuario, leído de su fila de user_stats.
+
+    `pending` son los TPs que marcó "Pendiente"; los del plan que nunca tocó
+    (incluidos los de años que todavía no cursa) no cuentan.
+    """
+    with get_session() as session:
+        row = (
+            session.query(
+                UserStats.tps_approved,
+                UserStats.tps_delivered,
+                UserStats.tps_pending,
+                UserStats.grade_sum,
+                UserStats.grade_count,
+            )
+            .filter(UserStats.user_id == user_id)
+            .first()
+        )
+    approved, delivered, pending, grade_sum, grade_count = row or (0, 0, 0, 0, 0)
+    return AcademicStats(
+        approved,
+        delivered,
+        pending,
+        grade_count,
+        grade_sum / grade_count if grade_count else None,
+    )
+
+def get_subject_averages(user_id):
+    """Promedio por materia (SubjectAverage) de las materias con alguna nota o TP aprobado."""
+    with get_session() as session:
+        rows = {
+            subject_id: (approved, grade_sum, grade_count)
+            for subject_id, approved, grade_sum, grade_count in session.query(
+                UserSubjectStats.subject_id,
+                UserSubjectStats.tps_approved,
+                UserSubjectStats.grade_sum,
+                UserSubjectStats.grade_count,
+            ).filter(UserSubjectStats.user_id == user_id)
+        }
+
+    averages = []
+    for subj in get_reference_data().subjects:
+        approved, grade_sum, grade_count = rows.get(subj.id, (0, 0, 0))
+        if approved or grade_count:
+            averages.append(
+                SubjectAverage(subj.id, subj.name, approved, grade_count, grade_sum / grade_count if grade_count else None)
+            )
+    return averages
+
+def get_curriculum_snapshot(user_id):
+    """Materias por año con sus TPs ordenados y el estado de cada uno para el usuario.
+
+    La estructura del plan sale del caché de referencia; lo único que se consulta
+    es el estado de los TPs del usuario. Devuelve {año: [SubjectProgress, ...]}.
+    """
+    ref = get_reference_data()
+    with get_session() as session:
+        progress = {
+            tp_id: (state, grade)
+            for tp_id, state, grade in session.query(UserTP.tp_id, UserTP.state, UserTP.grade).filter(
+                UserTP.user_id == user_id
+            )
+        }
+
+    snapshot = {}
+    for subj in ref.subjects:
+        tps = []
+        for tp in ref.tps_for(subj.id):
+            state, grade = progress.get(tp.id, (None, None))
+            tps.append(TPState(tp.id, tp.name, state or "Pendiente", grade))
+        snapshot.setdefault(subj.year, []).append(_subject_progress(subj.id, subj.name, subj.year, tuple(tps)))
+    return snapshot
+
+def _subject_progress(subject_id, name, year, tps):
+    approved = sum(1 for tp in tps if tp.state == "Aprobado")
+    progress = approved / len(tps) if tps else 0.0
+    return SubjectProgress(subject_id, name, year, tps, approved, len(tps), progress)
+
+def with_tp_progress(subject, changes):
+    """Copia de un SubjectProgress con {tp_id: (estado, nota)} aplicado."""
+    tps = tuple(
+        tp._replace(state=changes[tp.id][0], grade=changes[tp.id][1]) if tp.id in changes else tp
+        for tp in subject.tps
+    )
+    return _subject_progress(subject.id, subject.name, subject.year, tps)
+
+# ----------------------------
+# Feed
+# ----------------------------
+def get_feed_page(cursor=None, limit=FEED_PAGE_SIZE):
+    """Devuelve una página del feed (FeedPost) y el cursor para pedir la siguiente.
+
+    Paginación por keyset sobre (created_at, id): `cursor` es la tupla del último
+    post de la página anterior (None para la primera). Cada página es una única
+    consulta con autor, materia y el contador de likes del post.
+    """
+    with get_session() as session:
+        query = _feed_query(session)
+        if cursor is not None:
+            query = query.filter(tuple_(Post.created_at, Post.id) < tuple_(*cursor))
+        # Pedimos una fila de más para saber si hay otra página
+        rows = query.order_by(Post.created_at.desc(), Post.id.desc()).limit(limit + 1).all()
+
+    posts = [FeedPost._make(row) for row in rows]
+    next_cursor = None
+    if len(posts) > limit:
+        posts = posts[:limit]
+        next_cursor = (posts[-1].created_at, posts[-1].id)
+    return posts, next_cursor
+
+def get_trending_page(user_id, cursor=None, limit=FEED_PAGE_SIZE):
+    """Una página del feed por tendencia (FeedPost) y el cursor para pedir la siguiente.
+
+    Keyset sobre (trend_score, id), un rango del índice ix_posts_trend_score_id.
+    El cursor lleva el instante de referencia con que se leyó el puntaje, por si
+    `trending.rebase` reescaló entre una página y otra. Dentro de cada página
+    suben (TRENDING_BOOST) los posts de materias del año del lector o en las
+    que tiene TPs sin aprobar; entre páginas manda el puntaje guardado.
+    """
+    with get_session() as session:
+        base = trending.get_base(session)
+        query = _feed_query(session).add_columns(Post.trend_score, Post.subject_id)
+        if cursor is not None:
+            cursor_base, score, post_id = cursor
+            score = trending.rescale_cursor(cursor_base, score, base)
+            query = query.filter(tuple_(Post.trend_score, Post.id) < tuple_(score, post_id))
+        rows = query.order_by(Post.trend_score.desc(), Post.id.desc()).limit(limit + 1).all()
+        boosted = _viewer_subject_ids(session, user_id)
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = (base, rows[-1].trend_score, rows[-1].id)
+    rows.sort(key=lambda row: row.trend_score * (TRENDING_BOOST if row.subject_id in boosted else 1), reverse=True)
+    return [FeedPost._make(row[:len(FeedPost._fields)]) for row in rows], next_cursor
+
+def _feed_query(session):
+    # Columnas de FeedPost: post con autor, materia y contador de likes
+    return (
+        session.query(
+            Post.id,
+            Post.user_id,
+            Post.image_path,
+            Post.thumb_path,
+            Post.feed_path,
+            Post.caption,
+            Post.created_at,
+            Post.like_count,
+            User.name.label("autor"),
+            Subject.name.label("materia"),
+        )
+        .join(User, User.id == Post.user_id)
+        .join(Subject, Subject.id == Post.subject_id)
+        .filter(Post.status == upload_queue.POST_PUBLISHED)
+    )
+
+def _viewer_subject_ids(session, user_id):
+    # Materias del año que cursa el usuario y materias con TPs sin aprobar
+    year = session.query(User.year).filter(User.id == user_id).scalar()
+    subject_ids = {s.id for s in get_reference_data().subjects if s.year == year}
+    subject_ids.update(
+        subject_id for subject_id, in session.query(TP.subject_id)
+        .join(UserTP, UserTP.tp_id == TP.id)
+        .filter(UserTP.user_id == user_id, UserTP.state != "Aprobado")
+        .distinct()
+    )
+    return subject_ids
+
+def get_liked_post_ids(user_id, post_ids):
+    """Subconjunto de `post_ids` a los que `user_id` dio like (una consulta)."""
+    if not post_ids:
+        return set()
+    with get_session() as session:
+        rows = session.query(Like.post_id).filter(
+            Like.user_id == user_id, Like.post_id.in_(post_ids)
+        )
+        return {post_id for post_id, in rows}
+
+def set_like(user_id, post_id, liked):
+    """Deja el like de `user_id` sobre `post_id` en el estado pedido.
+
+    Es idempotente: el contador `posts.like_count` y el puntaje de tendencia
+    sólo se ajustan si la fila de `likes` realmente se insertó o se borró, en
+    la misma transacción.
+    """
+    with get_session() as session:
+        if liked:
+            liked_at = datetime.datetime.utcnow()
+            insert = dialect_insert(session)
+            result = session.execute(
+                insert(Like)
+                .values(user_id=user_id, post_id=post_id, created_at=liked_at)
+                .on_conflict_do_nothing(index_elements=[Like.user_id, Like.post_id])
+            )
+            delta = result.rowcount
+        else:
+            removed = session.execute(
+                delete(Like)
+                .where(Like.user_id == user_id, Like.post_id == post_id)
+                .returning(Like.created_at)
+            ).all()
+            delta = -len(removed)
+            liked_at = removed[0].created_at if removed else None
+        if delta:
+            session.query(Post).filter(Post.id == post_id).update(
+                {Post.like_count: Post.like_count + delta}, synchronize_session=False
+            )
+            if liked_at is not None:
+                trending.add_event(session, post_id, liked_at, sign=delta)
+
+def create_post(user_id, subject_id, fileobj, caption, ext=""):
+    """Guarda la imagen subida tal cual y encola su procesamiento. Devuelve el id.
+
+    `fileobj` se copia al almacén de a bloques. El post queda "procesando"
+    (fuera del feed) hasta que un worker de upload_queue lo valida, genera los
+    derivados y lo publica.
+    """
+    with get_session() as session:
+        now = datetime.datetime.utcnow()
+        post = Post(
+            user_id=user_id,
+            subject_id=subject_id,
+            image_path=blob_store.put_stream(session, fileobj, ext=ext).path,
+            caption=caption,
+            status=upload_queue.POST_PROCESSING,
+            created_at=now,
+            trend_score=trending.initial_score(session, now),
+        )
+        session.add(post)
+        session.flush()
+        upload_queue.enqueue(session, post.id)
+        post_id = post.id
+    upload_queue.notify()
+    return post_id
+
+def get_upload_queue_metrics():
+    """Estado de la cola de procesamiento de imágenes (upload_queue.QueueMetrics)."""
+    with get_session() as session:
+        return upload_queue.metrics(session)
+
+# ----------------------------
+# Perfil
+# ----------------------------
+def get_profile_data(user_id):
+    """UserSummary y sus publicaciones (ProfilePost), de la más reciente a la más antigua.
+
+    Incluye las que todavía se están procesando o fueron rechazadas (ver `status`).
+    """
+    with get_session() as session:
+        row = session.query(*_USER_COLUMNS).filter(User.id == user_id).first()
+        posts = (
+            session.query(
+                Post.id, Post.image_path, Post.thumb_path, Post.feed_path,
+                Post.caption, Post.created_at, Subject.name.label("materia"), Post.status,
+            )
+            .join(Subject, Subject.id == Post.subject_id)
+            .filter(Post.user_id == user_id)
+            .order_by(Post.created_at.desc())
+            .all()
+        )
+    user = UserSummary._make(row) if row is not None else None
+    return user, tuple(ProfilePost._make(post) for post in posts)
+
+# ----------------------------
+# Apuntes
+# ----------------------------
+def get_resources_for_subject(subject_id):
+    """Apuntes de una materia (sólo metadatos, nunca el contenido del archivo)."""
+    with get_session() as session:
+        rows = (
+            session.query(
+                Resource.id, Resource.title, Resource.description,
+                Resource.file_path, Resource.file_name, Resource.file_size, Resource.file_mime,
+            )
+            .filter_by(subject_id=subject_id)
+            .all()
+        )
+    return tuple(ResourceItem._make(row) for row in rows)
+
+def create_resource(subject_id, title, description, attachment=None):
+    """Crea un apunte; `attachment` es un archivo subido (se copia por partes)."""
+    with get_session() as session:
+        resource = Resource(subject_id=subject_id, title=title, description=description)
+        if attachment is not None:
+            stored = blob_store.put_stream(session, attachment, ext=Path(attachment.name).suffix)
+            resource.file_path = stored.path
+            resource.file_name = attachment.name
+            resource.file_size = stored.size
+            resource.file_hash = stored.hash
+            resource.file_mime = (
+                getattr(attachment, "type", None)
+                or mimetypes.guess_type(attachment.name)[0]
+                or "application/octet-stream"
+            )
+        session.add(resource)
+        session.flush()
+        return resource.id
+
+def search_content(query, limit=RESULTS_PAGE_SIZE, offset=0):
+    """Apuntes y publicaciones que coinciden con `query` (SearchHit)."""
+    with get_session() as session:
+        return search(session, query, limit=limit, offset=offset)
+
+# ----------------------------
+# Ranking de cátedras
+# ----------------------------
+def _apply_rating_delta(session, catedra_id, old, new):
+    """Ajusta catedra_rating_stats al pasar una puntuación de `old` a `new`.
+
+    `old`/`new` son None cuando la reseña no existía o se borró.
+    """
+    values = {
+        "rating_count": (new is not None) - (old is not None),
+        "rating_sum": (new or 0) - (old or 0),
+    }
+    for star in range(1, 6):
+        values[f"stars_{star}"] = (new == star) - (old == star)
+    _increment(session, CatedraRatingStats, {"catedra_id": catedra_id}, values)
+    bump_version(session, RATINGS)
+
+def rate_catedra(user_id, catedra_id, rating, comment=None):
+    """Crea o edita la reseña del usuario y actualiza las estadísticas juntas.
+
+    Como en `_save_user_tps`, la diferencia sale de la reseña leída, así que
+    primero se bloquea al usuario (un doble clic o dos pestañas esperan).
+    """
+    with get_session() as session:
+        _lock_users(session, {user_id})
+        existing = session.query(Rating).filter_by(user_id=user_id, catedra_id=catedra_id).first()
+        old = existing.rating if existing else None
+        if existing:
+            existing.rating = rating
+            existing.comment = comment
+        else:
+            session.add(Rating(user_id=user_id, catedra_id=catedra_id, rating=rating, comment=comment))
+        _apply_rating_delta(session, catedra_id, old, rating)
+
+def delete_rating(user_id, catedra_id):
+    with get_session() as session:
+        _lock_users(session, {user_id})
+        existing = session.query(Rating).filter_by(user_id=user_id, catedra_id=catedra_id).first()
+        if existing:
+            _apply_rating_delta(session, catedra_id, existing.rating, None)
+            session.delete(existing)
+
+def with_rating_change(rank, old, new):
+    """Copia de un CatedraRank con la reseña del usuario pasada de `old` a `new`.
+
+    Ajusta cantidad, promedio e histograma como `_apply_rating_delta`; el
+    puntaje y el orden se recalculan en la próxima consulta del ranking.
+    """
+    count = rank.rating_count + (new is not None) - (old is not None)
+    total = (rank.average or 0) * rank.rating_count + (new or 0) - (old or 0)
+    stars = {
+        f"stars_{star}": (getattr(rank, f"stars_{star}") or 0) + (new == star) - (old == star)
+        for star in range(1, 6)
+    }
+    return rank._replace(
+        rating_count=count,
+        average=total / count if count else None,
+        user_rating=new,
+        **stars,
+    )
+
+def get_catedra_ranking(user_id, subject_id=None):
+    """Cátedras (CatedraRank) ordenadas por puntaje bayesiano, con la reseña del usuario.
+
+    El puntaje es (C·m + suma) / (C + cantidad), con m el promedio global y
+    C = RANKING_PRIOR_WEIGHT, para que dos reseñas de 5 no encabecen la lista.
+    El ranking es igual para todos y sale del caché compartido (se invalida con
+    cada reseña); por usuario sólo se consultan sus propias reseñas.
+    """
+    ranking = shared_cache.get_or_set(
+        cache_key("ranking", subject_id, tables=(REFERENCE, RATINGS)),
+        lambda: _catedra_ranking(subject_id),
+        ttl=RANKING_CACHE_TTL,
+    )
+    with get_session() as session:
+        mine = dict(session.query(Rating.catedra_id, Rating.rating).filter(Rating.user_id == user_id))
+    return [rank._replace(user_rating=mine.get(rank.id)) for rank in ranking]
+
+def _catedra_ranking(subject_id):
+    # Una consulta sobre catedra_rating_stats; user_rating queda en None
+    with get_session() as session:
+        stats = CatedraRatingStats
+        global_mean = (
+            session.query(
+                func.coalesce(func.sum(stats.rating_sum) * 1.0 / func.nullif(func.sum(stats.rating_count), 0), 3.0)
+            ).scalar_subquery()
+        )
+        count = func.coalesce(stats.rating_count, 0)
+        score = (RANKING_PRIOR_WEIGHT * global_mean + func.coalesce(stats.rating_sum, 0)) / (
+            RANKING_PRIOR_WEIGHT + count
+        )
+        query = (
+            session.query(
+                Catedra.id,
+                Catedra.name,
+                Catedra.subject_id,
+                Subject.name.label("materia"),
+                count.label("rating_count"),
+                (stats.rating_sum * 1.0 / func.nullif(stats.rating_count, 0)).label("average"),
+                score.label("score"),
+                stats.stars_1, stats.stars_2, stats.stars_3, stats.stars_4, stats.stars_5,
+            )
+            .join(Subject, Subject.id == Catedra.subject_id)
+            .outerjoin(stats, stats.catedra_id == Catedra.id)
+        )
+        if subject_id is not None:
+            query = query.filter(Catedra.subject_id == subject_id)
+        rows = query.order_by(score.desc(), Catedra.name).all()
+    return tuple(CatedraRank(*row, user_rating=None) for row in rows)
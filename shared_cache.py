@@ -0,0 +1,210 @@
+"""Caché en disco compartido por todos los procesos de la app en la misma máquina.
+
+Es un archivo SQLite propio (independiente de la base de la app) en CACHE_DIR,
+en modo WAL para que muchos procesos lean a la vez. Los valores se guardan
+serializados con pickle, comprimidos con zlib a partir de COMPRESS_MIN bytes.
+Cada entrada tiene TTL y, cuando el total supera `max_bytes`, se descartan las
+usadas hace más tiempo (LRU). El total lo mantienen triggers en `meta`, así
+controlar el tamaño no recorre la tabla.
+
+No invalida nada por su cuenta: las claves incluyen las versiones de
+`data_versions` (ver refdata.cache_key), así una escritura en cualquier
+proceso hace que todos pidan una clave nueva y la vieja envejece sola.
+
+Un error del caché nunca rompe una página: se registra y cuenta como fallo.
+"""
+import logging
+import pickle
+import sqlite3
+import threading
+import time
+import zlib
+
+from config import CACHE_DIR, SHARED_CACHE_MAX_BYTES
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL = 3600.0        # segundos
+COMPRESS_MIN = 1024         # bytes serializados a partir de los que se comprime
+TOUCH_RESOLUTION = 30.0     # segundos entre actualizaciones de accessed_at de una entrada
+EVICT_TO = 0.9              # al desalojar se baja hasta este porcentaje de max_bytes
+BUSY_TIMEOUT_MS = 2000
+
+_RAW = b"p"
+_COMPRESSED = b"z"
+_MISSING = object()
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    expires_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_accessed_at ON entries (accessed_at);
+CREATE TABLE IF NOT EXISTS meta (id INTEGER PRIMARY KEY CHECK (id = 1), total_size INTEGER NOT NULL);
+INSERT OR IGNORE INTO meta (id, total_size) VALUES (1, 0);
+CREATE TRIGGER IF NOT EXISTS entries_ai AFTER INSERT ON entries BEGIN
+    UPDATE meta SET total_size = total_size + new.size WHERE id = 1;
+END;
+CREATE TRIGGER IF NOT EXISTS entries_au AFTER UPDATE OF size ON entries BEGIN
+    UPDATE meta SET total_size = total_size + new.size - old.size WHERE id = 1;
+END;
+CREATE TRIGGER IF NOT EXISTS entries_ad AFTER DELETE ON entries BEGIN
+    UPDATE meta SET total_size = total_size - old.size WHERE id = 1;
+END;
+"""
+
+def dumps(value):
+    data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+    if len(data) >= COMPRESS_MIN:
+        return _COMPRESSED + zlib.compress(data, 1)
+    return _RAW + data
+
+def loads(blob):
+    blob = bytes(blob)
+    data = zlib.decompress(blob[1:]) if blob[:1] == _COMPRESSED else blob[1:]
+    return pickle.loads(data)
+
+class SharedCache:
+    def __init__(self, path, max_bytes=SHARED_CACHE_MAX_BYTES, default_ttl=DEFAULT_TTL):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self._local = threading.local()   # una conexión por hilo
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_MS / 1000, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def get(self, key, default=None):
+        """Valor guardado en `key`, o `default` si no está o venció."""
+        now = time.time()
+        try:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT value, expires_at, accessed_at FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return default
+            value, expires_at, accessed_at = row
+            if expires_at <= now:
+                conn.execute("DELETE FROM entries WHERE key = ? AND expires_at <= ?", (key, now))
+                self.misses += 1
+                return default
+            # El LRU no necesita precisión de segundos: se evita una escritura por lectura
+            if now - accessed_at > TOUCH_RESOLUTION:
+                conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+        except sqlite3.Error:
+            logger.warning("Caché compartido: no se pudo leer %s", key, exc_info=True)
+            self.errors += 1
+            self.misses += 1
+            return default
+        try:
+            result = loads(value)
+        except Exception:
+            # Cualquier cosa que no se pueda deserializar (p. ej. un namedtuple
+            # de otra versión del código) es un fallo y se descarta
+            logger.warning("Caché compartido: entrada ilegible %s", key, exc_info=True)
+            self.errors += 1
+            self.misses += 1
+            self._discard(key)
+            return default
+        self.hits += 1
+        return result
+
+    def set(self, key, value, ttl=None):
+        """Guarda `value` (serializable con pickle) por `ttl` segundos."""
+        now = time.time()
+        blob = dumps(value)
+        if len(blob) > self.max_bytes:
+            return
+        try:
+            conn = self._connect()
+            conn.execute(
+                "INSERT INTO entries (key, value, size, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET value = excluded.value, size = excluded.size, "
+                "expires_at = excluded.expires_at, accessed_at = excluded.accessed_at",
+                (key, blob, len(blob), now + (ttl or self.default_ttl), now),
+            )
+            if self._total_size(conn) > self.max_bytes:
+                self._evict(conn, now)
+        except sqlite3.Error:
+            logger.warning("Caché compartido: no se pudo guardar %s", key, exc_info=True)
+            self.errors += 1
+
+    def get_or_set(self, key, compute, ttl=None):
+        """Valor en `key`; si no está, lo calcula con `compute()` y lo guarda."""
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = compute()
+            self.set(key, value, ttl)
+        return value
+
+    def clear(self):
+        conn = self._connect()
+        conn.execute("DELETE FROM entries")
+
+    def stats(self):
+        try:
+            conn = self._connect()
+            entries = conn.execute("SELECT count(*) FROM entries").fetchone()[0]
+            size = self._total_size(conn)
+        except sqlite3.Error:
+            entries = size = None
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "entries": entries,
+            "bytes": size,
+            "max_bytes": self.max_bytes,
+        }
+
+    def _discard(self, key):
+        try:
+            self._connect().execute("DELETE FROM entries WHERE key = ?", (key,))
+        except sqlite3.Error:
+            logger.warning("Caché compartido: no se pudo borrar %s", key, exc_info=True)
+
+    def _total_size(self, conn):
+        return conn.execute("SELECT total_size FROM meta WHERE id = 1").fetchone()[0]
+
+    def _evict(self, conn, now):
+        # Primero lo vencido, después lo menos usado, hasta bajar a EVICT_TO
+        target = self.max_bytes * EVICT_TO
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM entries WHERE expires_at <= ?", (now,))
+            excess = self._total_size(conn) - target
+            while excess > 0:
+                # De a lotes, pero sin borrar más de lo que sobra: con entradas
+                # grandes un lote entero podía vaciar el caché
+                oldest = conn.execute("SELECT key, size FROM entries ORDER BY accessed_at LIMIT 32").fetchall()
+                if not oldest:
+                    break
+                doomed = []
+                for key, size in oldest:
+                    doomed.append((key,))
+                    excess -= size
+                    if excess <= 0:
+                        break
+                conn.executemany("DELETE FROM entries WHERE key = ?", doomed)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+shared_cache = SharedCache(CACHE_DIR / "shared.db")
@@ -0,0 +1,222 @@
+"""Servidor HTTP de sólo lectura para las imágenes publicadas del feed.
+
+Las rutas del almacén ya son el hash del contenido, así que cada URL es
+inmutable: se sirve con `Cache-Control: immutable` por un año y el hash como
+ETag. El navegador descarga cada imagen una sola vez y en los reruns de
+Streamlit sólo viaja el <img> con la URL, nunca los bytes.
+
+Sólo entrega los derivados (thumb_path, feed_path) de posts publicados: ni
+originales (pueden tener EXIF), ni subidas rechazadas o en proceso. Los
+adjuntos de Recursos no son públicos: se descargan por /files/ con una URL
+firmada que arma la app (`attachment_url`) y vence en ATTACHMENT_URL_TTL; se
+envían de a bloques desde el almacén, sin cargarlos en memoria. Escucha en STATIC_HOST (127.0.0.1
+por defecto) para ponerlo detrás de un proxy inverso; STATIC_URL es la URL
+pública de ese proxy. Sin STATIC_URL las URLs apuntan a localhost y sólo
+sirven si el navegador corre en el mismo equipo: `usable_from` lo decide y la
+app vuelve a st.image en otro caso.
+"""
+import hashlib
+import hmac
+import logging
+import mimetypes
+import os
+import re
+import secrets
+import shutil
+import threading
+import time
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote, unquote, urlencode, urlsplit
+
+from sqlalchemy import exists, or_
+
+from config import CACHE_DIR, SECRET_KEY, STATIC_HOST, STATIC_PORT, STATIC_URL, UPLOAD_DIR
+from database import SessionLocal
+from models import Post
+from storage import CHUNK_SIZE, BlobStore
+from upload_queue import POST_PUBLISHED
+
+logger = logging.getLogger(__name__)
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+# ab/cd/<sha256><ext>, como las arma BlobStore.relative_path
+_CONTENT_ADDRESSED = re.compile(r"^[0-9a-f]{2}/[0-9a-f]{2}/([0-9a-f]{64})(\.[0-9a-z]+)?$")
+LOCAL_HOSTS = {"", "localhost", "127.0.0.1", "::1"}
+FILES_PREFIX = "files/"
+ATTACHMENT_URL_TTL = 3600   # s; las URLs se renuevan en cada rerun
+
+def is_public(rel_path):
+    """True si `rel_path` es un derivado de algún post publicado."""
+    with SessionLocal() as session:
+        return session.query(
+            exists().where(
+                or_(Post.thumb_path == rel_path, Post.feed_path == rel_path),
+                Post.status == POST_PUBLISHED,
+            )
+        ).scalar()
+
+# ----------------------------
+# URLs firmadas de adjuntos
+# ----------------------------
+_key = None
+_key_lock = threading.Lock()
+
+def _signing_key():
+    # Compartida por los procesos de la máquina: SECRET_KEY o un archivo en CACHE_DIR
+    global _key
+    with _key_lock:
+        if _key is None:
+            if SECRET_KEY:
+                _key = SECRET_KEY.encode()
+            else:
+                path = CACHE_DIR / "secret_key"
+                path.parent.mkdir(parents=True, exist_ok=True)
+                try:
+                    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+                except FileExistsError:
+                    pass
+                else:
+                    with os.fdopen(fd, "w") as f:
+                        f.write(secrets.token_hex(32))
+                _key = path.read_text().strip().encode()
+        return _key
+
+def _signature(rel_path, name, expires):
+    message = f"{rel_path}\n{name}\n{expires}".encode()
+    return hmac.new(_signing_key(), message, hashlib.sha256).hexdigest()
+
+def attachment_url(rel_path, name, now=None):
+    """URL temporal para descargar el adjunto `rel_path` con el nombre `name`.
+
+    El vencimiento se redondea a ATTACHMENT_URL_TTL para que la URL no cambie
+    en cada rerun; dura entre una y dos veces ese tiempo.
+    """
+    now = int(now or time.time())
+    expires = (now // ATTACHMENT_URL_TTL + 2) * ATTACHMENT_URL_TTL
+    query = urlencode({"name": name, "expires": expires, "sig": _signature(rel_path, name, expires)})
+    return f"{base_url()}/{FILES_PREFIX}{quote(rel_path)}?{query}"
+
+def _verify(rel_path, query, now=None):
+    """Nombre del archivo si la firma de `query` es válida y no venció; si no, None."""
+    params = {key: values[0] for key, values in parse_qs(query).items()}
+    try:
+        name, expires, sig = params["name"], int(params["expires"]), params["sig"]
+    except (KeyError, ValueError):
+        return None
+    if expires < (now or time.time()):
+        return None
+    if not hmac.compare_digest(sig, _signature(rel_path, name, expires)):
+        return None
+    return name
+
+class StaticHandler(BaseHTTPRequestHandler):
+    root = UPLOAD_DIR
+
+    def do_GET(self):
+        self._serve(send_body=True)
+
+    def do_HEAD(self):
+        self._serve(send_body=False)
+
+    def _serve(self, send_body):
+        url = urlsplit(self.path)
+        rel_path = unquote(url.path).lstrip("/")
+        if rel_path.startswith(FILES_PREFIX):
+            self._serve_attachment(rel_path[len(FILES_PREFIX):], url.query, send_body)
+            return
+        match = _CONTENT_ADDRESSED.match(rel_path)
+        # Sólo archivos del almacén: nada de rutas relativas ni temporales
+        path = self.root / rel_path
+        if match is None or not path.is_file() or not is_public(rel_path):
+            self.send_error(HTTPStatus.NOT_FOUND)
+            return
+
+        etag = f'"{match.group(1)}"'
+        if etag in self.headers.get("If-None-Match", ""):
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", IMMUTABLE)
+            self.end_headers()
+            return
+
+        with open(path, "rb") as f:
+            size = path.stat().st_size
+            self.send_response(HTTPStatus.OK)
+            self.send_header("Content-Type", mimetypes.guess_type(path.name)[0] or "application/octet-stream")
+            self.send_header("Content-Length", str(size))
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", IMMUTABLE)
+            self.send_header("Access-Control-Allow-Origin", "*")
+            self.end_headers()
+            if send_body:
+                shutil.copyfileobj(f, self.wfile, CHUNK_SIZE)
+
+    def _serve_attachment(self, rel_path, query, send_body):
+        name = _verify(rel_path, query)
+        path = self.root / rel_path
+        if name is None or _CONTENT_ADDRESSED.match(rel_path) is None or not path.is_file():
+            self.send_error(HTTPStatus.NOT_FOUND)
+            return
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", mimetypes.guess_type(name)[0] or "application/octet-stream")
+        self.send_header("Content-Length", str(path.stat().st_size))
+        self.send_header("Content-Disposition", f"attachment; filename*=UTF-8''{quote(name)}")
+        self.send_header("Cache-Control", "private, no-store")
+        self.end_headers()
+        if send_body:
+            for chunk in BlobStore(self.root).iter_chunks(rel_path):
+                self.wfile.write(chunk)
+
+    def log_message(self, format, *args):
+        logger.debug("%s %s", self.address_string(), format % args)
+
+_server = None
+_server_lock = threading.Lock()
+
+def start(host=STATIC_HOST, port=STATIC_PORT):
+    """Levanta el servidor en un hilo (una vez por proceso). Devuelve la URL base.
+
+    Si el puerto ya está ocupado se asume que otro proceso de la app lo sirve.
+    """
+    global _server
+    with _server_lock:
+        if _server is None:
+            try:
+                _server = ThreadingHTTPServer((host, port), StaticHandler)
+            except OSError:
+                logger.info("El puerto %s ya está en uso; se usa el servidor existente", port)
+                _server = False
+            else:
+                _server.daemon_threads = True
+                threading.Thread(target=_server.serve_forever, name="static-server", daemon=True).start()
+    return base_url(port)
+
+_warned = False
+
+def usable_from(request_host):
+    """True si el navegador que pidió la página desde `request_host` llega a las URLs.
+
+    Sin STATIC_URL sólo es así en localhost. Si no, lo registra (una vez por
+    proceso) para que se configure STATIC_URL.
+    """
+    global _warned
+    if STATIC_URL:
+        return True
+    if (urlsplit(f"//{request_host or ''}").hostname or "") in LOCAL_HOSTS:
+        return True
+    if not _warned:
+        _warned = True
+        logger.error(
+            "STATIC_URL no está configurada y la app se usa desde %s: las imágenes se envían "
+            "por Streamlit. Configurar STATIC_URL con un proxy inverso hacia %s:%s",
+            request_host, STATIC_HOST, STATIC_PORT,
+        )
+    return False
+
+def base_url(port=STATIC_PORT):
+    return STATIC_URL.rstrip("/") if STATIC_URL else f"http://localhost:{port}"
+
+def file_url(rel_path):
+    """URL pública e inmutable de un archivo del almacén."""
+    return f"{base_url()}/{quote(rel_path)}"
@@ -0,0 +1,208 @@
+"""Almacén de archivos direccionado por contenido dentro de UPLOAD_DIR.
+
+Cada archivo se guarda una sola vez bajo `ab/cd/<sha256><ext>` y la tabla `blobs`
+lleva la cuenta de cuántas filas lo referencian. Los archivos sin referencias se
+borran recién en `collect_garbage`, así un rollback nunca deja una fila apuntando
+a un archivo inexistente.
+"""
+import hashlib
+import os
+import sqlite3
+import tempfile
+from collections import namedtuple
+from pathlib import Path
+
+from sqlalchemy import inspect, text
+from sqlalchemy.orm import Session
+
+from config import UPLOAD_DIR
+from database import dialect_insert
+from models import Blob
+
+CHUNK_SIZE = 1024 * 1024   # 1 MiB por lectura/escritura
+
+StoredFile = namedtuple("StoredFile", "path hash size")
+
+# Firmas de los formatos de imagen que acepta el feed
+_MAGIC_EXTENSIONS = [
+    (b"\xff\xd8\xff", ".jpg"),
+    (b"\x89PNG\r\n\x1a\n", ".png"),
+    (b"GIF8", ".gif"),
+]
+
+def guess_extension(data):
+    """Deduce la extensión a partir de los primeros bytes del archivo."""
+    for magic, ext in _MAGIC_EXTENSIONS:
+        if data.startswith(magic):
+            return ext
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return ".webp"
+    return ""
+
+class BlobStore:
+    def __init__(self, root=UPLOAD_DIR):
+        self.root = Path(root)
+
+    def relative_path(self, digest, ext=""):
+        """Ruta relativa (dentro de root) para un hash, repartida en dos niveles."""
+        return f"{digest[:2]}/{digest[2:4]}/{digest}{ext.lower()}"
+
+    def abspath(self, rel_path):
+        return self.root / rel_path
+
+    def put(self, session, data, ext=""):
+        """Guarda `data` (si no existía) y suma una referencia en la sesión dada.
+
+        Devuelve la ruta relativa a guardar en la fila que lo referencia. La
+        referencia queda confirmada cuando el llamador hace commit.
+        """
+        digest = hashlib.sha256(data).hexdigest()
+        rel_path = self.relative_path(digest, ext or guess_extension(data))
+        stored_path = self._add_reference(session, digest, rel_path, len(data))
+        self._write_if_missing(stored_path, data)
+        return stored_path
+
+    def put_stream(self, session, fileobj, ext="", chunk_size=CHUNK_SIZE):
+        """Como `put`, pero leyendo `fileobj` de a `chunk_size` bytes.
+
+        El contenido se copia a un temporal mientras se calcula el hash, así un
+        archivo de cientos de MB nunca está entero en memoria. Si ya existía uno
+        idéntico, el temporal se descarta. Devuelve un StoredFile.
+        """
+        tmp_dir = self.root / ".tmp"
+        tmp_dir.mkdir(parents=True, exist_ok=True)
+        hasher = hashlib.sha256()
+        size = 0
+        fd, tmp_name = tempfile.mkstemp(dir=tmp_dir)
+        try:
+            with os.fdopen(fd, "wb") as tmp:
+                while True:
+                    chunk = fileobj.read(chunk_size)
+                    if not chunk:
+                        break
+                    hasher.update(chunk)
+                    tmp.write(chunk)
+                    size += len(chunk)
+                tmp.flush()
+                os.fsync(tmp.fileno())
+
+            digest = hasher.hexdigest()
+            stored_path = self._add_reference(session, digest, self.relative_path(digest, ext), size)
+            target = self.abspath(stored_path)
+            if not target.exists():
+                target.parent.mkdir(parents=True, exist_ok=True)
+                os.replace(tmp_name, target)
+        finally:
+            Path(tmp_name).unlink(missing_ok=True)
+        return StoredFile(stored_path, digest, size)
+
+    def open(self, rel_path):
+        """Handle de sólo lectura sin buffer, para servir el archivo sin cargarlo."""
+        return open(self.abspath(rel_path), "rb", buffering=0)
+
+    def read(self, rel_path):
+        """Contenido completo del archivo; el handle se cierra al terminar."""
+        with self.open(rel_path) as f:
+            return f.readall()
+
+    def iter_chunks(self, rel_path, chunk_size=CHUNK_SIZE):
+        with self.open(rel_path) as f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+
+    def _add_reference(self, session, digest, rel_path, size):
+        # Si el contenido ya existía se conserva su ruta original
+        insert = dialect_insert(session)
+        stmt = insert(Blob).values(hash=digest, path=rel_path, size=size, refcount=1)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Blob.hash],
+            set_={"refcount": Blob.refcount + 1},
+        ).returning(Blob.path)
+        return session.execute(stmt).scalar_one()
+
+    def release(self, session, rel_path):
+        """Resta una referencia. El archivo se borra en `collect_garbage`."""
+        session.query(Blob).filter(Blob.path == rel_path).update(
+            {Blob.refcount: Blob.refcount - 1}, synchronize_session=False
+        )
+
+    def collect_garbage(self, session):
+        """Borra los archivos sin referencias. Devuelve cuántos se eliminaron."""
+        removed = 0
+        orphans = session.query(Blob.hash, Blob.path).filter(Blob.refcount <= 0).all()
+        for digest, rel_path in orphans:
+            deleted = (
+                session.query(Blob)
+                .filter(Blob.hash == digest, Blob.refcount <= 0)
+                .delete(synchronize_session=False)
+            )
+            if deleted:
+                self.abspath(rel_path).unlink(missing_ok=True)
+                removed += 1
+        return removed
+
+    def _write_if_missing(self, rel_path, data):
+        target = self.abspath(rel_path)
+        if target.exists():
+            return
+        target.parent.mkdir(parents=True, exist_ok=True)
+        # Escritura atómica: archivo temporal en el mismo directorio + rename
+        fd, tmp_name = tempfile.mkstemp(dir=target.parent, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as tmp:
+                tmp.write(data)
+                tmp.flush()
+                os.fsync(tmp.fileno())
+            os.replace(tmp_name, target)
+        except BaseException:
+            Path(tmp_name).unlink(missing_ok=True)
+            raise
+
+blob_store = BlobStore()
+
+# ----------------------------
+# Migración de posts.image (LargeBinary) al almacén
+# ----------------------------
+def migrate_post_images(engine, store=blob_store, batch_size=100, drop_column=True):
+    """Mueve las imágenes guardadas en `posts.image` al almacén, por lotes.
+
+    Nunca carga la tabla entera: recorre los posts por id, de a `batch_size`
+    filas, y confirma cada lote por separado, por lo que se puede interrumpir
+    y volver a correr. Al terminar elimina la columna si SQLite lo permite.
+    Devuelve la cantidad de imágenes migradas.
+    """
+    columns = {c["name"] for c in inspect(engine).get_columns("posts")}
+    if "image" not in columns:
+        return 0
+
+    migrated = 0
+    last_id = 0
+    while True:
+        with Session(bind=engine) as session:
+            rows = session.execute(
+                text(
+                    "SELECT id, image FROM posts "
+                    "WHERE id > :last_id AND image IS NOT NULL "
+                    "ORDER BY id LIMIT :limit"
+                ),
+                {"last_id": last_id, "limit": batch_size},
+            ).all()
+            if not rows:
+                break
+            for post_id, data in rows:
+                rel_path = store.put(session, bytes(data))
+                session.execute(
+                    text("UPDATE posts SET image_path = :path, image = NULL WHERE id = :id"),
+                    {"path": rel_path, "id": post_id},
+                )
+            session.commit()
+            migrated += len(rows)
+            last_id = rows[-1][0]
+
+    if drop_column and engine.dialect.name == "sqlite" and sqlite3.sqlite_version_info >= (3, 35, 0):
+        with engine.begin() as conn:
+            conn.execute(text("ALTER TABLE posts DROP COLUMN image"))
+    return migrated
@@ -0,0 +1,67 @@
+"""Base, caché compartido y almacén temporales para toda la corrida de pytest.
+
+config.py lee las variables de entorno al importarse, así que se fijan acá,
+antes de que los tests importen cualquier módulo de la app.
+"""
+import io
+import itertools
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+from PIL import Image
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_DIR))
+
+_TMP_DIR = Path(tempfile.mkdtemp(prefix="loop-tests-"))
+os.environ["DATABASE_URL"] = f"sqlite:///{_TMP_DIR / 'loop.db'}"
+os.environ["CACHE_DIR"] = str(_TMP_DIR / "cache")
+
+_names = itertools.count(1)
+
+@pytest.fixture(scope="session", autouse=True)
+def database():
+    from migrations import bootstrap
+    from storage import blob_store
+
+    blob_store.root = _TMP_DIR / "uploads"
+    bootstrap()
+
+def png(width=640, height=480):
+    out = io.BytesIO()
+    Image.new("RGB", (width, height), (40, 120, 200)).save(out, "PNG")
+    out.seek(0)
+    return out
+
+@pytest.fixture
+def make_user():
+    """Crea usuarios nuevos (UserSummary) para que los tests no compartan filas."""
+    from services import get_or_create_user
+
+    def make(year=1):
+        return get_or_create_user(f"Test {next(_names)}", year, "")
+    return make
+
+@pytest.fixture
+def make_post(make_user):
+    """Crea un post ya publicado y devuelve su id."""
+    from database import get_session
+    from models import Post
+    from storage import blob_store
+
+    def make(caption="post de prueba"):
+        author = make_user()
+        with get_session() as session:
+            post = Post(
+                user_id=author.id,
+                subject_id=1,
+                image_path=blob_store.put(session, png().getvalue(), ".png"),
+                caption=caption,
+            )
+            session.add(post)
+            session.flush()
+            return post.id
+    return make
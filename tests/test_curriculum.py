@@ -0,0 +1,90 @@
+"""Importación del plan de estudios: validación, diferencias contra la base y aplicación."""
+import io
+import itertools
+
+import pytest
+
+import curriculum
+from database import get_session
+from models import TP, Catedra, Resource, Subject
+from refdata import get_reference_data
+
+_names = itertools.count(1)
+
+def _plan(name, year=6, tps=("TP1", "TP2"), catedras=("Norte", "Sur"), description="Primera versión"):
+    return curriculum.parse_json({"subjects": [{
+        "name": name,
+        "year": year,
+        "tps": list(tps),
+        "catedras": list(catedras),
+        "resources": [{"title": f"Apunte de {name}", "description": description}],
+    }]})
+
+def _import(plan, **kwargs):
+    with get_session() as session:
+        return curriculum.import_plan(session, plan, **kwargs)
+
+def _stored(name):
+    with get_session() as session:
+        subject = session.query(Subject).filter(Subject.name == name).one()
+        tps = [tp for tp, in session.query(TP.name).filter(TP.subject_id == subject.id).order_by(TP.order)]
+        catedras = {c for c, in session.query(Catedra.name).filter(Catedra.subject_id == subject.id)}
+        descriptions = [d for d, in session.query(Resource.description).filter(Resource.subject_id == subject.id)]
+        return subject.year, tps, catedras, descriptions
+
+@pytest.fixture
+def subject_name():
+    return f"Materia de prueba {next(_names)}"
+
+def test_validate_reports_every_problem():
+    with pytest.raises(curriculum.CurriculumError) as excinfo:
+        curriculum.parse_json({"subjects": [
+            {"name": "Repetida", "year": 1, "tps": ["TP1", "TP1"]},
+            {"name": "Repetida", "year": 9, "catedras": [""]},
+        ]})
+    assert len(excinfo.value.errors) == 4
+
+def test_csv_and_json_give_the_same_plan(subject_name):
+    rows = [
+        "año,materia,tipo,nombre,descripcion",
+        f"6,{subject_name},materia,,",
+        f"6,{subject_name},tp,TP1,",
+        f"6,{subject_name},tp,TP2,",
+        f"6,{subject_name},catedra,Norte,",
+        f"6,{subject_name},catedra,Sur,",
+        f"6,{subject_name},apunte,Apunte de {subject_name},Primera versión",
+    ]
+    assert curriculum.parse_csv(io.StringIO("\n".join(rows))) == _plan(subject_name)
+
+def test_new_subject_is_inserted_once(subject_name):
+    changes = _import(_plan(subject_name))
+
+    summary = changes.summary()
+    assert (summary["materias nuevas"], summary["TPs nuevos"], summary["cátedras nuevas"]) == (1, 2, 2)
+    assert summary["apuntes nuevos"] == 1
+    assert _stored(subject_name) == (6, ["TP1", "TP2"], {"Norte", "Sur"}, ["Primera versión"])
+    assert subject_name in {s.name for s in get_reference_data().subjects_by_year[6]}
+
+    assert _import(_plan(subject_name)).is_empty()
+
+def test_changes_are_diffed_and_applied(subject_name):
+    _import(_plan(subject_name))
+    changed = _plan(subject_name, year=5, tps=("TP1", "Entrega final", "TP3"), catedras=("Norte",), description="Segunda versión")
+
+    preview = _import(changed, dry_run=True)
+    summary = preview.summary()
+    assert summary["materias modificadas"] == summary["TPs modificados"] == summary["TPs nuevos"] == 1
+    assert summary["apuntes modificados"] == 1
+    assert f"cátedra 'Sur' de '{subject_name}'" in preview.only_in_db
+    assert _stored(subject_name) == (6, ["TP1", "TP2"], {"Norte", "Sur"}, ["Primera versión"])
+
+    _import(changed)
+    # Lo que sólo está en la base se informa pero no se borra
+    assert _stored(subject_name) == (5, ["TP1", "Entrega final", "TP3"], {"Norte", "Sur"}, ["Segunda versión"])
+
+def test_update_existing_false_only_adds_rows(subject_name):
+    _import(_plan(subject_name))
+
+    _import(_plan(subject_name, year=4, tps=("Otro nombre", "TP2", "TP3")), update_existing=False)
+
+    assert _stored(subject_name) == (6, ["TP1", "TP2", "TP3"], {"Norte", "Sur"}, ["Primera versión"])
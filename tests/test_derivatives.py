@@ -0,0 +1,65 @@
+"""Backfill de derivados (maintenance.py build-derivatives)."""
+import argparse
+import os
+
+import pytest
+
+import images
+import maintenance
+import upload_queue
+from conftest import png
+from database import get_session
+from models import Post
+from storage import blob_store
+
+@pytest.fixture(autouse=True, scope="module")
+def image_pool():
+    yield
+    if images._executor is not None:
+        images._executor.shutdown()
+
+def _legacy_post(make_user, data, status=upload_queue.POST_PUBLISHED, image_path=None):
+    user = make_user()
+    with get_session() as session:
+        post = Post(
+            user_id=user.id,
+            subject_id=1,
+            image_path=image_path or blob_store.put(session, data, ".png"),
+            caption="legacy",
+            status=status,
+        )
+        session.add(post)
+        session.flush()
+        return post.id
+
+def _thumb(post_id):
+    with get_session() as session:
+        return session.query(Post.thumb_path).filter(Post.id == post_id).scalar()
+
+def test_backfill_skips_broken_posts_and_unpublished_ones(make_user, capsys):
+    image = png().getvalue()
+    missing = _legacy_post(make_user, None, image_path="ab/cd/" + "0" * 64 + ".png")
+    invalid = _legacy_post(make_user, b"no es una imagen" * 10)
+    processing = _legacy_post(make_user, image, status=upload_queue.POST_PROCESSING)
+    rejected = _legacy_post(make_user, image, status=upload_queue.POST_REJECTED)
+    valid = _legacy_post(make_user, image)
+
+    maintenance.cmd_build_derivatives(argparse.Namespace(batch_size=2))
+
+    assert _thumb(valid) is not None
+    assert [_thumb(post_id) for post_id in (missing, invalid, processing, rejected)] == [None] * 4
+    output = capsys.readouterr().out
+    assert f"Post {missing} salteado" in output and f"Post {invalid} salteado" in output
+    assert f"Post {processing} " not in output and f"Post {rejected} " not in output
+
+def crash(data):
+    os._exit(1)
+
+def test_backfill_survives_a_crashed_pool(make_user, monkeypatch, capsys):
+    post_ids = [_legacy_post(make_user, png().getvalue()) for _ in range(3)]
+    monkeypatch.setattr(maintenance, "process_upload", crash)
+
+    maintenance.cmd_build_derivatives(argparse.Namespace(batch_size=2))
+
+    assert [_thumb(post_id) for post_id in post_ids] == [None] * 3
+    assert "Posts salteados" in capsys.readouterr().out
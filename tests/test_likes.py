@@ -0,0 +1,34 @@
+"""Likes idempotentes y like_count igual a las filas de likes (maintenance.reconcile_like_counts)."""
+import random
+
+import services
+from database import get_session
+from maintenance import reconcile_like_counts
+from models import Like, Post
+
+def _like_state(post_id):
+    with get_session() as session:
+        count = session.query(Post.like_count).filter(Post.id == post_id).scalar()
+        rows = session.query(Like).filter(Like.post_id == post_id).count()
+    return count, rows
+
+def test_like_is_idempotent(make_user, make_post):
+    user, post_id = make_user(), make_post()
+
+    services.set_like(user.id, post_id, True)
+    services.set_like(user.id, post_id, True)
+    assert _like_state(post_id) == (1, 1)
+
+    services.set_like(user.id, post_id, False)
+    services.set_like(user.id, post_id, False)
+    assert _like_state(post_id) == (0, 0)
+
+def test_like_counts_match_likes(make_user, make_post):
+    rng = random.Random(7)
+    users = [make_user() for _ in range(5)]
+    posts = [make_post() for _ in range(3)]
+    for _ in range(60):
+        services.set_like(rng.choice(users).id, rng.choice(posts), rng.random() < 0.6)
+
+    with get_session() as session:
+        assert reconcile_like_counts(session) == 0
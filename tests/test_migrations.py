@@ -0,0 +1,27 @@
+"""Varios procesos que arrancan a la vez sobre una base nueva la migran una sola vez."""
+import os
+import sqlite3
+import subprocess
+import sys
+
+from conftest import REPO_DIR
+from migrations import MIGRATIONS
+
+def test_concurrent_processes_bootstrap_a_fresh_database(tmp_path):
+    db_path = tmp_path / "fresh.db"
+    env = {**os.environ, "DATABASE_URL": f"sqlite:///{db_path}", "CACHE_DIR": str(tmp_path / "cache")}
+    processes = [
+        subprocess.Popen(
+            [sys.executable, "-c", "from migrations import bootstrap; bootstrap()"],
+            cwd=REPO_DIR, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True,
+        )
+        for _ in range(3)
+    ]
+    outputs = [process.communicate(timeout=300)[0] for process in processes]
+    assert [process.returncode for process in processes] == [0, 0, 0], "\n".join(outputs)
+
+    with sqlite3.connect(db_path) as conn:
+        versions = [version for version, in conn.execute("SELECT version FROM schema_version ORDER BY version")]
+        users = conn.execute("SELECT count(*) FROM users").fetchone()[0]
+    assert versions == [version for version, _, _ in MIGRATIONS]
+    assert users == 1   # el usuario de ejemplo, sembrado una sola vez
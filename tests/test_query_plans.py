@@ -0,0 +1,18 @@
+"""Ninguna consulta caliente recorre una tabla entera (benchmarks/query_plans.py).
+
+Corre en otro proceso porque necesita su propia base con datos sintéticos.
+"""
+import subprocess
+import sys
+
+from conftest import REPO_DIR
+
+def test_hot_paths_use_indexes(tmp_path):
+    result = subprocess.run(
+        [sys.executable, "-m", "benchmarks.query_plans", "--db", str(tmp_path / "plans.db"), "--scale", "tiny"],
+        cwd=REPO_DIR,
+        capture_output=True,
+        text=True,
+        timeout=600,
+    )
+    assert result.returncode == 0, result.stdout + result.stderr
@@ -0,0 +1,62 @@
+"""catedra_rating_stats coincide con su reconstrucción desde ratings."""
+import random
+import threading
+
+import services
+from database import get_session
+from maintenance import rebuild_rating_stats
+from models import Catedra, CatedraRatingStats
+
+def _rating_stats():
+    with get_session() as session:
+        rows = session.query(CatedraRatingStats).filter(CatedraRatingStats.rating_count > 0)
+        return {
+            row.catedra_id: (row.rating_count, row.rating_sum, *(getattr(row, f"stars_{s}") for s in range(1, 6)))
+            for row in rows
+        }
+
+def _catedra_ids(limit=3):
+    with get_session() as session:
+        return [cid for cid, in session.query(Catedra.id).order_by(Catedra.id).limit(limit)]
+
+def _rate_or_delete(rng, user_id, catedra_id):
+    if rng.random() < 0.2:
+        services.delete_rating(user_id, catedra_id)
+    else:
+        services.rate_catedra(user_id, catedra_id, rng.randint(1, 5))
+
+def _assert_matches_rebuild():
+    incremental = _rating_stats()
+    with get_session() as session:
+        rebuild_rating_stats(session)
+    assert incremental == _rating_stats()
+
+def test_rating_stats_match_rebuild(make_user):
+    rng = random.Random(11)
+    catedra_ids = _catedra_ids()
+    users = [make_user() for _ in range(4)]
+    for _ in range(30):
+        _rate_or_delete(rng, rng.choice(users).id, rng.choice(catedra_ids))
+    _assert_matches_rebuild()
+
+def test_concurrent_ratings_of_one_user_match_rebuild(make_user):
+    # Doble clic o dos pestañas sobre la misma cátedra
+    user, catedra_id = make_user(), _catedra_ids(1)[0]
+    errors = []
+
+    def rate(seed):
+        rng = random.Random(seed)
+        try:
+            for _ in range(25):
+                _rate_or_delete(rng, user.id, catedra_id)
+        except Exception as exc:
+            errors.append(exc)
+
+    threads = [threading.Thread(target=rate, args=(seed,)) for seed in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    _assert_matches_rebuild()
@@ -0,0 +1,62 @@
+"""Índice FTS5: sin acentos, sólo posts publicados y conteos de rebuild_index."""
+from sqlalchemy import update
+
+import search
+from database import SessionLocal, engine, get_session
+from models import Post, Resource
+
+def _hits(query):
+    with SessionLocal() as session:
+        return {(hit.kind, hit.ref_id) for hit in search.search(session, query, limit=100)}
+
+def _add_resource(title, description=""):
+    with get_session() as session:
+        resource = Resource(subject_id=1, title=title, description=description)
+        session.add(resource)
+        session.flush()
+        return resource.id
+
+def test_match_ignores_accents_and_plurals():
+    resource_id = _add_resource("Apunte de Topografía Aplicada", "Nivelación y curvas")
+
+    assert ("resource", resource_id) in _hits("topografia")
+    assert ("resource", resource_id) in _hits("apuntes de TOPOGRAFÍA")
+    assert ("resource", resource_id) in _hits("nivelacion")
+    assert search.build_match_query("de la y") == ""
+
+def test_edits_and_deletes_follow_the_resource():
+    resource_id = _add_resource("Guía de hormigón armado")
+    with get_session() as session:
+        session.get(Resource, resource_id).title = "Guía de mampostería"
+    assert ("resource", resource_id) not in _hits("hormigon")
+    assert ("resource", resource_id) in _hits("mamposteria")
+
+    with get_session() as session:
+        session.delete(session.get(Resource, resource_id))
+    assert ("resource", resource_id) not in _hits("mamposteria")
+
+def test_only_published_posts_are_indexed(make_post):
+    post_id = make_post("croquis de fachada ventilada")
+    assert ("post", post_id) in _hits("fachada ventilada")
+
+    with get_session() as session:
+        session.execute(update(Post).where(Post.id == post_id).values(status="rechazado"))
+    assert ("post", post_id) not in _hits("fachada ventilada")
+
+    with get_session() as session:
+        session.execute(update(Post).where(Post.id == post_id).values(status="publicado"))
+    assert ("post", post_id) in _hits("fachada ventilada")
+
+def test_rebuild_reports_only_missing_rows(make_post):
+    resource_id = _add_resource("Planilla de cómputo métrico")
+    post_id = make_post("cómputo métrico de la losa")
+    assert search.rebuild_index(engine) == 0
+
+    with engine.begin() as conn:
+        conn.exec_driver_sql(
+            "DELETE FROM search_index WHERE rowid IN (?, ?)", (resource_id * 2, post_id * 2 + 1)
+        )
+    assert _hits("computo metrico").isdisjoint({("resource", resource_id), ("post", post_id)})
+
+    assert search.rebuild_index(engine, batch_size=7) == 2
+    assert {("resource", resource_id), ("post", post_id)} <= _hits("computo metrico")
@@ -0,0 +1,45 @@
+"""Caché en disco compartido (shared_cache.py)."""
+import sys
+from collections import namedtuple
+
+import refdata
+from shared_cache import SharedCache
+
+Ranked = namedtuple("Ranked", "id score")
+
+def test_round_trip_expiry_and_clear(tmp_path):
+    cache = SharedCache(tmp_path / "shared.db")
+    big = {"rows": list(range(5000))}   # se guarda comprimido
+    cache.set("big", big)
+    cache.set("gone", 1, ttl=-1)
+
+    assert cache.get("big") == big
+    assert cache.get("gone", "missing") == "missing"
+    assert cache.get_or_set("computed", lambda: 42) == 42
+    assert cache.get_or_set("computed", lambda: 0) == 42
+
+    cache.clear()
+    assert cache.stats()["entries"] == 0
+
+def test_entries_from_older_code_are_misses_and_discarded(tmp_path, monkeypatch):
+    cache = SharedCache(tmp_path / "shared.db")
+    cache.set("ranking", [Ranked(1, 4.5)])
+    # Un deploy que agrega un campo al namedtuple guardado
+    monkeypatch.setattr(sys.modules[__name__], "Ranked", namedtuple("Ranked", "id score votes"))
+
+    assert cache.get("ranking", "missing") == "missing"
+    assert cache.stats()["entries"] == 0
+    assert cache.errors == 1
+
+def test_evicts_least_recently_used_above_max_bytes(tmp_path):
+    cache = SharedCache(tmp_path / "shared.db", max_bytes=20_000)
+    for i in range(40):
+        cache.set(f"key{i}", bytes(1000) + i.to_bytes(2, "big"))
+
+    stats = cache.stats()
+    assert stats["bytes"] <= 20_000
+    assert cache.get("key39") is not None
+    assert cache.get("key0") is None
+
+def test_cache_keys_include_the_code_version():
+    assert refdata.CODE_VERSION in refdata.cache_key("ranking", 1, tables=(refdata.RATINGS,))
@@ -0,0 +1,57 @@
+"""Servidor de estáticos: adjuntos por URL firmada."""
+import io
+import threading
+import urllib.error
+import urllib.request
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+import static_server
+from database import get_session
+from storage import blob_store
+
+@pytest.fixture(scope="module")
+def server_url():
+    static_server.StaticHandler.root = blob_store.root
+    server = ThreadingHTTPServer(("127.0.0.1", 0), static_server.StaticHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+
+def _get(url):
+    try:
+        with urllib.request.urlopen(url) as response:
+            return response.status, response.headers, response.read()
+    except urllib.error.HTTPError as exc:
+        return exc.code, exc.headers, b""
+
+def _local(url, server_url):
+    return url.replace(static_server.base_url(), server_url, 1)
+
+@pytest.fixture(scope="module")
+def attachment():
+    data = bytes(range(256)) * 12_000   # ~3 MB, varios bloques
+    with get_session() as session:
+        stored = blob_store.put_stream(session, io.BytesIO(data), ext=".pdf")
+    return stored.path, data
+
+def test_signed_attachment_is_streamed(server_url, attachment):
+    rel_path, data = attachment
+    status, headers, body = _get(_local(static_server.attachment_url(rel_path, "Apunte Nº1.pdf"), server_url))
+    assert status == 200
+    assert body == data
+    assert headers["Content-Type"] == "application/pdf"
+    assert "Apunte%20N%C2%BA1.pdf" in headers["Content-Disposition"]
+
+def test_tampered_or_expired_attachment_url_is_refused(server_url, attachment):
+    rel_path, _ = attachment
+    url = _local(static_server.attachment_url(rel_path, "apunte.pdf"), server_url)
+    assert _get(url.replace("apunte.pdf", "otro.pdf"))[0] == 404
+    assert _get(url.replace("sig=", "sig=0"))[0] == 404
+    expired = static_server.attachment_url(rel_path, "apunte.pdf", now=1)
+    assert _get(_local(expired, server_url))[0] == 404
+
+def test_attachments_are_not_served_as_images(server_url, attachment):
+    rel_path, _ = attachment
+    assert _get(f"{server_url}/{rel_path}")[0] == 404
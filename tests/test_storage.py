@@ -0,0 +1,74 @@
+"""Almacén por contenido: deduplicación, conteo de referencias y recolección."""
+import io
+import os
+
+import pytest
+
+from database import get_session
+from models import Blob
+from storage import BlobStore
+
+@pytest.fixture
+def store(tmp_path):
+    return BlobStore(tmp_path)
+
+def _refcount(digest):
+    with get_session() as session:
+        return session.query(Blob.refcount).filter(Blob.hash == digest).scalar()
+
+def test_same_content_is_stored_once(store):
+    data = os.urandom(4096)
+    with get_session() as session:
+        first = store.put(session, data, ".bin")
+        second = store.put(session, data, ".dat")
+        streamed = store.put_stream(session, io.BytesIO(data), ".bin", chunk_size=1000)
+
+    # La segunda subida conserva la ruta original aunque cambie la extensión
+    assert first == second == streamed.path
+    assert store.read(first) == data
+    assert _refcount(streamed.hash) == 3
+    files = [p for p in store.root.rglob("*") if p.is_file()]
+    assert files == [store.abspath(first)]
+
+def test_iter_chunks_streams_the_stored_file(store):
+    data = os.urandom(2500)
+    with get_session() as session:
+        stored = store.put_stream(session, io.BytesIO(data), ".bin")
+
+    chunks = list(store.iter_chunks(stored.path, chunk_size=1000))
+    assert [len(c) for c in chunks] == [1000, 1000, 500]
+    assert b"".join(chunks) == data
+
+def test_file_is_removed_only_after_last_release(store):
+    data = os.urandom(1024)
+    with get_session() as session:
+        path = store.put(session, data, ".bin")
+        store.put(session, data, ".bin")
+    digest = store.abspath(path).stem
+
+    with get_session() as session:
+        store.release(session, path)
+        store.collect_garbage(session)
+    assert _refcount(digest) == 1
+    assert store.abspath(path).exists()
+
+    with get_session() as session:
+        store.release(session, path)
+        assert store.collect_garbage(session) >= 1
+    assert _refcount(digest) is None
+    assert not store.abspath(path).exists()
+
+def test_rolled_back_reference_keeps_the_file(store):
+    data = os.urandom(1024)
+    with get_session() as session:
+        path = store.put(session, data, ".bin")
+    digest = store.abspath(path).stem
+
+    with pytest.raises(RuntimeError), get_session() as session:
+        store.release(session, path)
+        raise RuntimeError("rollback")
+
+    with get_session() as session:
+        store.collect_garbage(session)
+    assert _refcount(digest) == 1
+    assert store.read(path) == data
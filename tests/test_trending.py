@@ -0,0 +1,111 @@
+"""Puntajes de tendencia: rebase sin cambiar el orden y cursores entre escalas."""
+import datetime
+
+import pytest
+from sqlalchemy import event
+
+import services
+import trending
+from database import engine, get_session
+from models import Post
+
+def _scores():
+    with get_session() as session:
+        return dict(session.query(Post.id, Post.trend_score))
+
+def _set_score(post_id, score):
+    with get_session() as session:
+        session.get(Post, post_id).trend_score = score
+
+@pytest.fixture(autouse=True)
+def restore_base():
+    # Los tests adelantan base varios días; el resto de la suite espera base ~ ahora
+    yield
+    with get_session() as session:
+        trending.rebuild(session)
+
+@pytest.fixture
+def post_updates():
+    """Filas de posts que reescribe cada UPDATE mientras dura el test."""
+    counts = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("UPDATE posts"):
+            counts.append(cursor.rowcount)
+    event.listen(engine, "after_cursor_execute", count)
+    yield counts
+    event.remove(engine, "after_cursor_execute", count)
+
+def test_rebase_keeps_order_and_relative_scores(make_user, make_post):
+    user = make_user()
+    posts = [make_post() for _ in range(3)]
+    for post_id, score in zip(posts, (1.0, 4.0, 0.5)):
+        _set_score(post_id, score)
+    services.set_like(user.id, posts[2], True)
+    before = _scores()
+
+    with get_session() as session:
+        old_base = trending.get_base(session)
+        factor = trending.rebase(session, old_base + 3 * trending.HALF_LIFE)
+    after = _scores()
+
+    assert factor == pytest.approx(1 / 8)
+    assert sorted(after, key=lambda i: (after[i], i)) == sorted(before, key=lambda i: (before[i], i))
+    for post_id in posts:
+        assert after[post_id] == pytest.approx(before[post_id] * factor)
+
+def test_rebase_skips_posts_without_score(make_post, post_updates):
+    zero, tiny = make_post(), make_post()
+    _set_score(zero, 0)
+    _set_score(tiny, trending.MIN_SCORE)
+    with_score = sum(score > 0 for score in _scores().values())
+    post_updates.clear()
+
+    with get_session() as session:
+        trending.rebase(session, trending.get_base(session) + trending.HALF_LIFE)
+
+    # Escala los que tienen puntaje y redondea a 0 sólo el que bajó de MIN_SCORE
+    assert post_updates == [with_score, 1]
+    assert _scores()[tiny] == 0
+
+def test_rebase_only_when_due(make_post, post_updates):
+    make_post()
+    with get_session() as session:
+        base = trending.get_base(session)
+    post_updates.clear()
+
+    with get_session() as session:
+        assert trending.rebase_if_due(session, base + trending.REBASE_AFTER / 2) is None
+    assert post_updates == []
+
+    with get_session() as session:
+        factor = trending.rebase_if_due(session, base + trending.REBASE_AFTER)
+        assert trending.get_base(session) == base + trending.REBASE_AFTER
+    assert factor == pytest.approx(2.0 ** -(trending.REBASE_AFTER / trending.HALF_LIFE))
+
+def test_rebase_with_stale_base_does_nothing(make_post, monkeypatch):
+    post_id = make_post()
+    _set_score(post_id, 2.0)
+    with get_session() as session:
+        base = trending.get_base(session)
+        trending.rebase(session, base + trending.HALF_LIFE)
+
+    # Otro proceso que leyó el base anterior no vuelve a reescalar
+    monkeypatch.setattr(trending, "get_base", lambda session: base)
+    with get_session() as session:
+        assert trending.rebase(session, base + 2 * trending.HALF_LIFE) == 1.0
+    assert _scores()[post_id] == pytest.approx(1.0)
+
+def test_trending_pages_continue_across_rebase(make_user):
+    user = make_user()
+    seen = []
+    page, cursor = services.get_trending_page(user.id, limit=3)
+    seen += [post.id for post in page]
+    with get_session() as session:
+        trending.rebase(session, trending.get_base(session) + 5 * trending.HALF_LIFE)
+    while cursor is not None:
+        page, cursor = services.get_trending_page(user.id, cursor=cursor, limit=3)
+        seen += [post.id for post in page]
+
+    assert len(seen) == len(set(seen))
+    assert set(seen) == {post.id for post in services.get_trending_page(user.id, limit=10_000)[0]}
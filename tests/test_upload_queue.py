@@ -0,0 +1,97 @@
+"""Publicación y rechazo de subidas a través de la cola de procesamiento."""
+import io
+import os
+
+import pytest
+
+import images
+import search
+import services
+import upload_queue
+from conftest import png
+from database import SessionLocal, get_session
+from models import Post, UploadJob
+
+@pytest.fixture(autouse=True, scope="module")
+def image_pool():
+    yield
+    if images._executor is not None:
+        images._executor.shutdown()
+
+def _post_and_job(post_id):
+    with get_session() as session:
+        post = session.get(Post, post_id)
+        job = session.query(UploadJob).filter(UploadJob.post_id == post_id).one()
+        return post, job
+
+def _feed_ids():
+    posts, _ = services.get_feed_page(limit=100)
+    return {post.id for post in posts}
+
+def _search_ids(query):
+    with SessionLocal() as session:
+        return {hit.ref_id for hit in search.search(session, query) if hit.kind == "post"}
+
+def test_valid_upload_is_published_with_derivatives(make_user):
+    user = make_user()
+    post_id = services.create_post(user.id, 1, png(1600, 900), "maqueta publicada", ".png")
+    assert post_id not in _feed_ids()
+    assert post_id not in _search_ids("maqueta publicada")
+
+    upload_queue.drain(SessionLocal)
+
+    post, job = _post_and_job(post_id)
+    assert post.status == upload_queue.POST_PUBLISHED
+    assert post.thumb_path and post.feed_path
+    assert (job.status, job.attempts) == (upload_queue.DONE, 1)
+    assert post_id in _feed_ids()
+    assert post_id in _search_ids("maqueta publicada")
+
+@pytest.mark.parametrize("fileobj", [
+    io.BytesIO(b"no es una imagen" * 20),
+    png(images.MAX_SIDE + 1, 2),
+], ids=["not-an-image", "too-large"])
+def test_invalid_upload_is_rejected(make_user, fileobj):
+    user = make_user()
+    post_id = services.create_post(user.id, 1, fileobj, "lamina rechazada", ".png")
+
+    upload_queue.drain(SessionLocal)
+
+    post, job = _post_and_job(post_id)
+    assert post.status == upload_queue.POST_REJECTED
+    assert post.thumb_path is None
+    assert job.status == upload_queue.FAILED and job.error
+    assert post_id not in _feed_ids()
+    assert post_id not in _search_ids("lamina rechazada")
+
+def crash(data):
+    # Como un segfault u OOM del proceso de imágenes
+    os._exit(1)
+
+def test_broken_pool_is_replaced_without_spending_attempts(make_user):
+    user = make_user()
+    post_id = services.create_post(user.id, 1, png(), "despues del crash", ".png")
+    # Un proceso del pool que muere (OOM, segfault) deja el executor roto
+    broken = images.get_executor()
+    with pytest.raises(Exception):
+        broken.submit(os._exit, 1).result()
+
+    upload_queue.drain(SessionLocal)
+
+    post, job = _post_and_job(post_id)
+    assert images.get_executor() is not broken
+    assert post.status == upload_queue.POST_PUBLISHED
+    assert (job.status, job.attempts) == (upload_queue.DONE, 1)
+
+def test_image_that_kills_the_pool_is_rejected_after_max_attempts(make_user, monkeypatch):
+    user = make_user()
+    post_id = services.create_post(user.id, 1, png(), "mata el proceso", ".png")
+    monkeypatch.setattr(upload_queue, "process_upload", crash)
+
+    for _ in range(upload_queue.MAX_ATTEMPTS + 2):
+        if not upload_queue.process_next(SessionLocal):
+            break
+
+    post, job = _post_and_job(post_id)
+    assert post.status == upload_queue.POST_REJECTED
+    assert (job.status, job.attempts) == (upload_queue.FAILED, upload_queue.MAX_ATTEMPTS)
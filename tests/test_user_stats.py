@@ -0,0 +1,87 @@
+"""user_stats y user_subject_stats coinciden con su reconstrucción desde user_tps."""
+import random
+import threading
+
+import pytest
+
+import services
+from database import get_session
+from maintenance import rebuild_user_stats
+from models import TP, UserStats, UserSubjectStats
+
+def _user_stats():
+    with get_session() as session:
+        users = {
+            row.user_id: (row.tps_approved, row.tps_delivered, row.tps_pending, row.grade_sum, row.grade_count)
+            for row in session.query(UserStats)
+        }
+        subjects = {
+            (row.user_id, row.subject_id): (row.tps_approved, row.grade_sum, row.grade_count)
+            for row in session.query(UserSubjectStats)
+        }
+    # La reconstrucción no crea filas en cero
+    return (
+        {key: value for key, value in users.items() if any(value)},
+        {key: value for key, value in subjects.items() if any(value)},
+    )
+
+def _random_changes(rng, tp_ids):
+    return {
+        tp_id: (rng.choice(services.TP_STATES), rng.choice([None, 4, 7, 10]))
+        for tp_id in rng.sample(tp_ids, 3)
+    }
+
+@pytest.fixture
+def tp_ids():
+    with get_session() as session:
+        return [tp_id for tp_id, in session.query(TP.id).filter(TP.subject_id <= 2)]
+
+def test_user_stats_match_rebuild(make_user, tp_ids):
+    rng = random.Random(3)
+    user = make_user()
+    for _ in range(40):
+        services.save_tp_progress(user.id, _random_changes(rng, tp_ids))
+    services.bulk_save_tp_states([(user.id, tp_id, "Aprobado") for tp_id in tp_ids[:4]])
+
+    incremental = _user_stats()
+    with get_session() as session:
+        rebuild_user_stats(session)
+    assert incremental == _user_stats()
+
+def test_concurrent_saves_of_one_user_match_rebuild(make_user, tp_ids):
+    # Dos pestañas o un doble clic: guardados simultáneos del mismo usuario
+    user = make_user()
+    errors = []
+
+    def save(seed):
+        rng = random.Random(seed)
+        try:
+            for _ in range(30):
+                services.save_tp_progress(user.id, _random_changes(rng, tp_ids))
+        except Exception as exc:
+            errors.append(exc)
+
+    threads = [threading.Thread(target=save, args=(seed,)) for seed in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    incremental = _user_stats()
+    with get_session() as session:
+        rebuild_user_stats(session)
+    assert incremental == _user_stats()
+
+def test_academic_stats_count_only_marked_pending(make_user, tp_ids):
+    user = make_user()
+    services.save_tp_progress(user.id, {
+        tp_ids[0]: ("Aprobado", 8),
+        tp_ids[1]: ("Entregado", None),
+        tp_ids[2]: ("Pendiente", None),
+        tp_ids[3]: ("Pendiente", None),
+    })
+
+    stats = services.get_academic_stats(user.id)
+    assert (stats.approved, stats.delivered, stats.pending) == (1, 1, 2)
+    assert stats.average == 8
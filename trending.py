@@ -0,0 +1,143 @@
+"""Puntaje de tendencia de los posts con decaimiento exponencial.
+
+Cada post y cada like aportan 2^((t - base) / HALF_LIFE) a `posts.trend_score`,
+con t el momento en que ocurrieron y `base` el instante guardado en
+trending_epoch. Así un like de hace un día pesa la mitad que uno de ahora, el
+orden entre posts es siempre el correcto y un like o un unlike sólo suman o
+restan su peso, sin agregar sobre `likes`.
+
+Como los pesos crecen con t, `rebase` adelanta `base` y multiplica todos los
+puntajes por el mismo factor. El orden no cambia; sólo se evita que los
+números se acerquen al máximo de un float (2^1024, unos 1000 días después de
+`base`). Reescribe todos los posts con puntaje, así que un hilo de la app
+(`start_decay_job`) lo corre recién cuando `base` quedó REBASE_AFTER atrás;
+también se puede forzar con `python maintenance.py decay-trending`.
+"""
+import datetime
+import logging
+import threading
+from collections import defaultdict
+
+from sqlalchemy import update
+
+from database import dialect_insert
+from models import Post, Like, TrendingEpoch
+
+logger = logging.getLogger(__name__)
+
+HALF_LIFE = datetime.timedelta(hours=24)
+DECAY_INTERVAL = datetime.timedelta(hours=1)    # cada cuánto se revisa si toca reescalar
+REBASE_AFTER = 60 * HALF_LIFE                    # pesos de hasta 2^60: lejos del overflow
+MIN_SCORE = 1e-12   # por debajo se redondea a 0
+
+def weight(at, base):
+    """Aporte de un evento ocurrido en `at` con el instante de referencia `base`."""
+    return 2.0 ** ((at - base) / HALF_LIFE)
+
+def get_base(session):
+    """Instante de referencia vigente; la primera vez lo inicializa en ahora."""
+    base = session.get(TrendingEpoch, 1)
+    if base is None:
+        insert = dialect_insert(session)
+        session.execute(
+            insert(TrendingEpoch)
+            .values(id=1, base_at=datetime.datetime.utcnow())
+            .on_conflict_do_nothing(index_elements=[TrendingEpoch.id])
+        )
+        base = session.get(TrendingEpoch, 1)
+    return base.base_at
+
+def add_event(session, post_id, at, sign=1):
+    """Suma (o resta, con sign=-1) el peso de un like al puntaje del post.
+
+    Se llama después de escribir en likes, cuando la transacción ya tiene el
+    bloqueo de escritura, así `base` no cambia antes del commit.
+    """
+    delta = sign * weight(at, get_base(session))
+    session.execute(
+        update(Post).where(Post.id == post_id).values(trend_score=Post.trend_score + delta)
+    )
+
+def initial_score(session, created_at):
+    """Puntaje de un post nuevo: su propia publicación cuenta como un like."""
+    return weight(created_at, get_base(session))
+
+def rescale_cursor(cursor_base, score, current_base):
+    """Lleva un puntaje calculado con otro `base` a la escala vigente."""
+    if cursor_base == current_base:
+        return score
+    return score * weight(cursor_base, current_base)
+
+def rebase(session, now=None):
+    """Adelanta `base` a `now` y reescala todos los puntajes. Devuelve el factor aplicado."""
+    now = now or datetime.datetime.utcnow()
+    old_base = get_base(session)
+    if now <= old_base:
+        return 1.0
+    # Primero base, condicionado al valor leído: si otro proceso ya lo adelantó
+    # no hay que reescalar otra vez
+    moved = session.execute(
+        update(TrendingEpoch).where(TrendingEpoch.id == 1, TrendingEpoch.base_at == old_base).values(base_at=now)
+    )
+    if moved.rowcount == 0:
+        return 1.0
+    factor = weight(old_base, now)
+    session.execute(
+        update(Post).where(Post.trend_score > 0).values(trend_score=Post.trend_score * factor)
+    )
+    session.execute(
+        update(Post).where(Post.trend_score > 0, Post.trend_score < MIN_SCORE).values(trend_score=0)
+    )
+    return factor
+
+def rebase_if_due(session, now=None, after=REBASE_AFTER):
+    """`rebase` si `base` quedó más de `after` atrás. Devuelve el factor o None."""
+    now = now or datetime.datetime.utcnow()
+    if now - get_base(session) < after:
+        return None
+    return rebase(session, now)
+
+def rebuild(session, batch_size=5000):
+    """Recalcula trend_score de todos los posts desde posts y likes. Devuelve cuántos posts."""
+    get_base(session)   # por si la fila no existía
+    base = datetime.datetime.utcnow()
+    session.execute(update(TrendingEpoch).where(TrendingEpoch.id == 1).values(base_at=base))
+
+    created = dict(session.query(Post.id, Post.created_at))
+    scores = defaultdict(float)
+    for post_id, created_at in created.items():
+        scores[post_id] += weight(created_at or base, base)
+    likes = session.query(Like.post_id, Like.created_at).execution_options(yield_per=batch_size)
+    for post_id, liked_at in likes:
+        scores[post_id] += weight(liked_at or created.get(post_id) or base, base)
+
+    rows = [{"id": post_id, "trend_score": score if score >= MIN_SCORE else 0} for post_id, score in scores.items()]
+    for start in range(0, len(rows), batch_size):
+        session.execute(update(Post), rows[start:start + batch_size])
+    return len(rows)
+
+# ----------------------------
+# Trabajo periódico
+# ----------------------------
+_job = None
+_job_lock = threading.Lock()
+
+def _decay_loop(session_factory, interval, stop):
+    while not stop.wait(interval.total_seconds()):
+        try:
+            with session_factory() as session, session.begin():
+                # Con varios procesos el primero que lo ve vencido adelanta base
+                rebase_if_due(session)
+        except Exception:
+            logger.exception("No se pudo reescalar trend_score")
+
+def start_decay_job(session_factory, interval=DECAY_INTERVAL):
+    """Arranca el hilo de `rebase` (una vez por proceso). Devuelve el Event para detenerlo."""
+    global _job
+    with _job_lock:
+        if _job is None:
+            _job = threading.Event()
+            threading.Thread(
+                target=_decay_loop, args=(session_factory, interval, _job), name="trending-decay", daemon=True
+            ).start()
+    return _job
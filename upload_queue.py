@@ -0,0 +1,255 @@
+"""Cola de procesamiento de las imágenes subidas, respaldada por la tabla upload_jobs.
+
+"Publicar" sólo copia el archivo al almacén y crea el post en estado
+"procesando" junto con su trabajo. Un pool local de hilos toma los trabajos de
+la tabla (así sobreviven a un reinicio y varios procesos se los pueden
+repartir), corre la validación y la re-codificación en el pool de procesos de
+images.py y publica el post al terminar. Si la imagen no es válida el post
+queda "rechazado"; los errores inesperados se reintentan hasta MAX_ATTEMPTS.
+"""
+import datetime
+import logging
+import threading
+from collections import namedtuple
+from concurrent.futures.process import BrokenProcessPool
+
+from sqlalchemy import func, select, update
+
+from images import (
+    InvalidImage, MAX_UPLOAD_BYTES, apply_derivatives, get_executor, process_upload, reset_executor,
+)
+from models import Post, UploadJob
+from storage import blob_store
+
+logger = logging.getLogger(__name__)
+
+# Estados de posts.status
+POST_PROCESSING = "procesando"
+POST_PUBLISHED = "publicado"
+POST_REJECTED = "rechazado"
+
+# Estados de upload_jobs.status
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+WORKERS = 2
+POLL_INTERVAL = 2.0   # s; los trabajos encolados por otros procesos se ven al sondear
+MAX_ATTEMPTS = 3
+STALE_AFTER = datetime.timedelta(minutes=10)        # "running" de un worker que murió
+HOUSEKEEPING_INTERVAL = datetime.timedelta(minutes=1)
+KEEP_FINISHED = datetime.timedelta(days=7)
+THROUGHPUT_WINDOW = datetime.timedelta(hours=1)
+
+QueueMetrics = namedtuple(
+    "QueueMetrics", "pending running done failed per_minute avg_wait avg_processing oldest_pending"
+)
+
+_wakeup = threading.Event()
+
+# ----------------------------
+# Encolado y toma de trabajos
+# ----------------------------
+def enqueue(session, post_id):
+    """Agrega el trabajo del post en la transacción del llamador; después del commit, `notify()`."""
+    session.add(UploadJob(post_id=post_id, status=PENDING))
+
+def notify():
+    """Despierta a los workers de este proceso sin esperar al próximo sondeo."""
+    _wakeup.set()
+
+def claim(session):
+    """Marca como "running" el trabajo pendiente más antiguo. Devuelve (id, post_id) o None.
+
+    Es un único UPDATE condicionado al estado, así dos workers nunca toman el mismo.
+    """
+    oldest = (
+        select(UploadJob.id)
+        .where(UploadJob.status == PENDING)
+        .order_by(UploadJob.id)
+        .limit(1)
+        .scalar_subquery()
+    )
+    return session.execute(
+        update(UploadJob)
+        .where(UploadJob.id == oldest, UploadJob.status == PENDING)
+        .values(status=RUNNING, started_at=datetime.datetime.utcnow(), attempts=UploadJob.attempts + 1)
+        .returning(UploadJob.id, UploadJob.post_id),
+        execution_options={"synchronize_session": False},
+    ).first()
+
+def process_next(session_factory):
+    """Procesa un trabajo. Devuelve False si no había ninguno pendiente."""
+    with session_factory() as session, session.begin():
+        job = claim(session)
+    if job is None:
+        return False
+    job_id, post_id = job
+
+    try:
+        with session_factory() as session:
+            image_path = session.query(Post.image_path).filter(Post.id == post_id).scalar()
+        if image_path is None:
+            raise InvalidImage("El post ya no existe")
+        path = blob_store.abspath(image_path)
+        # Antes de leerlo: un archivo enorme no debe entrar entero en memoria
+        if path.stat().st_size > MAX_UPLOAD_BYTES:
+            raise InvalidImage(f"La imagen supera los {MAX_UPLOAD_BYTES // (1024 * 1024)} MB")
+        executor = get_executor()
+        try:
+            future = executor.submit(process_upload, path.read_bytes())
+        except BrokenProcessPool:
+            # El pool ya estaba roto antes de este trabajo: no es culpa de la
+            # imagen, vuelve a la cola sin gastar un intento
+            logger.warning("El pool de imágenes estaba roto; se reinicia")
+            reset_executor(executor)
+            _requeue(session_factory, job_id)
+            return True
+        derivatives = future.result()
+    except InvalidImage as exc:
+        _reject(session_factory, job_id, post_id, str(exc))
+    except BrokenProcessPool:
+        # El proceso murió (segfault, OOM) con esta imagen adentro: cuenta como
+        # intento, así una imagen que siempre lo mata termina rechazada
+        logger.warning("El pool de imágenes se rompió procesando el post %s; se reinicia", post_id)
+        reset_executor(executor)
+        _retry(session_factory, job_id, post_id, "El proceso de imágenes terminó inesperadamente")
+    except Exception as exc:
+        logger.exception("Falló el procesamiento del post %s", post_id)
+        _retry(session_factory, job_id, post_id, repr(exc))
+    else:
+        with session_factory() as session, session.begin():
+            post = session.get(Post, post_id)
+            apply_derivatives(session, post, derivatives)
+            post.status = POST_PUBLISHED
+            _finish(session, job_id, DONE)
+    return True
+
+def drain(session_factory):
+    """Procesa trabajos hasta vaciar la cola. Devuelve cuántos procesó."""
+    processed = 0
+    while process_next(session_factory):
+        processed += 1
+    return processed
+
+def _finish(session, job_id, status, error=None):
+    session.execute(
+        update(UploadJob)
+        .where(UploadJob.id == job_id)
+        .values(status=status, error=error, finished_at=datetime.datetime.utcnow())
+    )
+
+def _requeue(session_factory, job_id):
+    with session_factory() as session, session.begin():
+        session.execute(
+            update(UploadJob)
+            .where(UploadJob.id == job_id)
+            .values(status=PENDING, attempts=UploadJob.attempts - 1)
+        )
+
+def _reject(session_factory, job_id, post_id, error):
+    with session_factory() as session, session.begin():
+        post = session.get(Post, post_id)
+        if post is not None:
+            post.status = POST_REJECTED
+            # El archivo subido ya no lo usa nadie; lo borra collect_garbage
+            blob_store.release(session, post.image_path)
+        _finish(session, job_id, FAILED, error)
+
+def _retry(session_factory, job_id, post_id, error):
+    with session_factory() as session, session.begin():
+        attempts = session.query(UploadJob.attempts).filter(UploadJob.id == job_id).scalar()
+        if attempts < MAX_ATTEMPTS:
+            session.execute(
+                update(UploadJob).where(UploadJob.id == job_id).values(status=PENDING, error=error)
+            )
+            return
+    _reject(session_factory, job_id, post_id, "No se pudo procesar la imagen")
+
+def housekeeping(session_factory, now=None):
+    """Devuelve a la cola los trabajos colgados y borra los terminados hace más de KEEP_FINISHED."""
+    now = now or datetime.datetime.utcnow()
+    with session_factory() as session, session.begin():
+        stale = session.query(UploadJob.id, UploadJob.post_id, UploadJob.attempts).filter(
+            UploadJob.status == RUNNING, UploadJob.started_at < now - STALE_AFTER
+        ).all()
+        session.query(UploadJob).filter(
+            UploadJob.status.in_([DONE, FAILED]), UploadJob.finished_at < now - KEEP_FINISHED
+        ).delete(synchronize_session=False)
+    for job_id, post_id, attempts in stale:
+        _retry(session_factory, job_id, post_id, "El worker no terminó a tiempo")
+    return len(stale)
+
+# ----------------------------
+# Métricas
+# ----------------------------
+def metrics(session, now=None):
+    """Profundidad de la cola y throughput de la última THROUGHPUT_WINDOW (QueueMetrics).
+
+    Los tiempos están en segundos; None si no hubo trabajos en la ventana.
+    """
+    now = now or datetime.datetime.utcnow()
+    waiting = dict(
+        session.query(UploadJob.status, func.count(UploadJob.id))
+        .filter(UploadJob.status.in_([PENDING, RUNNING]))
+        .group_by(UploadJob.status)
+    )
+    oldest = session.query(func.min(UploadJob.created_at)).filter(UploadJob.status == PENDING).scalar()
+    finished = session.query(
+        UploadJob.status, UploadJob.created_at, UploadJob.started_at, UploadJob.finished_at
+    ).filter(
+        UploadJob.status.in_([DONE, FAILED]), UploadJob.finished_at >= now - THROUGHPUT_WINDOW
+    ).all()
+
+    done = [job for job in finished if job.status == DONE]
+    waits = [(job.started_at - job.created_at).total_seconds() for job in done if job.started_at and job.created_at]
+    runs = [(job.finished_at - job.started_at).total_seconds() for job in done if job.started_at]
+    return QueueMetrics(
+        pending=waiting.get(PENDING, 0),
+        running=waiting.get(RUNNING, 0),
+        done=len(done),
+        failed=len(finished) - len(done),
+        per_minute=len(done) / (THROUGHPUT_WINDOW.total_seconds() / 60),
+        avg_wait=sum(waits) / len(waits) if waits else None,
+        avg_processing=sum(runs) / len(runs) if runs else None,
+        oldest_pending=(now - oldest).total_seconds() if oldest else None,
+    )
+
+# ----------------------------
+# Pool de workers
+# ----------------------------
+_stop = None
+_stop_lock = threading.Lock()
+
+def _worker_loop(session_factory, stop):
+    while not stop.is_set():
+        try:
+            worked = process_next(session_factory)
+        except Exception:
+            logger.exception("Error en el worker de subidas")
+            worked = False
+        if not worked:
+            _wakeup.wait(POLL_INTERVAL)
+            _wakeup.clear()
+
+def _housekeeping_loop(session_factory, stop):
+    while True:
+        try:
+            housekeeping(session_factory)
+        except Exception:
+            logger.exception("Error al revisar la cola de subidas")
+        if stop.wait(HOUSEKEEPING_INTERVAL.total_seconds()):
+            return
+
+def start_workers(session_factory, workers=WORKERS):
+    """Arranca el pool de workers (una vez por proceso). Devuelve el Event para detenerlo."""
+    global _stop
+    with _stop_lock:
+        if _stop is None:
+            _stop = threading.Event()
+            threads = [("upload-housekeeping", _housekeeping_loop)]
+            threads += [(f"upload-worker-{i}", _worker_loop) for i in range(workers)]
+            for name, target in threads:
+                threading.Thread(target=target, args=(session_factory, _stop), name=name, daemon=True).start()
+    return _stop